@@ -6,11 +6,11 @@ Burgos y Barcelona, en el mismo formato de tabla que api_ai_forecast.py.
 from flask import Blueprint, jsonify
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import requests
 import pytz
 from dotenv import load_dotenv
-from forecast_common import day_and_date
+from forecast_common import ForecastCache, day_and_date
 
 load_dotenv()
 
@@ -26,24 +26,14 @@ MUNICIPIOS = {
 }
 
 CACHE_HOURS = float(os.getenv('AEMET_FORECAST_CACHE_HOURS', 6))
+# Tras caducar, la previsión se sigue sirviendo este tiempo mientras se refresca
+STALE_HOURS = float(os.getenv('AEMET_FORECAST_STALE_HOURS', CACHE_HOURS))
 
-_cache = {}
+CACHE_PREFIX = 'aemet_forecast:'
 
 
-def _get_cached(city):
-    entry = _cache.get(city)
-    if not entry:
-        return None
-    if datetime.now(pytz.timezone('Europe/Madrid')) - entry['updated_at'] > timedelta(hours=CACHE_HOURS):
-        return None
-    return entry['payload']
-
-
-def _set_cached(city, payload):
-    _cache[city] = {
-        'payload': payload,
-        'updated_at': datetime.now(pytz.timezone('Europe/Madrid')),
-    }
+forecast_cache = ForecastCache(CACHE_PREFIX, lambda city: _build_payload(city),
+                               CACHE_HOURS, STALE_HOURS)
 
 
 def _fetch_aemet_dias(municipio_code):
@@ -91,35 +81,33 @@ def _build_rows(dias):
     return rows
 
 
+def _build_payload(city):
+    info = MUNICIPIOS[city]
+    dias = _fetch_aemet_dias(info['code'])
+    rows = _build_rows(dias)
+
+    return {
+        'city': city,
+        'label': info['label'],
+        'updated_at': datetime.now(pytz.timezone('Europe/Madrid')).isoformat(),
+        'rows': rows,
+    }
+
+
 @aemet_forecast_bp.route('/api/aemet-forecast/<city>')
 def get_aemet_forecast(city):
     city = city.lower()
     if city not in MUNICIPIOS:
         return jsonify({'error': f"Ciudad desconocida: {city}"}), 404
 
-    cached = _get_cached(city)
-    if cached:
-        return jsonify(cached)
-
     try:
-        info = MUNICIPIOS[city]
-        dias = _fetch_aemet_dias(info['code'])
-        rows = _build_rows(dias)
-
-        payload = {
-            'city': city,
-            'label': info['label'],
-            'updated_at': datetime.now(pytz.timezone('Europe/Madrid')).isoformat(),
-            'rows': rows,
-        }
-        _set_cached(city, payload)
-        return jsonify(payload)
+        return jsonify(forecast_cache.get_or_build(city))
     except requests.exceptions.RequestException as e:
         logger.error(f"Error obteniendo predicción AEMET para {city}: {e}")
-        stale = _cache.get(city)
+        stale = forecast_cache.get_stale(city)
         if stale:
             logger.warning(f"Sirviendo previsión AEMET cacheada (caducada) de {city} por fallo de AEMET")
-            stale_payload = dict(stale['payload'])
+            stale_payload = dict(stale)
             stale_payload['stale'] = True
             stale_payload['stale_reason'] = str(e)
             return jsonify(stale_payload)
@@ -132,5 +120,5 @@ def get_aemet_forecast(city):
 @aemet_forecast_bp.route('/api/aemet-forecast/<city>/clear-cache', methods=['POST'])
 def clear_aemet_forecast_cache(city):
     city = city.lower()
-    _cache.pop(city, None)
+    forecast_cache.delete(city)
     return jsonify({'status': 'success', 'message': f'Caché AEMET de {city} borrada'})
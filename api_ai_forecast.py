@@ -11,11 +11,11 @@ from flask import Blueprint, jsonify
 import logging
 import os
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import requests
 import pytz
 from dotenv import load_dotenv
-from forecast_common import day_and_date
+from forecast_common import ForecastCache, day_and_date
 
 load_dotenv()
 
@@ -31,24 +31,14 @@ CITIES = {
 
 FORECAST_DAYS = 8
 CACHE_HOURS = float(os.getenv('AI_FORECAST_CACHE_HOURS', 3))
+# Tras caducar, la previsión se sigue sirviendo este tiempo mientras se refresca
+STALE_HOURS = float(os.getenv('AI_FORECAST_STALE_HOURS', CACHE_HOURS))
 
-_cache = {}
+CACHE_PREFIX = 'ai_forecast:'
 
 
-def _get_cached(city):
-    entry = _cache.get(city)
-    if not entry:
-        return None
-    if datetime.now(pytz.timezone('Europe/Madrid')) - entry['updated_at'] > timedelta(hours=CACHE_HOURS):
-        return None
-    return entry['payload']
-
-
-def _set_cached(city, payload):
-    _cache[city] = {
-        'payload': payload,
-        'updated_at': datetime.now(pytz.timezone('Europe/Madrid')),
-    }
+forecast_cache = ForecastCache(CACHE_PREFIX, lambda city: _build_payload(city),
+                               CACHE_HOURS, STALE_HOURS)
 
 
 def _fetch_open_meteo(lat, lon):
@@ -133,39 +123,38 @@ def _generate_comment(city_label, rows):
         return None, str(e)
 
 
+def _build_payload(city):
+    info = CITIES[city]
+    daily = _fetch_open_meteo(info['lat'], info['lon'])
+    rows = _build_rows(daily)
+    comment, comment_error = _generate_comment(info['label'], rows)
+
+    payload = {
+        'city': city,
+        'label': info['label'],
+        'updated_at': datetime.now(pytz.timezone('Europe/Madrid')).isoformat(),
+        'rows': rows,
+        'comment': comment,
+    }
+    if comment_error:
+        payload['comment_error'] = comment_error
+    return payload
+
+
 @ai_forecast_bp.route('/api/ai-forecast/<city>')
 def get_ai_forecast(city):
     city = city.lower()
     if city not in CITIES:
         return jsonify({'error': f"Ciudad desconocida: {city}"}), 404
 
-    cached = _get_cached(city)
-    if cached:
-        return jsonify(cached)
-
     try:
-        info = CITIES[city]
-        daily = _fetch_open_meteo(info['lat'], info['lon'])
-        rows = _build_rows(daily)
-        comment, comment_error = _generate_comment(info['label'], rows)
-
-        payload = {
-            'city': city,
-            'label': info['label'],
-            'updated_at': datetime.now(pytz.timezone('Europe/Madrid')).isoformat(),
-            'rows': rows,
-            'comment': comment,
-        }
-        if comment_error:
-            payload['comment_error'] = comment_error
-        _set_cached(city, payload)
-        return jsonify(payload)
+        return jsonify(forecast_cache.get_or_build(city))
     except requests.exceptions.RequestException as e:
         logger.error(f"Error obteniendo datos de Open-Meteo para {city}: {e}")
-        stale = _cache.get(city)
+        stale = forecast_cache.get_stale(city)
         if stale:
             logger.warning(f"Sirviendo previsión cacheada (caducada) de {city} por fallo de Open-Meteo")
-            stale_payload = dict(stale['payload'])
+            stale_payload = dict(stale)
             stale_payload['stale'] = True
             stale_payload['stale_reason'] = str(e)
             return jsonify(stale_payload)
@@ -178,5 +167,5 @@ def get_ai_forecast(city):
 @ai_forecast_bp.route('/api/ai-forecast/<city>/clear-cache', methods=['POST'])
 def clear_ai_forecast_cache(city):
     city = city.lower()
-    _cache.pop(city, None)
+    forecast_cache.delete(city)
     return jsonify({'status': 'success', 'message': f'Caché de {city} borrada'})
@@ -5,7 +5,8 @@ import requests
 import json
 from datetime import datetime, timedelta
 import pytz
-from database import db
+from database import get_db
+import shared_cache
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -14,21 +15,25 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 barcelona_rain_bp = Blueprint('barcelona_rain', __name__)
 
-# Cache for rain data
-rain_cache = {
-    'last_update': None,
-    'data': None,
-    'cache_duration': timedelta(hours=1)  # Default to 1 hour cache
-}
+# Cache for rain data (shared by all workers, see shared_cache.py)
+RAIN_CACHE_KEY = 'barcelona_rain'
+# The entry is kept for the day; freshness is decided in get_barcelona_rain
+RAIN_CACHE_TTL = 24 * 3600
+
+def get_rain_cache():
+    """Return {'last_update', 'data', 'cache_duration'} or an empty cache"""
+    entry = shared_cache.get_entry(RAIN_CACHE_KEY)
+    if entry is None:
+        return {
+            'last_update': None,
+            'data': None,
+            'cache_duration': timedelta(hours=1)
+        }
+    return entry.value
 
 def clear_rain_cache():
     """Clear the rain cache and log the action"""
-    global rain_cache
-    rain_cache = {
-        'last_update': None,
-        'data': None,
-        'cache_duration': timedelta(hours=1)
-    }
+    shared_cache.delete(RAIN_CACHE_KEY)
     logger.info("Rain cache cleared")
 
 @barcelona_rain_bp.route('/api/barcelona-rain')
@@ -38,6 +43,7 @@ def get_barcelona_rain():
         
         # Get current time in Madrid timezone
         now = datetime.now(pytz.timezone('Europe/Madrid'))
+        rain_cache = get_rain_cache()
 
         # First check if it's raining using OpenWeather's current weather
         OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
@@ -70,7 +76,7 @@ def get_barcelona_rain():
             today_rain = 0
 
         # Get last accumulation record from MongoDB
-        last_record = db.rain_accumulation.find_one(sort=[("date", -1)])
+        last_record = get_db().rain_accumulation.find_one({}, {"_id": 0, "date": 1, "accumulated": 1}, sort=[("date", -1)])
         if not last_record:
             error_msg = "No rain accumulation data found in database"
             logger.error(error_msg)
@@ -162,10 +168,13 @@ def get_barcelona_rain():
         }
         
         # Update cache with dynamic duration
-        rain_cache['data'] = response_data
-        rain_cache['last_update'] = now
-        # If it's raining, cache for 20 minutes, otherwise for 1 hour
-        rain_cache['cache_duration'] = timedelta(minutes=20) if is_raining else timedelta(hours=1)
+        rain_cache = {
+            'data': response_data,
+            'last_update': now,
+            # If it's raining, cache for 20 minutes, otherwise for 1 hour
+            'cache_duration': timedelta(minutes=20) if is_raining else timedelta(hours=1)
+        }
+        shared_cache.set(RAIN_CACHE_KEY, rain_cache, ttl=RAIN_CACHE_TTL)
         
         logger.info(f"Updated cache with new rain data. Cache duration: {rain_cache['cache_duration']}")
         return jsonify(response_data)
@@ -4,7 +4,8 @@ import os
 import requests
 from datetime import datetime, timedelta
 import pytz
-from pymongo import MongoClient
+from mongo_pool import get_db
+from burgos_daily_rollup import get_daily_extremes
 
 # Fetch data from AEMET
 # Configure logging
@@ -14,19 +15,18 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 burgos_bp = Blueprint('burgos', __name__)
 
-# MongoDB connection
-try:
-    mongo_uri = os.getenv("MONGODB_URI")
-    if not mongo_uri:
-        raise ValueError("MONGODB_URI environment variable not set")
+# Partes del payload de Google Weather que usa /api/burgos-weather
+GW_RAW_FIELDS = ('temperature', 'relativeHumidity', 'airPressure', 'wind',
+                 'weatherCondition', 'cloudCover', 'currentConditionsHistory')
+GW_CURRENT_PROJECTION = {
+    '_id': 0,
+    'timestamp': 1,
+    **{f'google_weather_burgos_center.raw_data.{field}': 1 for field in GW_RAW_FIELDS},
+}
 
-    client = MongoClient(mongo_uri)
-    db = client.meteosarria
-    rain_collection = db.burgos_rain_accumulation
-    logger.info("Connected to MongoDB")
-except Exception as e:
-    logger.error(f"Error connecting to MongoDB: {e}")
-    raise
+def get_rain_collection():
+    """Colección de lluvia acumulada de Burgos (pool compartido)"""
+    return get_db().burgos_rain_accumulation
 
 class AEMETWeatherAPI:
     def __init__(self, api_key):
@@ -241,12 +241,11 @@ class AEMETWeatherAPI:
 def get_burgos_weather():
     try:
         # Conectar a la nueva colección de Google Weather
-        from database import get_db
         db = get_db()
         gw_collection = db.gw_burgos_data
         
         # Obtener el último registro de Google Weather para Burgos Centro
-        latest_record = gw_collection.find_one(sort=[('timestamp', -1)])
+        latest_record = gw_collection.find_one({}, GW_CURRENT_PROJECTION, sort=[('timestamp', -1)])
         
         if not latest_record:
             logger.error("No se encontraron datos de Google Weather para Burgos Centro")
@@ -259,7 +258,7 @@ def get_burgos_weather():
         logger.info(f"Datos de Google Weather: {raw_data}")
 
         # Obtener el último registro de lluvia acumulada
-        last_rain_record = rain_collection.find_one(sort=[("date", -1)])
+        last_rain_record = get_rain_collection().find_one({}, {"_id": 0, "accumulated": 1}, sort=[("date", -1)])
         total_rain = last_rain_record['accumulated'] if last_rain_record else 0
 
         # Fecha de observación
@@ -390,99 +389,35 @@ def get_burgos_weather():
 
 @burgos_bp.route('/api/burgos-daily-extremes', methods=['GET'])
 def get_burgos_daily_extremes():
-    """Calculate daily temperature extremes for Burgos from historical data"""
+    """Today's temperature extremes for Burgos from the gw_burgos_daily rollup"""
     try:
-        from database import get_db
-        db = get_db()
-        gw_collection = db.gw_burgos_data
-        
-        # Get today's date at 00:00 in Madrid timezone
-        from datetime import datetime, timezone
-        import pytz
-        
         madrid_tz = pytz.timezone('Europe/Madrid')
-        now_madrid = datetime.now(madrid_tz)
-        start_of_day_madrid = now_madrid.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        logger.info(f"Calculating daily extremes from {start_of_day_madrid.isoformat()}")
-        
-        # Get enough historical data (200 records should cover more than 24h)
-        historical_data = list(gw_collection.find().sort('timestamp', -1).limit(200))
-        
-        if not historical_data:
-            logger.error("No historical data available for daily extremes calculation")
-            return jsonify({"error": "No historical data available"}), 500
-        
-        # Filter today's data
-        today_records = []
-        for record in historical_data:
-            # Parse timestamp from database
-            if isinstance(record['timestamp'], str):
-                record_time = datetime.fromisoformat(record['timestamp'].replace('Z', '+00:00'))
-            else:
-                record_time = record['timestamp']
-                if record_time.tzinfo is None:
-                    record_time = record_time.replace(tzinfo=timezone.utc)
-            
-            # Convert to Madrid timezone
-            record_madrid = record_time.astimezone(madrid_tz)
-            
-            # Check if record is from today
-            if (record_madrid.date() == start_of_day_madrid.date()):
-                today_records.append({
-                    'timestamp': record['timestamp'],
-                    'madrid_time': record_madrid,
-                    'data': record
-                })
-        
-        logger.info(f"Found {len(today_records)} records for today")
+        today = datetime.now(madrid_tz).date()
         
-        if not today_records:
-            return jsonify({"error": "No data available for today"}), 500
+        # One _id lookup; indexed range aggregation only if today has no rollup yet
+        extremes, source = get_daily_extremes(today)
         
-        # Calculate extremes
-        max_temp = float('-inf')
-        min_temp = float('inf')
-        max_temp_time = None
-        min_temp_time = None
-        
-        for record in today_records:
-            # Extract temperature from the record
-            temp = None
-            data = record['data']
-            
-            if data.get('google_weather_burgos_center', {}).get('temperature') is not None:
-                temp = float(data['google_weather_burgos_center']['temperature'])
-            elif data.get('raw_data', {}).get('temperature', {}).get('degrees') is not None:
-                temp = float(data['raw_data']['temperature']['degrees'])
-            
-            if temp is not None and not (temp < -20 or temp > 45):  # Validate temperature
-                if temp > max_temp:
-                    max_temp = temp
-                    max_temp_time = record['madrid_time']
-                
-                if temp < min_temp:
-                    min_temp = temp
-                    min_temp_time = record['madrid_time']
-        
-        # Prepare response
-        if max_temp == float('-inf') or min_temp == float('inf'):
+        if not extremes:
             return jsonify({"error": "No valid temperature data found for today"}), 500
         
+        def madrid_time(ts):
+            return pytz.utc.localize(ts).astimezone(madrid_tz).strftime("%H:%M") if ts else None
+        
         result = {
             "success": True,
-            "date": start_of_day_madrid.strftime("%Y-%m-%d"),
+            "date": today.strftime("%Y-%m-%d"),
             "extremes": {
-                "max_temperature": round(max_temp, 1),
-                "max_temperature_time": max_temp_time.strftime("%H:%M") if max_temp_time else None,
-                "min_temperature": round(min_temp, 1), 
-                "min_temperature_time": min_temp_time.strftime("%H:%M") if min_temp_time else None
+                "max_temperature": round(extremes['max'], 1),
+                "max_temperature_time": madrid_time(extremes.get('max_ts')),
+                "min_temperature": round(extremes['min'], 1), 
+                "min_temperature_time": madrid_time(extremes.get('min_ts'))
             },
-            "records_analyzed": len(today_records),
+            "records_analyzed": extremes['count'],
+            "source": source,
             "timezone": "Europe/Madrid"
         }
         
-        logger.info(f"Daily extremes calculated: Max {max_temp}°C at {max_temp_time}, Min {min_temp}°C at {min_temp_time}")
+        logger.info(f"Daily extremes ({source}): Max {extremes['max']}°C, Min {extremes['min']}°C")
         
         return jsonify(result)
         
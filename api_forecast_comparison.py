@@ -11,14 +11,14 @@ api_aemet_forecast.py en vez de duplicar la lógica de fetch/caché.
 from flask import Blueprint, jsonify
 import logging
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import requests
 import pytz
 from dotenv import load_dotenv
 
 import api_ai_forecast as ai_forecast
 import api_aemet_forecast as aemet_forecast
-from forecast_common import day_and_date
+from forecast_common import ForecastCache, day_and_date
 
 load_dotenv()
 
@@ -29,6 +29,8 @@ forecast_comparison_bp = Blueprint('forecast_comparison', __name__)
 
 FORECAST_DAYS = 8
 CACHE_HOURS = float(os.getenv('FORECAST_COMPARISON_CACHE_HOURS', 3))
+# Tras caducar, la previsión se sigue sirviendo este tiempo mientras se refresca
+STALE_HOURS = float(os.getenv('FORECAST_COMPARISON_STALE_HOURS', CACHE_HOURS))
 
 # Modelos individuales pedidos a Open-Meteo (en vez del blend "best_match")
 MODELS = {
@@ -37,23 +39,11 @@ MODELS = {
     'icon': 'icon_seamless',
 }
 
-_cache = {}
+CACHE_PREFIX = 'forecast_comparison:'
 
 
-def _get_cached(city):
-    entry = _cache.get(city)
-    if not entry:
-        return None
-    if datetime.now(pytz.timezone('Europe/Madrid')) - entry['updated_at'] > timedelta(hours=CACHE_HOURS):
-        return None
-    return entry['payload']
-
-
-def _set_cached(city, payload):
-    _cache[city] = {
-        'payload': payload,
-        'updated_at': datetime.now(pytz.timezone('Europe/Madrid')),
-    }
+forecast_cache = ForecastCache(CACHE_PREFIX, lambda city: _build_payload(city),
+                               CACHE_HOURS, STALE_HOURS)
 
 
 def _fetch_models_daily(lat, lon):
@@ -89,65 +79,63 @@ def _build_models_by_date(daily):
     return by_date
 
 
+def _build_payload(city):
+    om_info = ai_forecast.CITIES[city]
+    aemet_info = aemet_forecast.MUNICIPIOS[city]
+
+    daily_om = ai_forecast._fetch_open_meteo(om_info['lat'], om_info['lon'])
+    om_rows = ai_forecast._build_rows(daily_om)
+
+    aemet_dias = aemet_forecast._fetch_aemet_dias(aemet_info['code'])
+    aemet_rows = aemet_forecast._build_rows(aemet_dias)
+    aemet_by_date = {r['date']: r for r in aemet_rows}
+
+    daily_models = _fetch_models_daily(om_info['lat'], om_info['lon'])
+    models_by_date = _build_models_by_date(daily_models)
+
+    rows = []
+    for i, om_row in enumerate(om_rows):
+        date_iso = daily_om['time'][i]
+        model_data = models_by_date.get(date_iso, {})
+        aemet_row = aemet_by_date.get(om_row['date'])
+
+        rows.append({
+            'day': om_row['day'],
+            'date': om_row['date'],
+            'open_meteo': {
+                'tmax': om_row['tmax'], 'tmin': om_row['tmin'], 'precip_prob': om_row['precip_prob'],
+            },
+            'aemet': {
+                'tmax': aemet_row['tmax'], 'tmin': aemet_row['tmin'], 'precip_prob': aemet_row['precip_prob'],
+            } if aemet_row else None,
+            'ecmwf': model_data.get('ecmwf'),
+            'gfs': model_data.get('gfs'),
+            'icon': model_data.get('icon'),
+        })
+
+    payload = {
+        'city': city,
+        'label': om_info['label'],
+        'updated_at': datetime.now(pytz.timezone('Europe/Madrid')).isoformat(),
+        'rows': rows,
+    }
+    return payload
+
+
 @forecast_comparison_bp.route('/api/forecast-comparison/<city>')
 def get_forecast_comparison(city):
     city = city.lower()
     if city not in ai_forecast.CITIES or city not in aemet_forecast.MUNICIPIOS:
         return jsonify({'error': f"Ciudad desconocida: {city}"}), 404
 
-    cached = _get_cached(city)
-    if cached:
-        return jsonify(cached)
-
     try:
-        om_info = ai_forecast.CITIES[city]
-        aemet_info = aemet_forecast.MUNICIPIOS[city]
-
-        daily_om = ai_forecast._fetch_open_meteo(om_info['lat'], om_info['lon'])
-        om_rows = ai_forecast._build_rows(daily_om)
-
-        aemet_dias = aemet_forecast._fetch_aemet_dias(aemet_info['code'])
-        aemet_rows = aemet_forecast._build_rows(aemet_dias)
-        aemet_by_date = {r['date']: r for r in aemet_rows}
-
-        daily_models = _fetch_models_daily(om_info['lat'], om_info['lon'])
-        models_by_date = _build_models_by_date(daily_models)
-
-        rows = []
-        for i, om_row in enumerate(om_rows):
-            date_iso = daily_om['time'][i]
-            model_data = models_by_date.get(date_iso, {})
-            aemet_row = aemet_by_date.get(om_row['date'])
-
-            rows.append({
-                'day': om_row['day'],
-                'date': om_row['date'],
-                'open_meteo': {
-                    'tmax': om_row['tmax'], 'tmin': om_row['tmin'], 'precip_prob': om_row['precip_prob'],
-                },
-                'aemet': {
-                    'tmax': aemet_row['tmax'], 'tmin': aemet_row['tmin'], 'precip_prob': aemet_row['precip_prob'],
-                } if aemet_row else None,
-                'ecmwf': model_data.get('ecmwf'),
-                'gfs': model_data.get('gfs'),
-                'icon': model_data.get('icon'),
-            })
-
-        payload = {
-            'city': city,
-            'label': om_info['label'],
-            'updated_at': datetime.now(pytz.timezone('Europe/Madrid')).isoformat(),
-            'rows': rows,
-        }
-
-        _set_cached(city, payload)
-        return jsonify(payload)
+        return jsonify(forecast_cache.get_or_build(city))
     except requests.exceptions.RequestException as e:
         logger.error(f"Error obteniendo comparación de previsión para {city}: {e}")
-        stale = _cache.get(city)
+        stale = forecast_cache.get_stale(city)
         if stale:
             logger.warning(f"Sirviendo comparación cacheada (caducada) de {city} por fallo de una fuente")
-            stale_payload = dict(stale['payload'])
+            stale_payload = dict(stale)
             stale_payload['stale'] = True
             stale_payload['stale_reason'] = str(e)
             return jsonify(stale_payload)
@@ -160,5 +148,5 @@ def get_forecast_comparison(city):
 @forecast_comparison_bp.route('/api/forecast-comparison/<city>/clear-cache', methods=['POST'])
 def clear_forecast_comparison_cache(city):
     city = city.lower()
-    _cache.pop(city, None)
+    forecast_cache.delete(city)
     return jsonify({'status': 'success', 'message': f'Caché de comparación de {city} borrada'})
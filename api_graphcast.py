@@ -14,16 +14,41 @@ Endpoints:
   POST /api/graphcast/run-pipeline          → lanza pipeline en background
   GET  /api/graphcast/status                → estado + pasos disponibles
   GET  /api/graphcast/tiles/<z>/<x>/<y>     → tesela PNG (rio-tiler)
-         ?var=t2m|tp|wind  &step=6..240
+         ?var=t2m|tp|wind  &step=24..240
+         z en [GRAPHCAST_TILE_MIN_ZOOM, GRAPHCAST_TILE_MAX_ZOOM] (0-12)
+
+Las teselas renderizadas se guardan por run (tile_cache: LRU en memoria +
+GRAPHCAST_DIR/tiles en disco) hasta que el pipeline publica el siguiente.
+
+Con GRAPHCAST_PRERENDER=true el pipeline, tras publicar el run, renderiza en
+un pool de procesos toda la pirámide de la Península (GRAPHCAST_PRERENDER_ZOOMS,
+por defecto 4-9) para cada (var, step) y la deja en la capa de disco; esas
+teselas se sirven con send_file.
+
+Las teselas no cacheadas se cortan de Readers que cada hilo mantiene abiertos
+para el run publicado (raster_registry), en lugar de reabrir el GeoTIFF.
+
+Solo corre un pipeline por máquina aunque haya varios workers: lo protege el
+lock PIPELINE_LOCK de process_lock, y su estado (progreso, etapas) se guarda
+en shared_cache para que /status lo vea desde cualquier worker.
 """
 
 import os
 import sys
+import json
 import threading
 import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
 from datetime import datetime, timezone, timedelta
 
-from flask import Blueprint, jsonify, request, make_response
+from flask import Blueprint, jsonify, request, make_response, send_file
+
+import process_lock
+import shared_cache
+from raster_registry import RasterRegistry
+from tile_cache import EMPTY, TileCache
 
 # ── Logging a stdout (visible en Render) ────────────────────────────────────
 logging.basicConfig(
@@ -41,11 +66,71 @@ graphcast_bp = Blueprint("graphcast", __name__)
 # ---------------------------------------------------------------------------
 
 GRAPHCAST_DIR = "/tmp/graphcast"
+TILES_DIR = os.path.join(GRAPHCAST_DIR, "tiles")
+# Run publicado (compartido por todos los workers)
+RUN_MANIFEST = os.path.join(GRAPHCAST_DIR, "run.json")
+
+# Un solo pipeline por máquina (process_lock), con su estado en shared_cache
+# para que /status responda lo mismo desde cualquier worker
+PIPELINE_LOCK = "graphcast_pipeline"
+STATUS_KEY = "graphcast:status"
+STATUS_TTL = 7 * 86400
 STEPS = list(range(24, 241, 24))  # 24, 48, 72, …, 240 h (resolución diaria, 10 pasos)
 
+# Recorte de la Península Ibérica: (lon_min, lat_min, lon_max, lat_max)
+IBERIA_BOUNDS = (-9.5, 35.5, 4.5, 44.5)
+
+# Zooms que sirve /api/graphcast/tiles (fuera de este rango: 400)
+TILE_MIN_ZOOM = int(os.getenv("GRAPHCAST_TILE_MIN_ZOOM", "0"))
+TILE_MAX_ZOOM = int(os.getenv("GRAPHCAST_TILE_MAX_ZOOM", "12"))
+
+def _default_workers(cap=4):
+    """
+    Procesos por defecto de los pools: las CPUs que puede usar este proceso
+    (sched_getaffinity, no os.cpu_count(), que en un contenedor da los
+    núcleos del host), con un máximo de cap. Cada proceso importa xarray,
+    cfgrib y rasterio.
+    """
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:  # sin sched_getaffinity (macOS, Windows)
+        available = os.cpu_count() or 1
+    return max(1, min(available, cap))
+
+
+# Pre-renderizado de la pirámide de teselas tras publicar un run
+PRERENDER_ENABLED = os.getenv("GRAPHCAST_PRERENDER", "false").lower() == "true"
+PRERENDER_ZOOMS = os.getenv("GRAPHCAST_PRERENDER_ZOOMS", "4-9")
+PRERENDER_WORKERS = int(os.getenv("GRAPHCAST_PRERENDER_WORKERS", "0")) or _default_workers()
+
 # Parámetros a descargar (GRIB2 shortName)
 GRIB_PARAMS = ["2t", "tp", "10u", "10v"]
 
+# Campos GRIB de cada capa (ver _layer_values)
+LAYER_GRIB_PARAMS = {
+    "t2m": ("2t",),
+    "tp": ("tp",),
+    "wind": ("10u", "10v"),
+}
+
+# Formato de los GeoTIFF: COG con bloques internos de 256×256, overviews y
+# predictor de coma flotante (PREDICTOR=YES elige 3 para float32), para que
+# una tesela lea solo los bloques y el nivel de overview que necesita.
+# GDAL no genera overviews de un raster que cabe en un bloque.
+RASTER_PROFILE = {
+    "driver": "COG",
+    "compress": "lzw",
+    "predictor": "YES",
+    "blocksize": 256,
+    "overviews": "AUTO",
+    "overview_resampling": "average",
+}
+# Formato anterior (GeoTIFF en tiras, sin overviews); lo usa bench_tiles.py
+PLAIN_RASTER_PROFILE = {"driver": "GTiff", "compress": "lzw"}
+
+# Procesos para la conversión GRIB2 → GeoTIFF (uno por capa y paso)
+CONVERT_WORKERS = int(os.getenv("GRAPHCAST_CONVERT_WORKERS", "0")) or _default_workers()
+
 VARIABLES_CONFIG = {
     "t2m": {
         "label": "Temperatura 2m (°C)",
@@ -117,7 +202,7 @@ def _get_lut(cm_name: str):
     return lut
 
 # ---------------------------------------------------------------------------
-# Estado global (protegido por lock)
+# Estado global (protegido por lock; copia en shared_cache para los demás workers)
 # ---------------------------------------------------------------------------
 
 _lock = threading.Lock()
@@ -128,17 +213,32 @@ _status = {
     "run_date": None,
     "run_time": None,
     "available_steps": {},
+    "prerender": None,
+    "timings": {},
 }
 
 
 def _update(**kw):
     with _lock:
         _status.update(kw)
+        _share_status()
     # Forzar flush para que Render muestre el log inmediatamente
     sys.stdout.flush()
 
 
+def _share_status():
+    """Copia _status en shared_cache (llamar con _lock)."""
+    shared_cache.set(STATUS_KEY, dict(_status), ttl=STATUS_TTL)
+
+
 def _get():
+    """Estado del último pipeline de la máquina (lo haya lanzado este worker u otro)."""
+    with _lock:
+        if process_lock.is_leader(PIPELINE_LOCK):
+            return dict(_status)
+    shared = shared_cache.get(STATUS_KEY)
+    if shared is not None:
+        return dict(shared)
     with _lock:
         return dict(_status)
 
@@ -149,6 +249,77 @@ def _log(msg: str):
     sys.stdout.flush()
 
 
+def _record_timing(stage: str, since: float):
+    """Guarda en _status["timings"] los segundos de una etapa del pipeline."""
+    seconds = round(time.monotonic() - since, 1)
+    with _lock:
+        _status["timings"] = dict(_status["timings"], **{stage: seconds})
+        _share_status()
+    _log(f"  Etapa {stage}: {seconds}s")
+
+
+# ---------------------------------------------------------------------------
+# Run publicado y caché de teselas
+# ---------------------------------------------------------------------------
+
+tile_cache = TileCache(TILES_DIR)
+
+_run_lock = threading.Lock()
+_run_seen = {"mtime": None, "run": None, "published": None}
+
+
+def _publish_run(run_date: str, run_time: str, available_steps: dict):
+    """Publica el run (manifiesto atómico) e invalida las teselas de runs anteriores."""
+    run = f"{run_date}{run_time}z"
+    manifest = {
+        "run": run,
+        "run_date": run_date,
+        "run_time": f"{run_time}z",
+        "published_at": datetime.now(timezone.utc).isoformat(),
+        "available_steps": available_steps,
+    }
+    tmp_path = RUN_MANIFEST + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, RUN_MANIFEST)
+    tile_cache.invalidate(keep_run=run)
+    _current_publication()
+    _log(f"Run {run} publicado; teselas de runs anteriores invalidadas")
+
+
+def _current_publication():
+    """
+    (run, published_at) de la última publicación, o (None, None); relee el
+    manifiesto si ha cambiado. Relanzar el pipeline para el mismo run (p. ej.
+    tras una conversión parcial) lo vuelve a publicar con el mismo nombre, así
+    que lo que identifica los GeoTIFF vigentes es published_at, no run.
+    """
+    try:
+        mtime = os.stat(RUN_MANIFEST).st_mtime_ns
+    except OSError:
+        return None, None
+    with _run_lock:
+        if mtime == _run_seen["mtime"]:
+            return _run_seen["run"], _run_seen["published"]
+        try:
+            with open(RUN_MANIFEST) as f:
+                manifest = json.load(f)
+            run = manifest["run"]
+        except (OSError, ValueError, KeyError):
+            return _run_seen["run"], _run_seen["published"]
+        published = manifest.get("published_at") or mtime
+        if _run_seen["published"] is not None and published != _run_seen["published"]:
+            # Otro worker ha publicado (un run nuevo o el mismo otra vez)
+            tile_cache.clear_memory()
+        _run_seen.update(mtime=mtime, run=run, published=published)
+        return run, published
+
+
+def _current_run():
+    """Run publicado (p. ej. '2025061200z') o None."""
+    return _current_publication()[0]
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
@@ -172,6 +343,9 @@ def geotiff_path(var: str, step: int) -> str:
     return os.path.join(GRAPHCAST_DIR, f"{var}_step{step:03d}.tif")
 
 
+rasters = RasterRegistry(geotiff_path)
+
+
 # ---------------------------------------------------------------------------
 # Pipeline
 # ---------------------------------------------------------------------------
@@ -191,32 +365,110 @@ def _open_grib_var(grib_file: str, short_name: str):
 
 
 def _clip_iberia(da):
-    """Recorta a [-9.5, 4.5] lon / [35.5, 44.5] lat, normalizando 0-360 si es necesario."""
+    """Recorta a IBERIA_BOUNDS ([-9.5, 4.5] lon / [35.5, 44.5] lat), normalizando 0-360 si es necesario."""
+    lon_min, lat_min, lon_max, lat_max = IBERIA_BOUNDS
     if float(da.longitude.max()) > 180:
         da = da.assign_coords(longitude=((da.longitude + 180) % 360) - 180)
         da = da.sortby("longitude")
     lat0, lat1 = float(da.latitude[0]), float(da.latitude[-1])
     if lat0 > lat1:
-        return da.sel(latitude=slice(44.5, 35.5), longitude=slice(-9.5, 4.5))
-    return da.sel(latitude=slice(35.5, 44.5), longitude=slice(-9.5, 4.5))
+        return da.sel(latitude=slice(lat_max, lat_min), longitude=slice(lon_min, lon_max))
+    return da.sel(latitude=slice(lat_min, lat_max), longitude=slice(lon_min, lon_max))
 
 
-def _to_raster(da, path: str):
+def _to_raster(da, path: str, profile: dict = None):
     da = da.squeeze(drop=True)
     da = da.rio.write_crs("EPSG:4326")
     da = da.rio.set_spatial_dims(x_dim="longitude", y_dim="latitude")
-    da.rio.to_raster(path, driver="GTiff", compress="lzw")
+    da.rio.to_raster(path, **(profile or RASTER_PROFILE))
 
 
-def _run_pipeline():
-    """Hilo background: GRIB2 → GeoTIFF."""
-    import numpy as np
-    import xarray as xr
+def _process_pool(workers: int):
+    # spawn: el pipeline corre en un hilo junto a los de gunicorn y fork
+    # podría heredar locks tomados
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+
+def _main_var(ds):
+    """La variable principal de un dataset abierto con _open_grib_var."""
+    data_vars = [v for v in ds.data_vars if v not in ("valid_time", "number")]
+    if not data_vars:
+        raise ValueError("dataset vacío")
+    return ds[data_vars[0]]
+
+
+def _index_grib(grib_file: str) -> dict:
+    """
+    Abre cada parámetro una vez antes de repartir el trabajo, para que cfgrib
+    escriba sus índices (.idx) en serie y no desde varios procesos a la vez.
+    Devuelve {shortName: nº de pasos}.
+    """
+    n_steps = {}
+    for short_name in GRIB_PARAMS:
+        try:
+            with _open_grib_var(grib_file, short_name) as ds:
+                da = _main_var(ds)
+                if "step" not in da.dims:
+                    _log(f"  AVISO: {short_name} no tiene dimensión 'step'")
+                    continue
+                n_steps[short_name] = min(len(STEPS), int(da.step.size))
+                _log(f"  {short_name}: variable {da.name}, {n_steps[short_name]} pasos")
+        except Exception as e:
+            _log(f"  AVISO: no se pudo abrir {short_name}: {e}")
+    return n_steps
+
+
+def _layer_values(key: str, fields: list):
+    """Valores de una capa a partir de sus campos GRIB (recortados, un paso)."""
+    if key == "t2m":
+        return fields[0] - 273.15          # K → °C
+    if key == "tp":
+        return fields[0] * 1000            # m → mm
+    if key == "wind":
+        u, v = fields                       # √(u10² + v10²)
+        return (u ** 2 + v ** 2) ** 0.5
+    raise ValueError(f"Capa desconocida: {key}")
+
+
+def _convert_step(grib_file: str, key: str, i: int, step: int) -> str:
+    """
+    Tarea del pool: escribe el GeoTIFF de una capa para un paso. El viento se
+    calcula en memoria con u10/v10 del mismo paso.
+    """
     import rioxarray  # noqa: F401 – activa el accessor .rio
 
+    datasets = [_open_grib_var(grib_file, p) for p in LAYER_GRIB_PARAMS[key]]
+    try:
+        fields = [_clip_iberia(_main_var(ds)).isel(step=i).load() for ds in datasets]
+        path = geotiff_path(key, step)
+        # Sustitución atómica: los Readers abiertos del run publicado siguen
+        # leyendo el fichero anterior hasta que se publica este
+        tmp_path = path + ".tmp"
+        _to_raster(_layer_values(key, fields), tmp_path)
+        os.replace(tmp_path, path)
+        return path
+    finally:
+        for ds in datasets:
+            ds.close()
+
+
+def _run_pipeline():
+    """Hilo background: GRIB2 → GeoTIFF. Suelta PIPELINE_LOCK al terminar."""
+    try:
+        _run_pipeline_stages()
+    finally:
+        process_lock.release(PIPELINE_LOCK)
+
+
+def _run_pipeline_stages():
+    # rasterio antes que cfgrib/eccodes: con el orden inverso el proceso
+    # puede abortar al salir (librerías nativas duplicadas)
+    import rioxarray  # noqa: F401
+
     os.makedirs(GRAPHCAST_DIR, exist_ok=True)
 
     try:
+        started = time.monotonic()
         run_date, run_time = get_latest_run()
 
         # ── 1. Descarga GRIB2 ────────────────────────────────────────────
@@ -237,84 +489,40 @@ def _run_pipeline():
         )
         size_mb = os.path.getsize(grib_file) / 1e6
         _log(f"GRIB2 descargado: {size_mb:.1f} MB")
+        _record_timing("download", started)
 
         # ── 2. GRIB2 → GeoTIFFs recortados a la Península Ibérica ────────
         _update(state="processing",
                 message="Procesando variables… (puede tardar varios minutos)")
         _log("Iniciando conversión GRIB2 → GeoTIFF")
 
-        local: dict[str, dict[int, str]] = {
-            "t2m": {}, "tp": {}, "u10": {}, "v10": {}}
-
-        # Definición de cada variable: (shortName, clave_local, transformación)
-        var_specs = [
-            ("2t",  "t2m", lambda x: x - 273.15),   # K → °C
-            ("tp",  "tp",  lambda x: x * 1000),       # m → mm
-            ("10u", "u10", lambda x: x),
-            ("10v", "v10", lambda x: x),
+        stage = time.monotonic()
+        n_steps = _index_grib(grib_file)
+        jobs = [
+            (key, i, STEPS[i])
+            for key, params in LAYER_GRIB_PARAMS.items()
+            if all(p in n_steps for p in params)
+            for i in range(min(n_steps[p] for p in params))
         ]
-
-        for short_name, key, transform in var_specs:
-            _update(message=f"Procesando {short_name}…")
-            _log(f"  Abriendo {short_name} con filter_by_keys…")
-            try:
-                ds = _open_grib_var(grib_file, short_name)
-            except Exception as e:
-                _log(f"  AVISO: no se pudo abrir {short_name}: {e}")
-                continue
-
-            # La variable principal del dataset
-            data_vars = [v for v in ds.data_vars
-                         if v not in ("valid_time", "number")]
-            if not data_vars:
-                _log(f"  AVISO: dataset de {short_name} vacío")
-                continue
-            main_var = data_vars[0]
-            _log(f"  Variable principal en dataset: {main_var}")
-
-            da = ds[main_var]
-            da_ib = _clip_iberia(da)
-
-            if "step" not in da_ib.dims:
-                _log(f"  AVISO: {short_name} no tiene dimensión 'step'")
-                continue
-
-            n = min(len(STEPS), int(da_ib.step.size))
-            _log(f"  Escribiendo {n} GeoTIFFs para {key}…")
-            for i in range(n):
-                s = STEPS[i]
+        _record_timing("index", stage)
+
+        stage = time.monotonic()
+        local: dict[str, dict[int, str]] = {key: {} for key in LAYER_GRIB_PARAMS}
+        _log(f"  Escribiendo {len(jobs)} GeoTIFFs con {CONVERT_WORKERS} procesos…")
+        with _process_pool(CONVERT_WORKERS) as pool:
+            futures = {pool.submit(_convert_step, grib_file, key, i, s): (key, s)
+                       for key, i, s in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                key, s = futures[future]
                 try:
-                    step_da = transform(da_ib.isel(step=i))
-                    path = geotiff_path(key, s)
-                    _to_raster(step_da, path)
-                    local[key][s] = path
+                    local[key][s] = future.result()
                 except Exception as e:
                     _log(f"  Error guardando {key} +{s}h: {e}")
+                _update(message=f"Convirtiendo GeoTIFFs… {done}/{len(jobs)}")
 
-            _log(f"  {key}: {len(local[key])} pasos guardados")
-            ds.close()
-
-        # ── Viento: √(u10² + v10²) ────────────────────────────────────────
-        _update(message="Calculando velocidad de viento…")
-        _log("Calculando velocidad de viento…")
-        local["wind"] = {}
-        for s in STEPS:
-            u_p = local["u10"].get(s)
-            v_p = local["v10"].get(s)
-            if not (u_p and v_p):
-                continue
-            try:
-                u = xr.open_dataarray(u_p, engine="rasterio")
-                v = xr.open_dataarray(v_p, engine="rasterio")
-                wind = np.sqrt(u**2 + v**2)
-                path = geotiff_path("wind", s)
-                wind.rio.write_crs("EPSG:4326")
-                wind.rio.to_raster(path, driver="GTiff", compress="lzw")
-                local["wind"][s] = path
-            except Exception as e:
-                _log(f"  Error viento +{s}h: {e}")
-
-        _log(f"  wind: {len(local['wind'])} pasos guardados")
+        for key, steps in local.items():
+            _log(f"  {key}: {len(steps)} pasos guardados")
+        _record_timing("convert", stage)
 
         # ── Resumen ────────────────────────────────────────────────────────
         available_steps = {
@@ -325,6 +533,9 @@ def _run_pipeline():
         _log(f"Pipeline completado. Pasos disponibles: "
              f"{ {v: len(s) for v, s in available_steps.items()} }")
 
+        _publish_run(run_date, run_time, available_steps)
+        _record_timing("total", started)
+
         _update(
             state="ready",
             message=f"Pipeline completado. Run: {run_date} {run_time}z",
@@ -338,6 +549,107 @@ def _run_pipeline():
         _log(f"ERROR en pipeline: {exc}")
         logger.exception("Pipeline AIFS falló")
         _update(state="error", message=str(exc))
+        return
+
+    # ── 3. Pirámide de teselas (opcional) ────────────────────────────────
+    # El run ya está publicado: mientras tanto las teselas se renderizan
+    # bajo demanda, y un fallo aquí no invalida el pipeline.
+    if PRERENDER_ENABLED:
+        try:
+            _prerender_tiles(f"{run_date}{run_time}z", available_steps)
+        except Exception as exc:
+            logger.exception("Pre-renderizado de teselas falló")
+            _update(prerender=dict(_get()["prerender"] or {}, state="error", message=str(exc)))
+
+
+# ---------------------------------------------------------------------------
+# Pre-renderizado de teselas
+# ---------------------------------------------------------------------------
+
+def _parse_zooms(spec: str) -> list:
+    """'4-9' → [4, 5, 6, 7, 8, 9]; también admite '4,6,8'."""
+    zooms = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            zooms.update(range(int(lo), int(hi) + 1))
+        elif part:
+            zooms.add(int(part))
+    return sorted(zooms)
+
+
+def _iberia_tiles(zooms: list) -> list:
+    """(z, x, y) de las teselas WebMercator que cubren IBERIA_BOUNDS."""
+    import morecantile
+    tms = morecantile.tms.get("WebMercatorQuad")
+    return [(t.z, t.x, t.y) for t in tms.tiles(*IBERIA_BOUNDS, zooms=zooms)]
+
+
+def _prerender_var_step(run: str, var: str, step: int, tiles: list):
+    """
+    Tarea del pool: renderiza las teselas de un (var, step) abriendo el
+    GeoTIFF una sola vez y las escribe en la capa de disco de tile_cache.
+    Devuelve (escritas, errores).
+    """
+    from rio_tiler.io import Reader
+
+    written = errors = 0
+    with Reader(geotiff_path(var, step)) as src:
+        for z, x, y in tiles:
+            try:
+                content = _render_tile(var, step, z, x, y, src=src)
+            except Exception as e:
+                logger.error(f"Pre-renderizado {z}/{x}/{y} ({var}+{step}h): {e}")
+                errors += 1
+                continue
+            if tile_cache.write((run, var, step, z, x, y), content):
+                written += 1
+            else:
+                errors += 1
+    return written, errors
+
+
+def _prerender_tiles(run: str, available_steps: dict):
+    """Renderiza la pirámide completa de un run en un pool de procesos."""
+    zooms = _parse_zooms(PRERENDER_ZOOMS)
+    tiles = _iberia_tiles(zooms)
+    jobs = [(var, step) for var, steps in available_steps.items() for step in steps]
+    progress = {
+        "state": "running",
+        "run": run,
+        "zooms": zooms,
+        "workers": PRERENDER_WORKERS,
+        "tiles_total": len(jobs) * len(tiles),
+        "tiles_done": 0,
+        "errors": 0,
+        "seconds": None,
+    }
+    _update(prerender=dict(progress))
+    _log(f"Pre-renderizando {progress['tiles_total']} teselas (z{zooms[0]}-{zooms[-1]}, "
+         f"{len(jobs)} capas) con {PRERENDER_WORKERS} procesos")
+
+    started = time.monotonic()
+    with _process_pool(PRERENDER_WORKERS) as pool:
+        futures = {pool.submit(_prerender_var_step, run, var, step, tiles): (var, step)
+                   for var, step in jobs}
+        for future in as_completed(futures):
+            var, step = futures[future]
+            try:
+                written, errors = future.result()
+            except Exception as e:
+                _log(f"  Error pre-renderizando {var} +{step}h: {e}")
+                written, errors = 0, len(tiles)
+            progress["tiles_done"] += written + errors
+            progress["errors"] += errors
+            progress["seconds"] = round(time.monotonic() - started, 1)
+            _update(prerender=dict(progress))
+
+    progress["state"] = "done"
+    _update(prerender=dict(progress))
+    _record_timing("prerender", started)
+    _log(f"Pre-renderizado completado: {progress['tiles_done'] - progress['errors']} teselas "
+         f"({progress['errors']} errores) en {progress['seconds']}s")
 
 
 # ---------------------------------------------------------------------------
@@ -347,13 +659,18 @@ def _run_pipeline():
 @graphcast_bp.route("/api/graphcast/run-pipeline", methods=["POST"])
 def run_pipeline():
     with _lock:
-        state = _status["state"]
-
-    if state in ("downloading", "processing"):
-        return jsonify({"error": "Pipeline ya en ejecución", "state": state}), 409
-
-    _update(state="downloading", message="Iniciando pipeline…",
-            available_steps={}, last_run=None, run_date=None, run_time=None)
+        # Este proceso tiene el lock mientras corre su pipeline (y su
+        # pre-renderizado); el estado local cubre plataformas sin flock
+        prerender = _status["prerender"] or {}
+        running_here = (process_lock.is_leader(PIPELINE_LOCK)
+                        or _status["state"] in ("downloading", "processing")
+                        or prerender.get("state") == "running")
+        if running_here or not process_lock.try_acquire(PIPELINE_LOCK):
+            state = _status["state"] if running_here else (shared_cache.get(STATUS_KEY) or {}).get("state")
+            return jsonify({"error": "Pipeline ya en ejecución en esta máquina", "state": state}), 409
+
+    _update(state="downloading", message="Iniciando pipeline…", prerender=None,
+            available_steps={}, last_run=None, run_date=None, run_time=None, timings={})
 
     threading.Thread(target=_run_pipeline, daemon=True,
                      name="aifs-pipeline").start()
@@ -362,18 +679,37 @@ def run_pipeline():
 
 @graphcast_bp.route("/api/graphcast/status", methods=["GET"])
 def get_status():
-    return jsonify(_get())
+    status = _get()
+    status["published_run"] = _current_run()
+    status["tile_cache"] = tile_cache.stats()  # de este worker
+    status["rasters"] = rasters.stats()         # de este worker
+    return jsonify(status)
 
 
-@graphcast_bp.route("/api/graphcast/tiles/<int:z>/<int:x>/<int:y>")
-def serve_tile(z: int, x: int, y: int):
-    """Tesela PNG generada on-the-fly con rio-tiler."""
-    var  = request.args.get("var", "t2m")
-    step = request.args.get("step", 6, type=int)
+def _tile_in_iberia(z: int, x: int, y: int) -> bool:
+    """True si la tesela WebMercator (z, x, y) intersecta IBERIA_BOUNDS."""
+    import math
+
+    lon_min, lat_min, lon_max, lat_max = IBERIA_BOUNDS
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return east > lon_min and west < lon_max and north > lat_min and south < lat_max
 
-    tiff = geotiff_path(var, step)
-    if not os.path.exists(tiff):
-        return _empty_png(), 200
+
+def _render_tile(var: str, step: int, z: int, x: int, y: int, src=None) -> bytes:
+    """
+    Renderiza una tesela PNG con rio-tiler. Devuelve EMPTY si cae fuera del
+    raster; otros errores se propagan. src: Reader ya abierto del GeoTIFF
+    de (var, step), para renderizar muchas teselas seguidas.
+    """
+    import numpy as np
+    from PIL import Image
+    import io
+    from rio_tiler.io import Reader
+    from rio_tiler.errors import TileOutsideBounds
 
     cfg = VARIABLES_CONFIG.get(var, {})
     vis_min = cfg.get("vis_min", 0.0)
@@ -381,44 +717,99 @@ def serve_tile(z: int, x: int, y: int):
     cm_name = cfg.get("colormap", "viridis")
 
     try:
-        import numpy as np
-        from PIL import Image
-        import io
-        from rio_tiler.io import Reader
-
-        with Reader(tiff) as src:
+        if src is None:
+            with Reader(geotiff_path(var, step)) as src:
+                img = src.tile(x, y, z, indexes=1)
+        else:
             img = src.tile(x, y, z, indexes=1)
+    except TileOutsideBounds:
+        return EMPTY
 
-        data = img.data[0].astype(np.float64)   # (h, w)
-        mask = img.mask                           # (h, w): 255=valid, 0=nodata
-
-        # Normalize to [0, 255] index
-        span = vis_max - vis_min
-        norm = np.clip((data - vis_min) / span, 0.0, 1.0) if span > 0 else np.zeros_like(data)
-        idx = (norm * 255).astype(np.uint8)
-
-        # Apply colormap LUT → RGBA
-        lut = _get_lut(cm_name)           # (256, 3) uint8
-        rgb = lut[idx]                     # (h, w, 3)
-        alpha = np.where(mask > 0, 204, 0).astype(np.uint8)  # ~80 % opaque
-        rgba = np.dstack([rgb, alpha])     # (h, w, 4)
-
-        # Encode PNG
-        buf = io.BytesIO()
-        Image.fromarray(rgba, "RGBA").save(buf, format="PNG")
-        content = buf.getvalue()
-
-        resp = make_response(content, 200)
-        resp.headers["Content-Type"] = "image/png"
-        resp.headers["Cache-Control"] = "public, max-age=1800"
-        return resp
-
-    except Exception as e:
-        name = type(e).__name__
-        if "OutsideBounds" not in name and "TileOutside" not in name:
-            logger.error(f"Tile {z}/{x}/{y} ({var}+{step}h): {e}")
+    data = img.data[0].astype(np.float64)   # (h, w)
+    mask = img.mask                           # (h, w): 255=valid, 0=nodata
+
+    # Normalize to [0, 255] index
+    span = vis_max - vis_min
+    norm = np.clip((data - vis_min) / span, 0.0, 1.0) if span > 0 else np.zeros_like(data)
+    idx = (norm * 255).astype(np.uint8)
+
+    # Apply colormap LUT → RGBA
+    lut = _get_lut(cm_name)           # (256, 3) uint8
+    rgb = lut[idx]                     # (h, w, 3)
+    alpha = np.where(mask > 0, 204, 0).astype(np.uint8)  # ~80 % opaque
+    rgba = np.dstack([rgb, alpha])     # (h, w, 4)
+
+    # Encode PNG
+    buf = io.BytesIO()
+    Image.fromarray(rgba, "RGBA").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@graphcast_bp.route("/api/graphcast/tiles/<int:z>/<int:x>/<int:y>")
+def serve_tile(z: int, x: int, y: int):
+    """Tesela PNG: caché (memoria → disco con sendfile) o renderizada con rio-tiler."""
+    var  = request.args.get("var", "t2m")
+    step = request.args.get("step", 6, type=int)
+
+    if not TILE_MIN_ZOOM <= z <= TILE_MAX_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        return jsonify({"error": "Tesela fuera de rango",
+                        "zoom": [TILE_MIN_ZOOM, TILE_MAX_ZOOM]}), 400
+
+    # var y step forman parte de la ruta en disco: solo valores conocidos
+    if var not in VARIABLES_CONFIG or step not in STEPS:
         return _empty_png(), 200
 
+    # Fuera de la Península no hay datos: no se renderiza ni se cachea
+    if not _tile_in_iberia(z, x, y):
+        return _tile_headers(make_response(_empty_png(), 200), "outside")
+
+    run, published = _current_publication()
+    if run is None:
+        # Sin run publicado (GeoTIFFs de antes del manifiesto): sin caché
+        if not os.path.exists(geotiff_path(var, step)):
+            return _empty_png(), 200
+        found = None
+    else:
+        found = tile_cache.lookup((run, var, step, z, x, y))
+    content = None
+    source = found[0] if found else "miss"
+
+    if found and found[0] == "memory":
+        content = found[1]
+    elif found and found[2] == 0:
+        content = EMPTY
+    elif found:
+        try:
+            resp = send_file(found[1], mimetype="image/png", conditional=False, etag=False)
+        except OSError:
+            # Borrada por un invalidate entre el stat y la apertura
+            source = "miss"
+        else:
+            return _tile_headers(resp, source)
+
+    if content is None:
+        try:
+            src = None
+            if run:
+                src = rasters.get((run, published), var, step)
+                if src is None:
+                    return _empty_png(), 200
+            content = _render_tile(var, step, z, x, y, src=src)
+        except Exception as e:
+            logger.error(f"Tile {z}/{x}/{y} ({var}+{step}h): {e}")
+            return _empty_png(), 200
+        if run:
+            tile_cache.put((run, var, step, z, x, y), content)
+
+    return _tile_headers(make_response(content or _empty_png(), 200), source)
+
+
+def _tile_headers(resp, source: str):
+    resp.headers["Content-Type"] = "image/png"
+    resp.headers["Cache-Control"] = "public, max-age=1800"
+    resp.headers["X-Tile-Cache"] = source
+    return resp
+
 
 @graphcast_bp.route("/api/graphcast/variables", methods=["GET"])
 def get_variables():
@@ -1,16 +1,35 @@
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request, current_app, g
 import logging
 import os
+import math
+import time
 import pytz
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from database import get_collection
+from mongo_pool import get_db
 import statistics
+import numpy as np
 from collections import defaultdict
+from conditional import conditional, historico_source
+from series_format import format_records
 from cache_manager import (
     get_current_date, 
     get_historical_data_with_cache, 
     get_current_data_only,
-    cache_historical_data
+    cache_historical_data,
+    get_cache_stats,
+    seconds_until_midnight
+)
+from rachas import (
+    Predicate, build_series, current_run, load_historico_series, parse_predicates, rachas_por_año
+)
+from timeseries_store import (
+    REFRESH_SECONDS as TIMESERIES_REFRESH_SECONDS,
+    historico_store, burgos_store, count_per_year, extreme, grouped_mean, mean_per_year, month_summary
+)
+from umbrales import (
+    MONTH_NAMES, cuts_for, histogram_from_docs, histogram_response, histogram_stages, month_counts,
+    month_key, month_row, month_statistics, monthly_histogram, parse_cuts
 )
 
 # Configure logging
@@ -22,13 +41,79 @@ historico_bp = Blueprint('historico', __name__)
 
 def get_historico_collection():
     """Obtener colección de datos históricos"""
+    db = get_db()
+    return db['historico_intervalos'], db['historico_diario']
+
+# Predicados de los endpoints de rachas existentes (valor por defecto de /rachas-anual)
+RACHAS_PREDICADOS_DEFECTO = "tmax:gt:30,tmax:gt:35,tmin:gt:20,tmin:gt:25"
+
+def redondear(valor, decimales=1):
+    """round() que deja en None los valores ausentes (None o NaN)"""
+    if valor is None or (isinstance(valor, float) and math.isnan(valor)):
+        return None
+    return round(valor, decimales)
+
+# Campo de la serie en memoria -> ruta del campo en historico_diario
+CAMPOS_MONGO = {
+    "tmax": "$temperatura.maxima",
+    "tmin": "$temperatura.minima",
+    "tavg": "$temperatura.promedio",
+    "hum": "$humedad.promedio",
+}
 
-    from pymongo import MongoClient
-    import os
+def calcular_rachas_historico(predicados):
+    """Racha máxima por año de cada predicado sobre historico_diario"""
+    series = historico_store.snapshot()
+    if series is None:
+        # Serie en memoria no disponible: una sola consulta proyectada
+        intervalos_collection, diario_collection = get_historico_collection()
+        series = load_historico_series(diario_collection)
+    return rachas_por_año(series, predicados)
+
+def contar_dias_por_año(campo, umbral, clave):
+    """[{año, clave: n}] con los días en que campo > umbral, por año"""
+    columnas = historico_store.snapshot()
+    if columnas is not None:
+        años, conteos = count_per_year(columnas, campo, "gt", umbral)
+        return [{"año": int(año), clave: int(n)} for año, n in zip(años, conteos)]
     
-    client = MongoClient(os.getenv('MONGODB_URI'))
-    db = client['meteosarria']
-    return db['historico_intervalos'], db['historico_diario']
+    # Serie en memoria no disponible: una única agregación (incluye el año actual)
+    intervalos_collection, diario_collection = get_historico_collection()
+    pipeline = [
+        {
+            "$group": {
+                "_id": "$año",
+                clave: {"$sum": {"$cond": [{"$gt": [CAMPOS_MONGO[campo], umbral]}, 1, 0]}}
+            }
+        },
+        {
+            "$sort": {"_id": 1}
+        }
+    ]
+    return [{"año": doc['_id'], clave: doc[clave]} for doc in diario_collection.aggregate(pipeline)]
+
+@historico_bp.route('/api/dashboard/rachas-anual')
+@conditional(historico_source)
+def rachas_anual():
+    """
+    Rachas máximas por año para una lista de predicados campo:operador:umbral
+    separados por comas, p. ej. ?predicados=tmax:gt:30,tmin:gte:20
+    Campos: tmax, tmin, tavg. Operadores: gt, gte, lt, lte.
+    """
+    try:
+        logging.info("Dashboard rachas anual endpoint called")
+        try:
+            predicados = parse_predicates(request.args.get('predicados', RACHAS_PREDICADOS_DEFECTO))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not predicados:
+            return jsonify({"error": "Se necesita al menos un predicado"}), 400
+        
+        return jsonify(calcular_rachas_historico(predicados))
+        
+    except Exception as e:
+        logging.error(f"Error en rachas anual: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
 
 
 @historico_bp.route('/api/dashboard/test')
@@ -45,12 +130,41 @@ def test_endpoint():
         logging.error(f"Error in test endpoint: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def valor_serie(valor):
+    """float de la serie en memoria, o None si es NaN"""
+    return None if math.isnan(valor) else float(valor)
+
+def records_desde_serie(columnas):
+    """Records de /records calculados sobre la serie en memoria"""
+    # Los records absolutos excluyen el día en curso, como la caché histórica
+    pasado = columnas.ordinal < get_current_date().date().toordinal()
+    este_año = columnas.year == datetime.now().year
+    
+    records = {}
+    for clave, campo, tipo, mascara in (
+        ("maxima_masalta_historica", "tmax", "max", pasado),
+        ("maxima_masbaja_historica", "tmax", "min", pasado),
+        ("minima_masbaja_historica", "tmin", "min", pasado),
+        ("minima_masalta_historica", "tmin", "max", pasado),
+        ("maxima_este_año", "tmax", "max", este_año),
+        ("minima_este_año", "tmin", "min", este_año),
+    ):
+        record = extreme(columnas, campo, tipo, mascara)
+        if record is not None:
+            records[clave] = {"valor": record[0], "fecha": record[1].isoformat()}
+    return records
+
 @historico_bp.route('/api/dashboard/records')
+@conditional(historico_source)
 def dashboard_records():
     """Records históricos absolutos"""
     try:
         logging.info("Dashboard records endpoint called")
         
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            return jsonify(records_desde_serie(columnas))
+        
         intervalos_collection, diario_collection = get_historico_collection()
         
         logging.info(f"Collections obtained: intervalos={intervalos_collection}, diario={diario_collection}")
@@ -158,53 +272,42 @@ def dashboard_records():
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/tendencia-anual')
+@conditional(historico_source)
 def tendencia_anual():
     """Tendencia de temperatura media anual"""
     try:
         logging.info("Dashboard tendencia anual endpoint called")
         
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        # Agregación por año - usar caché para datos históricos
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$año",
-                    "temp_media": {"$avg": "$temperatura.promedio"},
-                    "temp_maxima": {"$avg": "$temperatura.maxima"},
-                    "temp_minima": {"$avg": "$temperatura.minima"},
-                    "hum_media": {"$avg": "$humedad.promedio"}
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_anuales = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$group": {
-                    "_id": "$año",
-                    "temp_media": {"$avg": "$temperatura.promedio"},
-                    "temp_maxima": {"$avg": "$temperatura.maxima"},
-                    "temp_minima": {"$avg": "$temperatura.minima"},
-                    "hum_media": {"$avg": "$humedad.promedio"}
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            años_serie = None
+            medias = {}
+            for clave, campo in (("temp_media", "tavg"), ("temp_maxima", "tmax"),
+                                 ("temp_minima", "tmin"), ("hum_media", "hum")):
+                años_serie, medias[clave] = mean_per_year(columnas, campo)
+            datos_completos = [
+                {"_id": int(año), **{clave: float(valores[i]) for clave, valores in medias.items()}}
+                for i, año in enumerate(años_serie)
+                if not math.isnan(medias["temp_media"][i])
+            ]
+        else:
+            # Serie en memoria no disponible: una única agregación (incluye el año actual)
+            intervalos_collection, diario_collection = get_historico_collection()
+            pipeline = [
+                {
+                    "$group": {
+                        "_id": "$año",
+                        "temp_media": {"$avg": "$temperatura.promedio"},
+                        "temp_maxima": {"$avg": "$temperatura.maxima"},
+                        "temp_minima": {"$avg": "$temperatura.minima"},
+                        "hum_media": {"$avg": "$humedad.promedio"}
+                    }
+                },
+                {
+                    "$sort": {"_id": 1}
                 }
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos históricos con actuales
-        datos_completos = datos_anuales + datos_actuales
+            ]
+            datos_completos = list(diario_collection.aggregate(pipeline))
         
         # Preparar datos para el frontend
         años = []
@@ -215,10 +318,10 @@ def tendencia_anual():
         
         for doc in datos_completos:
             años.append(doc['_id'])
-            temperaturas_medias.append(round(doc['temp_media'], 1))
-            temperaturas_maximas.append(round(doc['temp_maxima'], 1))
-            temperaturas_minimas.append(round(doc['temp_minima'], 1))
-            humedades_medias.append(round(doc['hum_media'], 1))
+            temperaturas_medias.append(redondear(doc['temp_media']))
+            temperaturas_maximas.append(redondear(doc['temp_maxima']))
+            temperaturas_minimas.append(redondear(doc['temp_minima']))
+            humedades_medias.append(redondear(doc['hum_media']))
         
         # Calcular tendencia (regresión lineal simple)
         tendencia = "estable"
@@ -258,66 +361,78 @@ def tendencia_anual():
         logging.error(f"Error en tendencia anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def comparativa_año_mongo(year):
+    """Medias mensuales del año y del resto de años (sin serie en memoria)"""
+    intervalos_collection, diario_collection = get_historico_collection()
+    
+    # Datos del año específico - incluir datos actuales si es el año actual
+    pipeline_año = [
+        {
+            "$match": {"año": year}
+        },
+        {
+            "$group": {
+                "_id": "$mes",
+                "temp_media": {"$avg": "$temperatura.promedio"},
+                "temp_maxima": {"$avg": "$temperatura.maxima"},
+                "temp_minima": {"$avg": "$temperatura.minima"}
+            }
+        },
+        {
+            "$sort": {"_id": 1}
+        }
+    ]
+
+    # Si es el año actual, obtener datos completos (sin caché)
+    if year == datetime.now().year:
+        datos_año = list(diario_collection.aggregate(pipeline_año))
+    else:
+        # Si es año anterior, usar caché
+        datos_año = get_historical_data_with_cache(diario_collection, pipeline_año)
+
+    # Promedio histórico (excluyendo el año consultado) - usar caché
+    pipeline_historico = [
+        {
+            "$match": {"año": {"$ne": year}}
+        },
+        {
+            "$group": {
+                "_id": "$mes",
+                "temp_media": {"$avg": "$temperatura.promedio"},
+                "temp_maxima": {"$avg": "$temperatura.maxima"},
+                "temp_minima": {"$avg": "$temperatura.minima"}
+            }
+        },
+        {
+            "$sort": {"_id": 1}
+        }
+    ]
+
+    datos_historico = get_historical_data_with_cache(diario_collection, pipeline_historico)
+
+    # Crear diccionarios para fácil acceso
+    return ({doc['_id']: doc for doc in datos_año},
+            {doc['_id']: doc for doc in datos_historico})
+
 @historico_bp.route('/api/dashboard/comparativa-año')
 @historico_bp.route('/api/dashboard/comparativa-año/<int:year>')
+@conditional(historico_source)
 def comparativa_año(year=None):
     """Comparativa del año actual vs promedio histórico por mes"""
     try:
         logging.info(f"Dashboard comparativa año endpoint called - year: {year}")
         
-        intervalos_collection, diario_collection = get_historico_collection()
-        
         if year is None:
             year = datetime.now().year
         
-        # Datos del año específico - incluir datos actuales si es el año actual
-        pipeline_año = [
-            {
-                "$match": {"año": year}
-            },
-            {
-                "$group": {
-                    "_id": "$mes",
-                    "temp_media": {"$avg": "$temperatura.promedio"},
-                    "temp_maxima": {"$avg": "$temperatura.maxima"},
-                    "temp_minima": {"$avg": "$temperatura.minima"}
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        # Si es el año actual, obtener datos completos (sin caché)
-        if year == datetime.now().year:
-            datos_año = list(diario_collection.aggregate(pipeline_año))
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            medias_año = dict(zip(*grouped_mean(columnas, "tavg", columnas.month, columnas.year == year)))
+            medias_hist = dict(zip(*grouped_mean(columnas, "tavg", columnas.month, columnas.year != year)))
+            año_dict = {int(mes): {"temp_media": float(media)} for mes, media in medias_año.items()}
+            hist_dict = {int(mes): {"temp_media": float(media)} for mes, media in medias_hist.items()}
         else:
-            # Si es año anterior, usar caché
-            datos_año = get_historical_data_with_cache(diario_collection, pipeline_año)
-        
-        # Promedio histórico (excluyendo el año consultado) - usar caché
-        pipeline_historico = [
-            {
-                "$match": {"año": {"$ne": year}}
-            },
-            {
-                "$group": {
-                    "_id": "$mes",
-                    "temp_media": {"$avg": "$temperatura.promedio"},
-                    "temp_maxima": {"$avg": "$temperatura.maxima"},
-                    "temp_minima": {"$avg": "$temperatura.minima"}
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        datos_historico = get_historical_data_with_cache(diario_collection, pipeline_historico)
-        
-        # Crear diccionarios para fácil acceso
-        año_dict = {doc['_id']: doc for doc in datos_año}
-        hist_dict = {doc['_id']: doc for doc in datos_historico}
+            año_dict, hist_dict = comparativa_año_mongo(year)
         
         # Nombres de meses
         meses_nombres = [
@@ -354,68 +469,84 @@ def comparativa_año(year=None):
         logging.error(f"Error en comparativa año: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+def heatmap_mongo(años_heatmap):
+    """Media mensual de los años del heatmap (sin serie en memoria)"""
+    intervalos_collection, diario_collection = get_historico_collection()
+    año_actual = años_heatmap[-1]
+    
+    pipeline = [
+        {
+            "$match": {"año": {"$in": años_heatmap}}
+        },
+        {
+            "$group": {
+                "_id": {
+                    "año": "$año",
+                    "mes": "$mes"
+                },
+                "temperatura": {"$avg": "$temperatura.promedio"}
+            }
+        },
+        {
+            "$sort": {
+                "_id.año": 1,
+                "_id.mes": 1
+            }
+        }
+    ]
+
+    # Para el heatmap, obtener datos históricos con caché
+    datos_heatmap = get_historical_data_with_cache(diario_collection, pipeline)
+
+    # Obtener datos actuales del año actual
+    pipeline_actual = [
+        {
+            "$match": {"año": año_actual}
+        },
+        {
+            "$group": {
+                "_id": {
+                    "año": "$año",
+                    "mes": "$mes"
+                },
+                "temperatura": {"$avg": "$temperatura.promedio"}
+            }
+        },
+        {
+            "$sort": {
+                "_id.año": 1,
+                "_id.mes": 1
+            }
+        }
+    ]
+
+    datos_actuales = list(diario_collection.aggregate(pipeline_actual))
+
+    # Combinar datos (la caché histórica también trae el año actual hasta ayer)
+    datos_heatmap = [doc for doc in datos_heatmap if doc['_id']['año'] != año_actual]
+    return datos_heatmap + datos_actuales
+
 @historico_bp.route('/api/dashboard/heatmap')
+@conditional(historico_source)
 def heatmap_data():
     """Datos para mapa de calor año x mes"""
     try:
         logging.info("Dashboard heatmap endpoint called")
         
-        intervalos_collection, diario_collection = get_historico_collection()
-        
         # Últimos 6 años para el heatmap
         año_actual = datetime.now().year
         años_heatmap = list(range(año_actual - 5, año_actual + 1))
         
-        pipeline = [
-            {
-                "$match": {"año": {"$in": años_heatmap}}
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "año": "$año",
-                        "mes": "$mes"
-                    },
-                    "temperatura": {"$avg": "$temperatura.promedio"}
-                }
-            },
-            {
-                "$sort": {
-                    "_id.año": 1,
-                    "_id.mes": 1
-                }
-            }
-        ]
-        
-        # Para el heatmap, obtener datos históricos con caché
-        datos_heatmap = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$group": {
-                    "_id": {
-                        "año": "$año",
-                        "mes": "$mes"
-                    },
-                    "temperatura": {"$avg": "$temperatura.promedio"}
-                }
-            },
-            {
-                "$sort": {
-                    "_id.año": 1,
-                    "_id.mes": 1
-                }
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos
-        datos_completos = datos_heatmap + datos_actuales
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            claves, medias = grouped_mean(columnas, "tavg", month_key(columnas.year.astype(int), columnas.month),
+                                          columnas.year >= años_heatmap[0])
+            datos_completos = [
+                {"_id": {"año": int(clave) // 12, "mes": int(clave) % 12 + 1}, "temperatura": float(media)}
+                for clave, media in zip(claves, medias)
+            ]
+        else:
+            datos_completos = heatmap_mongo(años_heatmap)
         
         # Formatear para el frontend
         heatmap_formatted = []
@@ -427,7 +558,7 @@ def heatmap_data():
             })
         
         return jsonify({
-            "data": heatmap_formatted,
+            "data": format_records(heatmap_formatted),
             "años": años_heatmap,
             "rango_temperaturas": {
                 "min": min([d['temperatura'] for d in heatmap_formatted]) if heatmap_formatted else 0,
@@ -439,15 +570,81 @@ def heatmap_data():
         logging.error(f"Error en heatmap: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+# Rachas actuales de las estadísticas mensuales (últimos 30 días)
+RACHA_SIN_HELADAS = Predicate("tmin", "gt", 0)
+RACHA_SOBRE_20 = Predicate("tmax", "gt", 20)
+DIAS_RACHA_ACTUAL = 30
+
+def estadisticas_mes_mongo(año_mes, mes, desde):
+    """
+    Sin serie en memoria: tramos de umbrales, resumen y récord del mes y los
+    últimos días para las rachas, en una única agregación
+    """
+    intervalos_collection, diario_collection = get_historico_collection()
+    cortes = {campo: cuts_for(campo) for campo in ("tmax", "tmin")}
+    del_mes = {"$match": {"año": año_mes, "mes": mes}}
+    pipeline = [
+        {
+            "$match": {"$or": [{"mes": mes}, {"fecha": {"$gte": desde.strftime("%Y-%m-%d")}}]}
+        },
+        {
+            "$facet": {
+                **{
+                    campo: [del_mes, *histogram_stages(CAMPOS_MONGO[campo], cortes[campo],
+                                                       {"año": "$año", "mes": "$mes"})]
+                    for campo in cortes
+                },
+                "resumen": [
+                    del_mes,
+                    {
+                        "$group": {
+                            "_id": None,
+                            "media": {"$avg": "$temperatura.promedio"},
+                            "maxima": {"$max": "$temperatura.maxima"},
+                            "minima": {"$min": "$temperatura.minima"},
+                            "dias": {"$sum": 1}
+                        }
+                    }
+                ],
+                "record": [
+                    {"$match": {"mes": mes, "año": {"$ne": año_mes}}},
+                    {"$group": {"_id": None, "record": {"$max": "$temperatura.maxima"}}}
+                ],
+                "recientes": [
+                    {"$match": {"fecha": {"$gte": desde.strftime("%Y-%m-%d")}}},
+                    {"$sort": {"fecha": 1}},
+                    {"$project": {"_id": 0, "fecha": 1, "tmax": "$temperatura.maxima",
+                                  "tmin": "$temperatura.minima"}}
+                ]
+            }
+        }
+    ]
+    resultado = next(diario_collection.aggregate(pipeline))
+    
+    tramos = {
+        campo: month_row(histogram_from_docs(resultado[campo], cortes[campo]), cortes[campo], año_mes, mes)
+        for campo in cortes
+    }
+    resumen = resultado["resumen"][0] if resultado["resumen"] else {"media": None, "maxima": None,
+                                                                    "minima": None, "dias": 0}
+    resumen["record_otros_años"] = resultado["record"][0]["record"] if resultado["record"] else None
+    
+    recientes = resultado["recientes"]
+    serie_reciente = build_series(
+        [date.fromisoformat(doc["fecha"]).toordinal() for doc in recientes],
+        [int(doc["fecha"][:4]) for doc in recientes],
+        {"tmax": [doc.get("tmax") for doc in recientes], "tmin": [doc.get("tmin") for doc in recientes]}
+    )
+    return month_counts(tramos, cortes), resumen, serie_reciente
+
 @historico_bp.route('/api/dashboard/estadisticas')
 @historico_bp.route('/api/dashboard/estadisticas/<int:year>/<int:month>')
+@conditional(historico_source)
 def estadisticas_destacadas(year=None, month=None):
     """Estadísticas destacadas del mes especificado y rachas actuales"""
     try:
         logging.info("Dashboard estadísticas endpoint called")
         
-        intervalos_collection, diario_collection = get_historico_collection()
-        
         # Fecha actual
         now = get_current_date()
         
@@ -459,262 +656,86 @@ def estadisticas_destacadas(year=None, month=None):
             año_mes = year
             mes = month
         
-        # Estadísticas del mes especificado
-        pipeline_mes = [
-            {
-                "$match": {
-                    "año": año_mes,
-                    "mes": mes
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "dias_max_gte_35": {
-                        "$sum": {
-                            "$cond": [{"$gte": ["$temperatura.maxima", 35]}, 1, 0]
-                        }
-                    },
-                    "dias_max_gte_30": {
-                        "$sum": {
-                            "$cond": [{"$gte": ["$temperatura.maxima", 30]}, 1, 0]
-                        }
-                    },
-                    "dias_max_gte_25": {
-                        "$sum": {
-                            "$cond": [{"$gte": ["$temperatura.maxima", 25]}, 1, 0]
-                        }
-                    },
-                    "dias_max_gt_20": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.maxima", 20]}, 1, 0]
-                        }
-                    },
-                    "dias_max_lte_20": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.maxima", 20]}, 1, 0]
-                        }
-                    },
-                    "dias_max_lte_15": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.maxima", 15]}, 1, 0]
-                        }
-                    },
-                    "dias_max_lte_10": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.maxima", 10]}, 1, 0]
-                        }
-                    },
-                    "dias_max_lte_5": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.maxima", 5]}, 1, 0]
-                        }
-                    },
-                    "dias_max_lte_0": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.maxima", 0]}, 1, 0]
-                        }
-                    },
-                    "dias_min_gte_30": {
-                        "$sum": {
-                            "$cond": [{"$gte": ["$temperatura.minima", 30]}, 1, 0]
-                        }
-                    },
-                    "dias_min_gte_25": {
-                        "$sum": {
-                            "$cond": [{"$gte": ["$temperatura.minima", 25]}, 1, 0]
-                        }
-                    },
-                    "dias_min_gte_20": {
-                        "$sum": {
-                            "$cond": [{"$gte": ["$temperatura.minima", 20]}, 1, 0]
-                        }
-                    },
-                    "dias_min_lte_20": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.minima", 20]}, 1, 0]
-                        }
-                    },
-                    "dias_min_lte_15": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.minima", 15]}, 1, 0]
-                        }
-                    },
-                    "dias_min_lte_10": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.minima", 10]}, 1, 0]
-                        }
-                    },
-                    "dias_min_lte_5": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.minima", 5]}, 1, 0]
-                        }
-                    },
-                    "dias_min_lte_0": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.minima", 0]}, 1, 0]
-                        }
-                    },
-                    "temp_media_mes": {"$avg": "$temperatura.promedio"},
-                    "temp_maxima_mes": {"$max": "$temperatura.maxima"},
-                    "temp_minima_mes": {"$min": "$temperatura.minima"},
-                    "dias_helada": {
-                        "$sum": {
-                            "$cond": [{"$lte": ["$temperatura.minima", 0]}, 1, 0]
-                        }
-                    },
-                    "total_dias": {"$sum": 1}
-                }
-            }
-        ]
-        
-        # Si es el mes actual, obtener datos completos (sin caché)
-        if año_mes == now.year and mes == now.month:
-            stats_mes = list(diario_collection.aggregate(pipeline_mes))
-        else:
-            # Si es mes anterior, usar caché
-            stats_mes = get_historical_data_with_cache(diario_collection, pipeline_mes)
+        desde = (now - timedelta(days=DIAS_RACHA_ACTUAL)).date()
         
-        # Verificar si hay record mensual histórico
-        pipeline_record_mes = [
-            {
-                "$match": {
-                    "mes": mes,
-                    "año": {"$ne": año_mes}
-                }
-            },
-            {
-                "$group": {
-                    "_id": None,
-                    "record_historico": {"$max": "$temperatura.maxima"}
-                }
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            # Histograma de todos los meses, compartido entre peticiones de cualquier mes
+            cortes = {campo: cuts_for(campo) for campo in ("tmax", "tmin")}
+            tramos = {
+                campo: month_row(monthly_histogram(historico_store.name, columnas, campo, cortes[campo]),
+                                 cortes[campo], año_mes, mes)
+                for campo in cortes
             }
-        ]
-        
-        record_mes = get_historical_data_with_cache(diario_collection, pipeline_record_mes)
+            conteos = month_counts(tramos, cortes)
+            resumen = month_summary(columnas, año_mes, mes)
+            serie_reciente = columnas
+        else:
+            conteos, resumen, serie_reciente = estadisticas_mes_mongo(año_mes, mes, desde)
         
-        # Preparar respuesta
         estadisticas = {
-            "mes_seleccionado": {
-                "mes": mes,
-                "año": año_mes,
-                "nombre_mes": ["", "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", 
-                              "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"][mes],
-                "dias_max_gte_35": 0,
-                "dias_max_gte_30": 0,
-                "dias_max_gte_25": 0,
-                "dias_max_gt_20": 0,
-                "dias_max_lte_20": 0,
-                "dias_max_lte_15": 0,
-                "dias_max_lte_10": 0,   
-                "dias_max_lte_5": 0,
-                "dias_max_lte_0": 0,
-                "dias_min_gte_30": 0,
-                "dias_min_gte_25": 0,
-                "dias_min_gte_20": 0,
-                "dias_min_lte_20": 0,
-                "dias_min_lte_15": 0,
-                "dias_min_lte_10": 0,
-                "dias_min_lte_5": 0,
-                "dias_min_lte_0": 0,
-                "temperatura_media": 0,
-                "temperatura_maxima": 0,
-                "temperatura_minima": 0,
-                "dias_helada": 0,
-                "record_mes": False,
-                "total_dias": 0
-            },
+            "mes_seleccionado": month_statistics(año_mes, mes, conteos, resumen),
             "rachas": {
-                "sin_heladas": 0,
-                "dias_sobre_20": 0,
+                "sin_heladas": current_run(serie_reciente, RACHA_SIN_HELADAS, desde.toordinal()),
+                "dias_sobre_20": current_run(serie_reciente, RACHA_SOBRE_20, desde.toordinal()),
                 "dias_consecutivos_calor": 0
             }
         }
         
-        if stats_mes:
-            mes_data = stats_mes[0]
-            estadisticas["mes_seleccionado"].update({
-                "dias_max_gte_35": mes_data.get('dias_max_gte_35', 0),
-                "dias_max_gte_30": mes_data.get('dias_max_gte_30', 0),
-                "dias_max_gte_25": mes_data.get('dias_max_gte_25', 0),
-                "dias_max_gt_20": mes_data.get('dias_max_gt_20', 0),
-                "dias_max_lte_20": mes_data.get('dias_max_lte_20', 0),
-                "dias_max_lte_15": mes_data.get('dias_max_lte_15', 0),
-                "dias_max_lte_10": mes_data.get('dias_max_lte_10', 0),
-                "dias_max_lte_5": mes_data.get('dias_max_lte_5', 0),
-                "dias_max_lte_0": mes_data.get('dias_max_lte_0', 0),
-                "dias_min_gte_30": mes_data.get('dias_min_gte_30', 0),
-                "dias_min_gte_25": mes_data.get('dias_min_gte_25', 0),
-                "dias_min_gte_20": mes_data.get('dias_min_gte_20', 0),
-                "dias_min_lte_20": mes_data.get('dias_min_lte_20', 0),
-                "dias_min_lte_15": mes_data.get('dias_min_lte_15', 0),
-                "dias_min_lte_10": mes_data.get('dias_min_lte_10', 0),
-                "dias_min_lte_5": mes_data.get('dias_min_lte_5', 0),
-                "dias_min_lte_0": mes_data.get('dias_min_lte_0', 0),
-                "temperatura_media": round(mes_data.get('temp_media_mes', 0), 1),
-                "temperatura_maxima": mes_data.get('temp_maxima_mes', 0),
-                "temperatura_minima": mes_data.get('temp_minima_mes', 0),
-                "dias_helada": mes_data.get('dias_helada', 0),
-                "total_dias": mes_data.get('total_dias', 0),
-                "record_mes": False
-            })
-            
-            # Verificar record mensual
-            if record_mes and mes_data.get('temp_maxima_mes'):
-                record_historico = record_mes[0].get('record_historico', 0)
-                estadisticas["mes_seleccionado"]["record_mes"] = mes_data['temp_maxima_mes'] > record_historico
-        
-        # Calcular rachas (simplificado - últimos 30 días)
-        fecha_inicio_racha = now - timedelta(days=30)
-        
-        pipeline_rachas = [
-            {
-                "$match": {
-                    "timestamp": {"$gte": fecha_inicio_racha}
-                }
-            },
-            {
-                "$sort": {"timestamp": 1}
-            }
-        ]
-        
-        # Para rachas, obtener datos completos (sin caché) ya que incluyen datos actuales
-        datos_rachas = list(diario_collection.aggregate(pipeline_rachas))
-        
-        # Calcular rachas consecutivas
-        sin_heladas = 0
-        sobre_20 = 0
-        
-        for doc in reversed(datos_rachas):  # Desde el más reciente
-            if doc['temperatura']['minima'] > 0:
-                sin_heladas += 1
-            else:
-                break
-        
-        for doc in reversed(datos_rachas):  # Desde el más reciente
-            if doc['temperatura']['maxima'] > 20:
-                sobre_20 += 1
-            else:
-                break
-        
-        estadisticas["rachas"]["sin_heladas"] = sin_heladas
-        estadisticas["rachas"]["dias_sobre_20"] = sobre_20
-        
         return jsonify(estadisticas)
         
     except Exception as e:
         logging.error(f"Error en estadísticas destacadas: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
+@historico_bp.route('/api/dashboard/histograma-umbrales')
+@conditional(historico_source)
+def histograma_umbrales():
+    """
+    Días de cada (año, mes) por tramos de umbrales, p. ej.
+    ?campo=tmax&cortes=0,10,20,30[&year=2024][&month=7]
+    Campos: tmax, tmin, tavg, hum. Los tramos son (<c1, =c1, (c1, c2), =c2, ..., >cN).
+    """
+    try:
+        logging.info("Dashboard histograma umbrales endpoint called")
+        campo = request.args.get('campo', 'tmax')
+        if campo not in CAMPOS_MONGO:
+            return jsonify({"error": f"Campo desconocido '{campo}' (válidos: {', '.join(CAMPOS_MONGO)})"}), 400
+        try:
+            cortes = parse_cuts(request.args.get('cortes', ''))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            histograma = monthly_histogram(historico_store.name, columnas, campo, cortes)
+        else:
+            intervalos_collection, diario_collection = get_historico_collection()
+            filtro = {}
+            if year is not None:
+                filtro["año"] = year
+            if month is not None:
+                filtro["mes"] = month
+            pipeline = [{"$match": filtro},
+                        *histogram_stages(CAMPOS_MONGO[campo], cortes, {"año": "$año", "mes": "$mes"})]
+            histograma = histogram_from_docs(diario_collection.aggregate(pipeline), cortes)
+        
+        return jsonify(histogram_response(campo, cortes, histograma, year, month))
+        
+    except Exception as e:
+        logging.error(f"Error en histograma umbrales: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @historico_bp.route('/api/dashboard/estadisticas-datos-diarios')
 @historico_bp.route('/api/dashboard/estadisticas-datos-diarios/<int:year>/<int:month>')
+@conditional(historico_source)
 def estadisticas_datos_diarios(year=None, month=None):
     """Datos diarios del mes especificado para gráficas"""
     try:
         logging.info(f"Dashboard datos diarios endpoint called - year: {year}, month: {month}")
         
-        intervalos_collection, diario_collection = get_historico_collection()
-        
         # Fecha actual
         now = get_current_date()
         
@@ -726,6 +747,29 @@ def estadisticas_datos_diarios(year=None, month=None):
             año_mes = year
             mes = month
         
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            del_mes = np.flatnonzero((columnas.year == año_mes) & (columnas.month == mes))
+            datos_formateados = []
+            for i in del_mes:
+                fecha = date.fromordinal(int(columnas.ordinal[i]))
+                datos_formateados.append({
+                    "dia": fecha.day,
+                    "fecha": fecha.isoformat(),
+                    "maxima": valor_serie(columnas.values["tmax"][i]),
+                    "minima": valor_serie(columnas.values["tmin"][i]),
+                    "media": valor_serie(columnas.values["tavg"][i]),
+                    "humedad_media": valor_serie(columnas.values["hum"][i])
+                })
+            return jsonify({
+                "mes": mes,
+                "año": año_mes,
+                "nombre_mes": MONTH_NAMES[mes],
+                "datos_diarios": datos_formateados
+            })
+        
+        intervalos_collection, diario_collection = get_historico_collection()
+        
         # Pipeline para obtener datos diarios del mes
         pipeline_datos_diarios = [
             {
@@ -785,16 +829,21 @@ def estadisticas_datos_diarios(year=None, month=None):
 def cache_status():
     """Estado del caché histórico"""
     try:
-        from cache_manager import invalidate_historical_cache
-        cache = current_app.extensions['cache']
+        config = current_app.config
         
         # Obtener información del caché
         cache_info = {
-            "cache_type": "simple",
-            "cache_timeout": 86400,  # 24 horas
-            "cache_prefix": "meteosarria_",
+            "cache_type": config.get('CACHE_TYPE'),
+            "cache_timeout": config.get('CACHE_DEFAULT_TIMEOUT'),
+            "cache_prefix": config.get('CACHE_KEY_PREFIX'),
             "current_date": get_current_date().isoformat(),
-            "cache_enabled": True
+            "seconds_until_invalidation": seconds_until_midnight(),
+            "cache_enabled": config.get('CACHE_TYPE') not in (None, 'null', 'NullCache'),
+            "pid": os.getpid(),
+            "stats": get_cache_stats(),
+            "series_en_memoria": {
+                store.name: store.status() for store in (historico_store, burgos_store)
+            }
         }
         
         return jsonify(cache_info)
@@ -821,561 +870,187 @@ def clear_cache():
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/dias-calurosos-anual')
+@conditional(historico_source)
 def dias_calurosos_anual():
     """Días con temperatura máxima > 30°C por año"""
     try:
         logging.info("Dashboard días calurosos anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$año",
-                    "dias_max_gt_30": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.maxima", 30]}, 1, 0]
-                        }
-                    }
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_calurosos = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$group": {
-                    "_id": "$año",
-                    "dias_max_gt_30": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.maxima", 30]}, 1, 0]
-                        }
-                    }
-                }
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos históricos con actuales
-        datos_completos = datos_calurosos + datos_actuales
-        
-        # Formatear para el frontend
-        resultado = []
-        for doc in datos_completos:
-            resultado.append({
-                "año": doc['_id'],
-                "dias_max_gt_30": doc['dias_max_gt_30']
-            })
-        
-        return jsonify(resultado)
+        return jsonify(contar_dias_por_año("tmax", 30, "dias_max_gt_30"))
         
     except Exception as e:
         logging.error(f"Error en días calurosos anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/dias-torridos-anual')
+@conditional(historico_source)
 def dias_torridos_anual():
     """Días con temperatura máxima > 35°C por año"""
     try:
         logging.info("Dashboard días tórridos anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$año",
-                    "dias_max_gt_35": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.maxima", 35]}, 1, 0]
-                        }
-                    }
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_torridos = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$group": {
-                    "_id": "$año",
-                    "dias_max_gt_35": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.maxima", 35]}, 1, 0]
-                        }
-                    }
-                }
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos históricos con actuales
-        datos_completos = datos_torridos + datos_actuales
-        
-        # Formatear para el frontend
-        resultado = []
-        for doc in datos_completos:
-            resultado.append({
-                "año": doc['_id'],
-                "dias_max_gt_35": doc['dias_max_gt_35']
-            })
-        
-        return jsonify(resultado)
+        return jsonify(contar_dias_por_año("tmax", 35, "dias_max_gt_35"))
         
     except Exception as e:
         logging.error(f"Error en días tórridos anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/rachas-calurosas-anual')
+@conditional(historico_source)
 def rachas_calurosas_anual():
     """Días consecutivos con temperatura máxima > 30°C por año"""
     try:
         logging.info("Dashboard rachas calurosas anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        # Obtener todos los datos por año y calcular rachas
-        pipeline = [
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_completos = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos
-        todos_datos = datos_completos + datos_actuales
-        
-        # Calcular rachas por año
-        rachas_por_año = {}
-        
-        for doc in todos_datos:
-            año = doc['año']
-            if año not in rachas_por_año:
-                rachas_por_año[año] = {'datos': [], 'racha_max': 0}
-            
-            rachas_por_año[año]['datos'].append({
-                'fecha': doc['fecha'],
-                'temp_max': doc['temperatura']['maxima']
-            })
-        
-        # Calcular la racha máxima para cada año
-        resultado = []
-        for año, datos_año in rachas_por_año.items():
-            datos_año['datos'].sort(key=lambda x: x['fecha'])
-            
-            racha_actual = 0
-            racha_maxima = 0
-            
-            for dato in datos_año['datos']:
-                if dato['temp_max'] > 30:
-                    racha_actual += 1
-                    racha_maxima = max(racha_maxima, racha_actual)
-                else:
-                    racha_actual = 0
-            
-            resultado.append({
-                "año": año,
-                "racha_max_gt_30": racha_maxima
-            })
-        
-        # Ordenar por año
-        resultado.sort(key=lambda x: x['año'])
-        
-        return jsonify(resultado)
+        return jsonify(calcular_rachas_historico(parse_predicates("tmax:gt:30")))
         
     except Exception as e:
         logging.error(f"Error en rachas calurosas anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/rachas-torridas-anual')
+@conditional(historico_source)
 def rachas_torridas_anual():
     """Días consecutivos con temperatura máxima > 35°C por año"""
     try:
         logging.info("Dashboard rachas tórridas anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        # Obtener todos los datos por año y calcular rachas
-        pipeline = [
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_completos = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos
-        todos_datos = datos_completos + datos_actuales
-        
-        # Calcular rachas por año
-        rachas_por_año = {}
-        
-        for doc in todos_datos:
-            año = doc['año']
-            if año not in rachas_por_año:
-                rachas_por_año[año] = {'datos': [], 'racha_max': 0}
-            
-            rachas_por_año[año]['datos'].append({
-                'fecha': doc['fecha'],
-                'temp_max': doc['temperatura']['maxima']
-            })
-        
-        # Calcular la racha máxima para cada año
-        resultado = []
-        for año, datos_año in rachas_por_año.items():
-            datos_año['datos'].sort(key=lambda x: x['fecha'])
-            
-            racha_actual = 0
-            racha_maxima = 0
-            
-            for dato in datos_año['datos']:
-                if dato['temp_max'] > 35:
-                    racha_actual += 1
-                    racha_maxima = max(racha_maxima, racha_actual)
-                else:
-                    racha_actual = 0
-            
-            resultado.append({
-                "año": año,
-                "racha_max_gt_35": racha_maxima
-            })
-        
-        # Ordenar por año
-        resultado.sort(key=lambda x: x['año'])
-        
-        return jsonify(resultado)
+        return jsonify(calcular_rachas_historico(parse_predicates("tmax:gt:35")))
         
     except Exception as e:
         logging.error(f"Error en rachas tórridas anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/noches-tropicales-anual')
+@conditional(historico_source)
 def noches_tropicales_anual():
     """Noches con temperatura mínima > 20°C por año"""
     try:
         logging.info("Dashboard noches tropicales anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$año",
-                    "noches_min_gt_20": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.minima", 20]}, 1, 0]
-                        }
-                    }
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_tropicales = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$group": {
-                    "_id": "$año",
-                    "noches_min_gt_20": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.minima", 20]}, 1, 0]
-                        }
-                    }
-                }
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos históricos con actuales
-        datos_completos = datos_tropicales + datos_actuales
-        
-        # Formatear para el frontend
-        resultado = []
-        for doc in datos_completos:
-            resultado.append({
-                "año": doc['_id'],
-                "noches_min_gt_20": doc['noches_min_gt_20']
-            })
-        
-        return jsonify(resultado)
+        return jsonify(contar_dias_por_año("tmin", 20, "noches_min_gt_20"))
         
     except Exception as e:
         logging.error(f"Error en noches tropicales anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/rachas-tropicales-anual')
+@conditional(historico_source)
 def rachas_tropicales_anual():
     """Días consecutivos con temperatura mínima > 20°C por año"""
     try:
         logging.info("Dashboard rachas tropicales anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        # Obtener todos los datos por año y calcular rachas
-        pipeline = [
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_completos = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos
-        todos_datos = datos_completos + datos_actuales
-        
-        # Calcular rachas por año
-        rachas_por_año = {}
-        
-        for doc in todos_datos:
-            año = doc['año']
-            if año not in rachas_por_año:
-                rachas_por_año[año] = {'datos': [], 'racha_max': 0}
-            
-            rachas_por_año[año]['datos'].append({
-                'fecha': doc['fecha'],
-                'temp_min': doc['temperatura']['minima']
-            })
-        
-        # Calcular la racha máxima para cada año
-        resultado = []
-        for año, datos_año in rachas_por_año.items():
-            datos_año['datos'].sort(key=lambda x: x['fecha'])
-            
-            racha_actual = 0
-            racha_maxima = 0
-            
-            for dato in datos_año['datos']:
-                if dato['temp_min'] > 20:
-                    racha_actual += 1
-                    racha_maxima = max(racha_maxima, racha_actual)
-                else:
-                    racha_actual = 0
-            
-            resultado.append({
-                "año": año,
-                "racha_min_gt_20": racha_maxima
-            })
-        
-        # Ordenar por año
-        resultado.sort(key=lambda x: x['año'])
-        
-        return jsonify(resultado)
+        return jsonify(calcular_rachas_historico(parse_predicates("tmin:gt:20")))
         
     except Exception as e:
         logging.error(f"Error en rachas tropicales anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/noches-torridas-anual')
+@conditional(historico_source)
 def noches_torridas_anual():
     """Noches con temperatura mínima > 25°C por año"""
     try:
         logging.info("Dashboard noches tórridas anual endpoint called")
-        
-        intervalos_collection, diario_collection = get_historico_collection()
-        
-        pipeline = [
-            {
-                "$group": {
-                    "_id": "$año",
-                    "noches_min_gt_25": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.minima", 25]}, 1, 0]
-                        }
-                    }
-                }
-            },
-            {
-                "$sort": {"_id": 1}
-            }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_torridas = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$group": {
-                    "_id": "$año",
-                    "noches_min_gt_25": {
-                        "$sum": {
-                            "$cond": [{"$gt": ["$temperatura.minima", 25]}, 1, 0]
-                        }
-                    }
-                }
-            }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
-        
-        # Combinar datos históricos con actuales
-        datos_completos = datos_torridas + datos_actuales
-        
-        # Formatear para el frontend
-        resultado = []
-        for doc in datos_completos:
-            resultado.append({
-                "año": doc['_id'],
-                "noches_min_gt_25": doc['noches_min_gt_25']
-            })
-        
-        return jsonify(resultado)
+        return jsonify(contar_dias_por_año("tmin", 25, "noches_min_gt_25"))
         
     except Exception as e:
         logging.error(f"Error en noches tórridas anual: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 @historico_bp.route('/api/dashboard/rachas-torridas-nocturnas-anual')
+@conditional(historico_source)
 def rachas_torridas_nocturnas_anual():
     """Días consecutivos con temperatura mínima > 25°C por año"""
     try:
         logging.info("Dashboard rachas tórridas nocturnas anual endpoint called")
+        return jsonify(calcular_rachas_historico(parse_predicates("tmin:gt:25")))
         
-        intervalos_collection, diario_collection = get_historico_collection()
+    except Exception as e:
+        logging.error(f"Error en rachas tórridas nocturnas anual: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+# Secciones de /api/dashboard/bundle: nombre (= ruta individual) -> (vista, parámetros que acepta)
+DASHBOARD_SECTIONS = {
+    "records": (dashboard_records, ()),
+    "tendencia-anual": (tendencia_anual, ()),
+    "comparativa-año": (comparativa_año, ("year",)),
+    "heatmap": (heatmap_data, ()),
+    "estadisticas": (estadisticas_destacadas, ("year", "month")),
+    "estadisticas-datos-diarios": (estadisticas_datos_diarios, ("year", "month")),
+    "dias-calurosos-anual": (dias_calurosos_anual, ()),
+    "dias-torridos-anual": (dias_torridos_anual, ()),
+    "noches-tropicales-anual": (noches_tropicales_anual, ()),
+    "noches-torridas-anual": (noches_torridas_anual, ()),
+    "rachas-calurosas-anual": (rachas_calurosas_anual, ()),
+    "rachas-torridas-anual": (rachas_torridas_anual, ()),
+    "rachas-tropicales-anual": (rachas_tropicales_anual, ()),
+    "rachas-torridas-nocturnas-anual": (rachas_torridas_nocturnas_anual, ()),
+    "rachas-anual": (rachas_anual, ()),
+}
+
+@historico_bp.route('/api/dashboard/bundle')
+@conditional(historico_source)
+def dashboard_bundle():
+    """
+    Varias secciones del dashboard en una sola respuesta, p. ej.
+    ?sections=records,heatmap,estadisticas&year=2024&month=7
+    Sin sections se devuelven todas. year/month se pasan a las secciones que
+    los aceptan. Cada sección trae el mismo JSON que su ruta individual en
+    "data" y sus metadatos de caché en "meta".
+    """
+    try:
+        logging.info("Dashboard bundle endpoint called")
+        inicio = time.perf_counter()
+        
+        nombres = [n.strip() for n in request.args.get('sections', '').split(',') if n.strip()]
+        nombres = nombres or list(DASHBOARD_SECTIONS)
+        desconocidas = [n for n in nombres if n not in DASHBOARD_SECTIONS]
+        if desconocidas:
+            return jsonify({
+                "error": f"Secciones desconocidas: {', '.join(desconocidas)}",
+                "secciones_validas": list(DASHBOARD_SECTIONS)
+            }), 400
+        
+        parametros = {
+            "year": request.args.get('year', type=int),
+            "month": request.args.get('month', type=int),
+        }
         
-        # Obtener todos los datos por año y calcular rachas
-        pipeline = [
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
+        # Las secciones no llevan validadores propios: el del bundle los cubre
+        g.conditional_disabled = True
+        
+        # Una sola carga de la serie para todas las secciones: mientras no pasen
+        # TIMESERIES_REFRESH_SECONDS, cada sección recibe esta misma instantánea
+        columnas = historico_store.snapshot()
+        if columnas is not None:
+            meta_comun = {
+                "fuente": "serie_en_memoria",
+                "datos_de": datetime.fromtimestamp(columnas.loaded_at, pytz.utc).isoformat(),
+                "max_age": int(max(0, columnas.loaded_at + TIMESERIES_REFRESH_SECONDS - time.time())),
             }
-        ]
-        
-        # Obtener datos históricos con caché
-        datos_completos = get_historical_data_with_cache(diario_collection, pipeline)
-        
-        # Obtener datos actuales del año actual
-        año_actual = datetime.now().year
-        pipeline_actual = [
-            {
-                "$match": {"año": año_actual}
-            },
-            {
-                "$sort": {"año": 1, "mes": 1, "dia": 1}
+        else:
+            meta_comun = {"fuente": "mongo", "datos_de": None, "max_age": 0}
+        
+        secciones = {}
+        for nombre in nombres:
+            vista, aceptados = DASHBOARD_SECTIONS[nombre]
+            kwargs = {k: parametros[k] for k in aceptados if parametros[k] is not None}
+            inicio_seccion = time.perf_counter()
+            respuesta = current_app.make_response(vista(**kwargs))
+            secciones[nombre] = {
+                "data": respuesta.get_json(),
+                "meta": {
+                    **meta_comun,
+                    "status": respuesta.status_code,
+                    "ms": round((time.perf_counter() - inicio_seccion) * 1000, 1),
+                },
             }
-        ]
-        
-        datos_actuales = list(diario_collection.aggregate(pipeline_actual))
         
-        # Combinar datos
-        todos_datos = datos_completos + datos_actuales
-        
-        # Calcular rachas por año
-        rachas_por_año = {}
-        
-        for doc in todos_datos:
-            año = doc['año']
-            if año not in rachas_por_año:
-                rachas_por_año[año] = {'datos': [], 'racha_max': 0}
-            
-            rachas_por_año[año]['datos'].append({
-                'fecha': doc['fecha'],
-                'temp_min': doc['temperatura']['minima']
-            })
-        
-        # Calcular la racha máxima para cada año
-        resultado = []
-        for año, datos_año in rachas_por_año.items():
-            datos_año['datos'].sort(key=lambda x: x['fecha'])
-            
-            racha_actual = 0
-            racha_maxima = 0
-            
-            for dato in datos_año['datos']:
-                if dato['temp_min'] > 25:
-                    racha_actual += 1
-                    racha_maxima = max(racha_maxima, racha_actual)
-                else:
-                    racha_actual = 0
-            
-            resultado.append({
-                "año": año,
-                "racha_min_gt_25": racha_maxima
-            })
-        
-        # Ordenar por año
-        resultado.sort(key=lambda x: x['año'])
-        
-        return jsonify(resultado)
+        return jsonify({
+            "secciones": secciones,
+            "meta": {
+                **meta_comun,
+                "generado": get_current_date().isoformat(),
+                "ms": round((time.perf_counter() - inicio) * 1000, 1),
+            }
+        })
         
     except Exception as e:
-        logging.error(f"Error en rachas tórridas nocturnas anual: {e}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        logging.error(f"Error en dashboard bundle: {e}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
@@ -2,11 +2,13 @@ from flask import Blueprint, jsonify
 from flask_cors import CORS
 import logging
 import os
+import time
 import pytz
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
 import requests
-from livedata import get_meteohub_parameter
-from database import get_collection  # Import collection from database module
+from livedata import get_meteohub_snapshot
+from database import get_collection, madrid_day_bounds  # Import collection from database module
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,77 +17,163 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 live_bp = Blueprint('live', __name__)
 
+BCN_LAT = 41.389
+BCN_LON = 2.159
+
+# Per-source timeouts and overall response deadline (seconds)
+SOURCE_TIMEOUTS = {
+    'mongo': float(os.getenv('LIVE_TIMEOUT_MONGO', '3')),
+    'owm': float(os.getenv('LIVE_TIMEOUT_OWM', '4')),
+    'meteohub': float(os.getenv('LIVE_TIMEOUT_METEOHUB', '6')),
+}
+RESPONSE_DEADLINE = float(os.getenv('LIVE_RESPONSE_DEADLINE', '8'))
+
+# Bounded pool shared by all requests of this worker. A source that overruns
+# its deadline keeps its thread until the upstream call returns, so the pool
+# caps how many of those can pile up.
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('LIVE_MAX_WORKERS', '8')),
+    thread_name_prefix='live-source'
+)
+
+
+def _timed(func):
+    """Run func and return (result, elapsed_ms)"""
+    started = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - started) * 1000
+
+
+def fetch_today_extremes():
+    """Today's max/min external temperature from the stored readings"""
+    day_start, day_end = madrid_day_bounds(datetime.now(pytz.timezone('Europe/Madrid')).date())
+
+    # Get today's temperature records (index range on 'ts')
+    today_records = get_collection().find(
+        {"ts": {"$gte": day_start, "$lt": day_end}},
+        {"external_temperature": 1, "_id": 0}
+    ).max_time_ms(int(SOURCE_TIMEOUTS['mongo'] * 1000))
+
+    today_temps = []
+    for record in today_records:
+        if record.get('external_temperature') is not None:
+            try:
+                today_temps.append(float(record['external_temperature']))
+            except (ValueError, TypeError):
+                # Skip invalid temperature values like '--'
+                continue
+
+    return {
+        "max_temperature": round(max(today_temps), 1) if today_temps else None,
+        "min_temperature": round(min(today_temps), 1) if today_temps else None,
+    }
+
+
+def fetch_owm_current():
+    """Current description and icon from OpenWeatherMap"""
+    OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
+    if not OPENWEATHER_API_KEY:
+        raise ValueError("OpenWeatherMap API key not configured")
+
+    owm_url = f'https://api.openweathermap.org/data/2.5/weather?lat={BCN_LAT}&lon={BCN_LON}&units=metric&appid={OPENWEATHER_API_KEY}&lang=es'
+    response = requests.get(owm_url, timeout=SOURCE_TIMEOUTS['owm'])
+    response.raise_for_status()
+    owm_data = response.json()
+
+    return {
+        'description': owm_data['weather'][0]['description'],
+        'icon': owm_data['weather'][0]['icon'],
+    }
+
+
+def fetch_meteohub():
+    """Station parameters from a single data_now.xml snapshot"""
+    meteohub = get_meteohub_snapshot()
+    if not meteohub.ok:
+        # Cached failed fetch: report the source as an error, not as 'ok' with nulls
+        raise RuntimeError("Meteohub snapshot unavailable")
+    return {
+        "external_temperature": meteohub.ext_temp,
+        "internal_temperature": meteohub.int_temp,
+        "humidity": meteohub.hum,
+        "wind_direction": meteohub.wind_dir,
+        "wind_speed": meteohub.wind_speed,
+        "gust_speed": meteohub.gust_speed,
+        "pressure": meteohub.sea_press,
+        "current_rain_rate": meteohub.cur_rain,
+        "total_rain": meteohub.total_rain,
+        "solar_radiation": meteohub.rad,
+        "uv_index": meteohub.uv,
+    }
+
+
+# name -> (fetcher, fields returned as null when the source is unavailable)
+SOURCES = {
+    'mongo': (fetch_today_extremes, ("max_temperature", "min_temperature")),
+    'meteohub': (fetch_meteohub, ("external_temperature", "internal_temperature",
+                                  "humidity", "wind_direction", "wind_speed",
+                                  "gust_speed", "pressure", "current_rain_rate",
+                                  "total_rain", "solar_radiation", "uv_index")),
+    'owm': (fetch_owm_current, ('description', 'icon')),
+}
+
+
+def gather_sources():
+    """
+    Launch every source concurrently and collect what arrives in time.
+
+    Returns (fields, timings) where timings maps source -> (elapsed_ms, status).
+    """
+    started = time.perf_counter()
+    deadline = started + RESPONSE_DEADLINE
+    futures = {
+        name: _executor.submit(_timed, fetcher)
+        for name, (fetcher, _) in SOURCES.items()
+    }
+
+    fields = {}
+    timings = {}
+    for name, future in futures.items():
+        _, source_fields = SOURCES[name]
+        wait = min(started + SOURCE_TIMEOUTS[name], deadline) - time.perf_counter()
+        try:
+            result, elapsed_ms = future.result(timeout=max(wait, 0))
+            fields.update(result)
+            timings[name] = (elapsed_ms, 'ok')
+        except FutureTimeoutError:
+            logger.warning(f"/api/live source '{name}' missed its deadline")
+            future.cancel()
+            fields.update(dict.fromkeys(source_fields))
+            timings[name] = ((time.perf_counter() - started) * 1000, 'timeout')
+        except Exception as e:
+            logger.error(f"/api/live source '{name}' failed: {e}")
+            fields.update(dict.fromkeys(source_fields))
+            timings[name] = ((time.perf_counter() - started) * 1000, 'error')
+
+    timings['total'] = ((time.perf_counter() - started) * 1000, None)
+    return fields, timings
+
+
+def server_timing_header(timings):
+    parts = []
+    for name, (elapsed_ms, status) in timings.items():
+        entry = f"{name};dur={elapsed_ms:.1f}"
+        if status and status != 'ok':
+            entry += f';desc="{status}"'
+        parts.append(entry)
+    return ", ".join(parts)
 
 
 @live_bp.route('/api/live')
 def live_weather():
     try:
-        # Get current date in Madrid timezone
-        madrid_tz = pytz.timezone('Europe/Madrid')
-        now = datetime.now(madrid_tz)
-        today = now.strftime("%d-%m-%Y")
-        
-        # Get today's temperature records
-        today_records = list(get_collection().find({
-            "timestamp": {"$regex": f"^{today}"}
-        }).sort("timestamp", 1))
-        
-        # Calculate min and max temperatures for today
-        today_temps = []
-        for record in today_records:
-            if 'external_temperature' in record and record['external_temperature'] is not None:
-                try:
-                    temp_value = float(record['external_temperature'])
-                    today_temps.append(temp_value)
-                except (ValueError, TypeError):
-                    # Skip invalid temperature values like '--'
-                    continue
-        
-        max_temp = round(max(today_temps), 1) if today_temps else None
-        min_temp = round(min(today_temps), 1) if today_temps else None
-
-        BCN_LAT = 41.389
-        BCN_LON = 2.159
-        # First check if it's raining using OpenWeather's current weather
-        OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
-        if not OPENWEATHER_API_KEY:
-            error_msg = "OpenWeatherMap API key not configured"
-            logger.error(error_msg)
-            return jsonify({'error': error_msg}), 500
-        
-        # Get current weather data
-        owm_url = f'https://api.openweathermap.org/data/2.5/weather?lat={BCN_LAT}&lon={BCN_LON}&units=metric&appid={OPENWEATHER_API_KEY}&lang=es'
-        response = requests.get(owm_url)
-        response.raise_for_status()
-        owm_data = response.json()
-
-        # Get weather overview
-        overview_url = f'https://api.openweathermap.org/data/3.0/onecall/overview?lon={BCN_LON}&lat={BCN_LAT}&units=metric&appid={OPENWEATHER_API_KEY}'
-        overview_response = requests.get(overview_url)
-        overview_response.raise_for_status()
- 
-        live_data = {
-            "external_temperature": get_meteohub_parameter("ext_temp"),
-            "max_temperature": max_temp,
-            "min_temperature": min_temp,
-            "internal_temperature": get_meteohub_parameter("int_temp"),
-            "humidity": get_meteohub_parameter("hum"),
-            "wind_direction": get_meteohub_parameter("wind_dir"),
-            "wind_speed": get_meteohub_parameter("wind_speed"),
-            "gust_speed": get_meteohub_parameter("gust_speed"),
-            "pressure": get_meteohub_parameter("sea_press"),
-            "current_rain_rate": get_meteohub_parameter("cur_rain"),
-            "total_rain": get_meteohub_parameter("total_rain"),
-            "solar_radiation": get_meteohub_parameter("rad"),
-            "uv_index": get_meteohub_parameter("uv"),
-            'description': owm_data['weather'][0]['description'],
-            "icon": owm_data['weather'][0]['icon']
-        }
-
-#        if any(value is None for value in live_data.values()):
-#            return jsonify({"error": "Could not retrieve complete live weather data"}), 500
-
-        return jsonify(live_data)
+        # Sources that miss their deadline or fail come back as null fields
+        live_data, timings = gather_sources()
+
+        response = jsonify(live_data)
+        response.headers['Server-Timing'] = server_timing_header(timings)
+        response.headers['Timing-Allow-Origin'] = '*'
+        return response
     except Exception as e:
         logging.error(f"Error in live_weather endpoint: {e}")
-        return jsonify({"error": "Internal server error"}), 500 
\ No newline at end of file
+        return jsonify({"error": "Internal server error"}), 500
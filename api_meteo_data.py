@@ -4,6 +4,8 @@ import os
 import pytz
 from datetime import datetime, timedelta
 from database import get_collection
+from lttb import downsample_records
+from series_format import format_records, mongo_projection, requested_fields
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -12,6 +14,16 @@ logger = logging.getLogger(__name__)
 # Create Blueprint
 meteo_bp = Blueprint('meteo', __name__)
 
+# Campos de cada lectura que devuelve el endpoint (ver log_meteo_data.py)
+METEO_FIELDS = (
+    "timestamp", "external_temperature", "internal_temperature", "humidity",
+    "pressure", "wind_speed", "wind_direction", "current_rain_rate",
+    "total_rain", "solar_radiation",
+)
+
+# Campo con el que LTTB elige qué puntos conservar
+SAMPLING_FIELD = os.getenv('METEO_SAMPLING_FIELD', 'external_temperature')
+
 @meteo_bp.route('/api/meteo-data')
 def temperature_data():
     try:
@@ -31,62 +43,56 @@ def temperature_data():
         else:
             return jsonify({"error": "Invalid time range"}), 400
 
-        # Obtener los días a consultar
-        days_to_query = []
-        current_day = start_time
-        while current_day <= end_time:
-            day_str = current_day.strftime("%d-%m-%Y")
-            days_to_query.append(day_str)
-            current_day += timedelta(days=1)
-
-        logging.info(f"Días a consultar: {days_to_query}")
-
-        # Construir consulta para obtener documentos por día
-        query = {
-            "$or": [
-                {"timestamp": {"$regex": f"^{day}"}} for day in days_to_query
-            ]
-        }
+        # Consulta por rango sobre el campo datetime indexado 'ts'
+        query = {"ts": {"$gte": start_time, "$lte": end_time}}
         
         logging.info(f"Query: {query}")
         
-        # Obtener documentos
-        all_data = list(get_collection().find(query).sort("timestamp", 1))
-        logging.info(f"Documentos encontrados antes de filtrar por hora: {len(all_data)}")
+        # Obtener documentos. 'ts' y SAMPLING_FIELD se leen siempre (ejes del
+        # muestreo) pero solo se devuelven si se piden en ?fields=
+        fields = requested_fields()
+        projection = mongo_projection(always=("timestamp", "ts", SAMPLING_FIELD)) or \
+            {"_id": 1, "ts": 1, **{field: 1 for field in METEO_FIELDS}}
+        filtered_data = list(get_collection().find(query, projection).sort("ts", 1))
         
-        if all_data:
-            logging.info(f"Primer documento: {all_data[0]['timestamp']}")
-            logging.info(f"Último documento: {all_data[-1]['timestamp']}")
-
-        # Función para convertir timestamp string a datetime
-        def parse_timestamp(ts):
-            return datetime.strptime(ts, "%d-%m-%Y %H:%M")
-
-        # Convertir las fechas límite a datetime
-        start_dt = parse_timestamp(start_time.strftime("%d-%m-%Y %H:%M"))
-        end_dt = parse_timestamp(end_time.strftime("%d-%m-%Y %H:%M"))
-        
-        # Filtrar los datos usando objetos datetime para la comparación
-        filtered_data = [
-            doc for doc in all_data 
-            if start_dt <= parse_timestamp(doc['timestamp']) <= end_dt
-        ]
-        
-        logging.info(f"Documentos después de filtrar por hora: {len(filtered_data)}")
+        logging.info(f"Documentos encontrados: {len(filtered_data)}")
         if filtered_data:
-            logging.info(f"Primer documento filtrado: {filtered_data[0]['timestamp']}")
-            logging.info(f"Último documento filtrado: {filtered_data[-1]['timestamp']}")
-            logging.info(f"Hora inicio filtro: {start_dt}")
-            logging.info(f"Hora fin filtro: {end_dt}")
+            logging.info(f"Primer documento: {filtered_data[0]['timestamp']}")
+            logging.info(f"Último documento: {filtered_data[-1]['timestamp']}")
 
-        # Aplicar sampling
-        sampled_data = filtered_data[::interval]
+        # Aplicar sampling: por defecto LTTB con tantos puntos como el antiguo
+        # "uno de cada interval" (?points= para otro número, ?sampling=every
+        # para el muestreo simple)
+        sampling = request.args.get('sampling', 'lttb')
+        if sampling not in ('lttb', 'every'):
+            return jsonify({"error": "Invalid sampling (lttb, every)"}), 400
+        if 'points' in request.args:
+            try:
+                points = int(request.args['points'])
+            except ValueError:
+                return jsonify({"error": "Invalid points"}), 400
+            # LTTB conserva siempre el primer y el último punto: con menos de 3
+            # devolvería la serie completa
+            if points < 3:
+                return jsonify({"error": "Invalid points (minimum 3)"}), 400
+        else:
+            points = -(-len(filtered_data) // interval)
+        points = min(points, len(filtered_data))
+
+        if sampling == 'every':
+            sampled_data = filtered_data[::interval]
+        else:
+            sampled_data = downsample_records(filtered_data, points, "ts", SAMPLING_FIELD)
+        logging.info(f"Sampling {sampling}: {len(filtered_data)} -> {len(sampled_data)} puntos")
         
         # Preparar para JSON
         for entry in sampled_data:
-            entry["_id"] = str(entry["_id"])
+            if "_id" in entry:
+                entry["_id"] = str(entry["_id"])
+            if not fields or "ts" not in fields:
+                entry.pop("ts", None)
         
-        return jsonify(sampled_data)
+        return jsonify(format_records(sampled_data))
         
     except Exception as e:
         logging.error(f"Error fetching meteo data: {e}", exc_info=True)
@@ -6,6 +6,10 @@ from datetime import datetime
 import threading
 import time
 from database import get_db
+import process_lock
+import shared_cache
+from burgos_daily_rollup import update_daily_extremes
+from series_format import format_records, mongo_projection
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -24,13 +28,19 @@ SARRIA_LAT = 41.39525993208715
 SARRIA_LON = 2.12245595765206
 
 # Database collections
-try:
-    db = get_db()
-    weather_collection = db.gw_burgos_data
-    logger.info("Connected to gw_burgos_data collection")
-except Exception as e:
-    logger.error(f"Error connecting to gw_burgos_data collection: {e}")
-    raise
+def get_weather_collection():
+    """Colección gw_burgos_data (pool compartido)"""
+    return get_db().gw_burgos_data
+
+# Fields the comparison endpoints return by default. raw_data (the full Google
+# payload, stored twice per document) is only read when asked for in ?fields=
+GW_SUMMARY_FIELDS = ('source', 'temperature', 'humidity', 'pressure', 'wind_speed',
+                     'wind_direction', 'weather_description', 'clouds', 'timestamp')
+GW_PROJECTION = {
+    '_id': 1,
+    'timestamp': 1,
+    **{f'google_weather_burgos_center.{field}': 1 for field in GW_SUMMARY_FIELDS},
+}
 
 # Weather data functions
 def get_aemet_data():
@@ -250,9 +260,15 @@ def collect_weather_data():
         }
         
         # Store in database
-        result = weather_collection.insert_one(weather_record)
+        result = get_weather_collection().insert_one(weather_record)
         weather_record['_id'] = result.inserted_id
         logger.info(f"Burgos Centro weather data collected at {timestamp}")
+
+        # Keep today's extremes (gw_burgos_daily) up to date
+        try:
+            update_daily_extremes(weather_record)
+        except Exception as e:
+            logger.error(f"Error updating Burgos daily extremes: {e}")
         
         return weather_record
         
@@ -265,16 +281,21 @@ def collect_weather_data():
 def get_current_weather():
     """Get current weather comparison"""
     try:
-        # Get latest weather data
-        latest_record = weather_collection.find_one(sort=[('timestamp', -1)])
+        # Get latest weather data (same fields as /api/weather/history)
+        projection = mongo_projection(always=('timestamp',)) or GW_PROJECTION
+        latest_record = get_weather_collection().find_one({}, projection, sort=[('timestamp', -1)])
         
         if not latest_record:
-            # If no data exists, collect it now
-            latest_record = collect_weather_data()
+            # If no data exists, collect it now and re-read it with the same
+            # projection, so the response has one shape either way
+            collected = collect_weather_data()
+            if collected:
+                latest_record = get_weather_collection().find_one({'_id': collected['_id']}, projection)
         
         if latest_record:
             # Convert ObjectId to string and datetime to ISO format
-            latest_record['_id'] = str(latest_record['_id'])
+            if '_id' in latest_record:
+                latest_record['_id'] = str(latest_record['_id'])
             latest_record['timestamp'] = latest_record['timestamp'].isoformat()
             
             return jsonify({
@@ -299,16 +320,19 @@ def get_weather_history():
         limit = int(request.args.get('limit', 30))
         limit = min(max(limit, 1), 2000)  # Ensure limit is between 1 and 2000
         
-        records = list(weather_collection.find().sort('timestamp', -1).limit(limit))
+        # ?fields= is pushed down to Mongo so unrequested blobs (raw_data) are not read
+        projection = mongo_projection(always=('timestamp',)) or GW_PROJECTION
+        records = list(get_weather_collection().find({}, projection).sort('timestamp', -1).limit(limit))
         
         # Convert ObjectId to string and datetime to ISO format
         for record in records:
-            record['_id'] = str(record['_id'])
+            if '_id' in record:
+                record['_id'] = str(record['_id'])
             record['timestamp'] = record['timestamp'].isoformat()
         
         return jsonify({
             'success': True,
-            'data': records,
+            'data': format_records(records),
             'count': len(records),
             'limit': limit
         })
@@ -359,7 +383,7 @@ def get_scheduler_status_endpoint():
 def start_scheduler_endpoint():
     """Start the weather data scheduler"""
     try:
-        result = start_weather_scheduler()
+        result = start_weather_scheduler(clear_stop=True)
         if result:
             return jsonify({
                 'success': True,
@@ -391,49 +415,75 @@ def stop_scheduler_endpoint():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Scheduler control variables
-scheduler_running = True
+SCHEDULER_LOCK = 'weather_comparison_scheduler'
+# Stop requests live in shared_cache so every worker sees them, not only the
+# one that handled the POST
+SCHEDULER_STOP_KEY = 'weather_scheduler:stopped'
+SCHEDULER_STOP_TTL = 365 * 86400
 scheduler_thread = None
 
+
+def scheduler_stopped():
+    """True if a stop was requested from any worker and not undone by a start"""
+    return bool(shared_cache.get(SCHEDULER_STOP_KEY))
+
 # Background task for automatic weather data collection
 def weather_data_scheduler():
     """Background scheduler to collect weather data every 10 minutes"""
-    global scheduler_running
-    while scheduler_running:
-        try:
-            if scheduler_running:  # Double check before collecting
-                collect_weather_data()
+    try:
+        while True:
+            try:
+                if scheduler_stopped():
+                    # Give up leadership so a later start can be picked up by any worker
+                    if process_lock.is_leader(SCHEDULER_LOCK):
+                        process_lock.release(SCHEDULER_LOCK)
+                        logger.info("Weather data scheduler stopped, leader lock released")
+                # Every gunicorn worker runs this thread; only the lock holder collects
+                elif process_lock.try_acquire(SCHEDULER_LOCK):
+                    collect_weather_data()
+            except Exception as e:
+                logger.error(f"Error in weather scheduler: {e}")
             time.sleep(600)  # 10 minutes = 600 seconds
-        except Exception as e:
-            logger.error(f"Error in weather scheduler: {e}")
-            time.sleep(600)  # Continue trying every 10 minutes
-    logger.info("Weather data scheduler stopped")
+    finally:
+        process_lock.release(SCHEDULER_LOCK)
 
 # Start background scheduler
-def start_weather_scheduler():
-    global scheduler_running, scheduler_thread
+def start_weather_scheduler(clear_stop=False):
+    """
+    Start this worker's scheduler thread. Only the /start endpoint passes
+    clear_stop=True: a worker booting (deploy, respawn) must not undo a
+    host-wide stop, and its thread already honours scheduler_stopped().
+    """
+    global scheduler_thread
+    was_stopped = clear_stop and scheduler_stopped()
+    if was_stopped:
+        shared_cache.delete(SCHEDULER_STOP_KEY)
     if scheduler_thread is None or not scheduler_thread.is_alive():
-        scheduler_running = True
         scheduler_thread = threading.Thread(target=weather_data_scheduler, daemon=True)
         scheduler_thread.start()
         logger.info("✅ Weather data scheduler started (collects every 10 minutes)")
         return True
-    return False
+    return was_stopped
 
 # Stop background scheduler
 def stop_weather_scheduler():
-    global scheduler_running
-    scheduler_running = False
+    """Ask the scheduler of every worker to stop collecting (the leader releases its lock)"""
+    shared_cache.set(SCHEDULER_STOP_KEY, True, ttl=SCHEDULER_STOP_TTL)
+    if process_lock.is_leader(SCHEDULER_LOCK):
+        process_lock.release(SCHEDULER_LOCK)
     logger.info("🛑 Weather data scheduler stop requested")
     return True
 
 # Get scheduler status
 def get_scheduler_status():
-    global scheduler_running, scheduler_thread
     is_alive = scheduler_thread is not None and scheduler_thread.is_alive()
+    running = not scheduler_stopped()
     return {
-        'running': scheduler_running,
+        'running': running,
         'thread_alive': is_alive,
-        'status': 'running' if scheduler_running and is_alive else 'stopped'
+        'leader': process_lock.is_leader(SCHEDULER_LOCK),
+        'pid': os.getpid(),
+        'status': 'running' if running and is_alive else 'stopped'
     }
 
 # Initialize scheduler when blueprint is imported
@@ -2,8 +2,9 @@ from flask import Blueprint, jsonify, request
 import logging
 import os
 import pytz
-from datetime import datetime, timedelta
-from database import get_collection
+from datetime import datetime
+from daily_rollup import get_rollup_collection
+from series_format import format_records
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -30,73 +31,28 @@ def yearly_temperature_data():
 
         logging.info(f"Consultando datos desde {start_date.strftime('%d-%m-%Y')} hasta {end_date.strftime('%d-%m-%Y')}")
 
-        # Obtener los días a consultar
-        days_to_query = []
-        current_day = start_date
-        while current_day <= end_date:
-            day_str = current_day.strftime("%d-%m-%Y")
-            days_to_query.append(day_str)
-            current_day += timedelta(days=1)
+        # Leer el resumen diario precalculado (un documento por día)
+        rollups = get_rollup_collection().find(
+            {"_id": {"$gte": start_date.strftime("%Y-%m-%d"), "$lte": end_date.strftime("%Y-%m-%d")}},
+            {"max": 1, "min": 1, "sum": 1, "count": 1}
+        ).sort("_id", 1)
 
-        # Construir consulta para obtener documentos por día
-        query = {
-            "$or": [
-                {"timestamp": {"$regex": f"^{day}"}} for day in days_to_query
-            ]
-        }
-        
-        logging.info(f"Consultando {len(days_to_query)} días")
-        
-        # Obtener documentos
-        all_data = list(get_collection().find(query).sort("timestamp", 1))
-        logging.info(f"Encontrados {len(all_data)} registros")
-        
-        # Procesar datos para obtener máximas, mínimas y medias por día
-        daily_data = {}
-        
-        for entry in all_data:
-            try:
-                # Parsear timestamp y convertir a zona horaria de Madrid
-                timestamp = datetime.strptime(entry['timestamp'], "%d-%m-%Y %H:%M")
-                timestamp = madrid_tz.localize(timestamp)
-                date_key = timestamp.strftime("%Y-%m-%d")
-                
-                if date_key not in daily_data:
-                    daily_data[date_key] = {
-                        'temps': [],
-                        'date': date_key
-                    }
-                
-                if 'external_temperature' in entry and entry['external_temperature'] is not None:
-                    temp = float(entry['external_temperature'])
-                    # Filtrar valores atípicos (opcional)
-                    if -40 <= temp <= 50:  # Rango razonable de temperaturas
-                        daily_data[date_key]['temps'].append(temp)
-                
-            except (ValueError, TypeError) as e:
-                logging.warning(f"Error procesando entrada {entry['timestamp']}: {str(e)}")
-                continue
-
-        # Calcular estadísticas diarias
         processed_data = []
-        for date_key, data in daily_data.items():
-            if data['temps']:
-                temps = data['temps']
-                processed_data.append({
-                    'date': date_key,
-                    'max': round(max(temps), 1),
-                    'min': round(min(temps), 1),
-                    'mean': round(sum(temps) / len(temps), 1)
-                })
+        for day in rollups:
+            if not day.get('count'):
+                continue
+            processed_data.append({
+                'date': day['_id'],
+                'max': round(day['max'], 1),
+                'min': round(day['min'], 1),
+                'mean': round(day['sum'] / day['count'], 1)
+            })
 
-        # Ordenar por fecha
-        processed_data.sort(key=lambda x: x['date'])
-        
         logging.info(f"Procesados datos para {len(processed_data)} días")
         
         return jsonify({
             'status': 'success',
-            'data': processed_data
+            'data': format_records(processed_data)
         })
         
     except Exception as e:
@@ -1,6 +1,6 @@
 from flask import Flask
 from flask_cors import CORS
-from flask_caching import Cache
+from flask_compress import Compress
 import os
 
 
@@ -18,6 +18,9 @@ from api_graphcast import graphcast_bp
 from api_ai_forecast import ai_forecast_bp
 from api_aemet_forecast import aemet_forecast_bp
 from api_forecast_comparison import forecast_comparison_bp
+from cache_manager import cache
+from mongo_pool import mongo_pool_bp
+from cache_warmer import cache_warmer_bp, start_cache_warmer
 
 app = Flask(__name__)
 
@@ -38,7 +41,17 @@ else:
     }
 
 app.config.from_mapping(cache_config)
-cache = Cache(app)
+cache.init_app(app)
+
+# Compress JSON/text responses (brotli or gzip, per Accept-Encoding) above a size threshold
+app.config.update(
+    COMPRESS_ALGORITHM=['br', 'gzip'],
+    COMPRESS_MIN_SIZE=int(os.getenv('COMPRESS_MIN_SIZE', '1024')),
+    COMPRESS_MIMETYPES=['application/json', 'text/plain', 'text/csv', 'text/html'],
+    COMPRESS_BR_LEVEL=int(os.getenv('COMPRESS_BR_LEVEL', '4')),
+    COMPRESS_LEVEL=int(os.getenv('COMPRESS_LEVEL', '6')),
+)
+Compress(app)
 
 
 # Register blueprints
@@ -55,6 +68,11 @@ app.register_blueprint(graphcast_bp)
 app.register_blueprint(ai_forecast_bp)
 app.register_blueprint(aemet_forecast_bp)
 app.register_blueprint(forecast_comparison_bp)
+app.register_blueprint(mongo_pool_bp)
+app.register_blueprint(cache_warmer_bp)
+
+# Pre-warm dashboard and forecast caches (only the leader worker does the work)
+start_cache_warmer(app)
 
 if __name__ == '__main__':
     app.run(debug=True, use_reloader=False)
\ No newline at end of file
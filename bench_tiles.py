@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de teselas AIFS: latencia por zoom de un GeoTIFF en tiras
+(formato anterior) frente al COG que escribe ahora el pipeline.
+
+Escribe los mismos datos con PLAIN_RASTER_PROFILE y RASTER_PROFILE en un
+directorio temporal y renderiza todas las teselas de la Península de cada
+zoom como lo hace serve_tile sin caché (abrir el GeoTIFF, leer, LUT, PNG).
+
+Con un GeoTIFF del pipeline:
+
+    python bench_tiles.py --tiff /tmp/graphcast/t2m_step024.tif
+
+Con datos sintéticos a otra resolución (0.25° es la de AIFS):
+
+    python bench_tiles.py --res 0.01 --zooms 4-9
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import api_graphcast as gc
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def load_source(tiff, res):
+    """DataArray (latitude, longitude) de un GeoTIFF o sintético sobre IBERIA_BOUNDS"""
+    import xarray as xr
+    import rioxarray
+
+    if tiff:
+        da = rioxarray.open_rasterio(tiff).squeeze("band", drop=True)
+        return da.rename(x="longitude", y="latitude")
+
+    lon_min, lat_min, lon_max, lat_max = gc.IBERIA_BOUNDS
+    lat = np.arange(lat_max, lat_min - 1e-9, -res)
+    lon = np.arange(lon_min, lon_max + 1e-9, res)
+    # Campo suave con algo de ruido, en el rango de t2m
+    yy, xx = np.meshgrid(np.linspace(0, 3, len(lat)), np.linspace(0, 3, len(lon)), indexing="ij")
+    data = 15 + 10 * np.sin(xx) * np.cos(yy) + np.random.default_rng(0).normal(0, 0.5, yy.shape)
+    return xr.DataArray(data.astype("float32"), coords={"latitude": lat, "longitude": lon},
+                        dims=("latitude", "longitude"))
+
+
+def time_tiles(path, tiles, repeat):
+    """ms por tesela: un Reader nuevo por tesela, como una petición sin caché"""
+    from rio_tiler.io import Reader
+
+    latencies = []
+    for _ in range(repeat):
+        for z, x, y in tiles:
+            started = time.perf_counter()
+            with Reader(path) as src:
+                gc._render_tile("t2m", 24, z, x, y, src=src)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de teselas: GeoTIFF en tiras vs COG")
+    parser.add_argument('--tiff', help="GeoTIFF de origen (por defecto, datos sintéticos)")
+    parser.add_argument('--res', type=float, default=0.25,
+                        help="Resolución en grados de los datos sintéticos")
+    parser.add_argument('--zooms', default='4-9')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Pasadas por zoom (la primera incluye la caché fría del SO)")
+    args = parser.parse_args()
+
+    da = load_source(args.tiff, args.res)
+    layouts = {'gtiff': gc.PLAIN_RASTER_PROFILE, 'cog': gc.RASTER_PROFILE}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        for name, profile in layouts.items():
+            paths[name] = os.path.join(tmp, f"{name}.tif")
+            gc._to_raster(da, paths[name], profile)
+
+        print(f"Raster {da.sizes['longitude']}×{da.sizes['latitude']}  " + "  ".join(
+            f"{name} {os.path.getsize(path) / 1024:.0f} KB" for name, path in paths.items()))
+        print(f"{'zoom':>4} {'teselas':>7}  " + "  ".join(
+            f"{name + ' p50':>10} {name + ' p95':>10}" for name in layouts) + "  speedup p50")
+
+        for z in gc._parse_zooms(args.zooms):
+            tiles = gc._iberia_tiles([z])
+            row = {name: time_tiles(path, tiles, args.repeat) for name, path in paths.items()}
+            p50 = {name: _percentile(values, 50) for name, values in row.items()}
+            print(f"{z:>4} {len(tiles):>7}  " + "  ".join(
+                f"{p50[name]:8.2f}ms {_percentile(row[name], 95):8.2f}ms" for name in layouts)
+                + f"  {p50['gtiff'] / p50['cog']:10.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Extremos diarios de Burgos Centro (colección 'gw_burgos_daily').
+
+Cada documento resume las lecturas de Google Weather de 'gw_burgos_data' de
+un día natural de Madrid:
+
+    {
+        "_id": "YYYY-MM-DD",
+        "max": float, "max_ts": datetime,
+        "min": float, "min_ts": datetime,
+        "count": int,
+        "first_ts": datetime, "last_ts": datetime
+    }
+
+collect_weather_data lo mantiene en cada inserción con un único update de
+pipeline (la hora del extremo cambia solo si el valor lo supera), de modo que
+/api/burgos-daily-extremes es una lectura por _id. day_extremes() calcula lo
+mismo con una agregación por rango de 'timestamp' para los días sin resumen.
+
+Los timestamps sin zona de gw_burgos_data se interpretan como UTC. Para
+reconstruir días pasados (o el día en curso tras desplegar):
+
+    python burgos_daily_rollup.py [--since YYYY-MM-DD]
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+import pytz
+
+import mongo_pool
+from mongo_pool import get_db
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = 'gw_burgos_daily'
+SOURCE_COLLECTION = 'gw_burgos_data'
+
+MADRID_TZ = pytz.timezone('Europe/Madrid')
+
+# Rango razonable de temperaturas en Burgos; fuera de él se considera lectura errónea
+MIN_VALID_TEMP = -20
+MAX_VALID_TEMP = 45
+
+_indexes_checked = False
+
+
+def get_rollup_collection():
+    """Get the daily extremes collection"""
+    return get_db()[ROLLUP_COLLECTION]
+
+
+def get_source_collection():
+    """Get the Google Weather readings collection"""
+    return get_db()[SOURCE_COLLECTION]
+
+
+def ensure_indexes():
+    """Índice de 'timestamp' para las consultas por rango (una vez por proceso)"""
+    global _indexes_checked
+    if not _indexes_checked:
+        get_source_collection().create_index([("timestamp", 1)], name="timestamp_1")
+        _indexes_checked = True
+
+
+def reading_temperature(record):
+    """Temperatura válida de un documento de gw_burgos_data o None"""
+    value = (record.get('google_weather_burgos_center') or {}).get('temperature')
+    if value is None:
+        value = ((record.get('raw_data') or {}).get('temperature') or {}).get('degrees')
+    try:
+        temp = float(value)
+    except (TypeError, ValueError):
+        return None
+    if MIN_VALID_TEMP <= temp <= MAX_VALID_TEMP:
+        return temp
+    return None
+
+
+def _as_utc(ts):
+    if ts.tzinfo is None:
+        return pytz.utc.localize(ts)
+    return ts.astimezone(pytz.utc)
+
+
+def day_key(ts):
+    return _as_utc(ts).astimezone(MADRID_TZ).strftime("%Y-%m-%d")
+
+
+def day_bounds_utc(day):
+    """[inicio, fin) de un día de Madrid como datetimes UTC sin zona (como se guardan)"""
+    start = MADRID_TZ.localize(datetime.combine(day, datetime.min.time()))
+    end = MADRID_TZ.localize(datetime.combine(day + timedelta(days=1), datetime.min.time()))
+    return (start.astimezone(pytz.utc).replace(tzinfo=None),
+            end.astimezone(pytz.utc).replace(tzinfo=None))
+
+
+def update_daily_extremes(record):
+    """Acumula una lectura en el resumen de su día (upsert atómico)"""
+    temp = reading_temperature(record)
+    if temp is None:
+        logger.warning("Lectura de Burgos sin temperatura válida, no se agrega")
+        return False
+
+    ts = _as_utc(record['timestamp']).replace(tzinfo=None)
+    try:
+        ensure_indexes()
+    except Exception as e:
+        logger.warning(f"No se pudo crear el índice de timestamp: {e}")
+
+    # En un mismo $set las expresiones ven el documento anterior, así que
+    # max_ts/min_ts se comparan con el extremo previo
+    get_rollup_collection().update_one(
+        {"_id": day_key(ts)},
+        [{"$set": {
+            "max_ts": {"$cond": [{"$or": [{"$eq": [{"$type": "$max"}, "missing"]},
+                                          {"$gt": [temp, "$max"]}]}, ts, "$max_ts"]},
+            "min_ts": {"$cond": [{"$or": [{"$eq": [{"$type": "$min"}, "missing"]},
+                                          {"$lt": [temp, "$min"]}]}, ts, "$min_ts"]},
+            "max": {"$max": ["$max", temp]},
+            "min": {"$min": ["$min", temp]},
+            "count": {"$add": [{"$ifNull": ["$count", 0]}, 1]},
+            "first_ts": {"$min": ["$first_ts", ts]},
+            "last_ts": {"$max": ["$last_ts", ts]},
+        }}],
+        upsert=True
+    )
+    return True
+
+
+def _extremes_stages(match):
+    """Etapas que agrupan las lecturas por día de Madrid en el formato del resumen"""
+    return [
+        {"$match": match},
+        {"$project": {
+            "ts": {"$convert": {"input": "$timestamp", "to": "date", "onError": None, "onNull": None}},
+            "temp": {"$convert": {
+                "input": {"$ifNull": ["$google_weather_burgos_center.temperature",
+                                     "$raw_data.temperature.degrees"]},
+                "to": "double", "onError": None, "onNull": None
+            }},
+        }},
+        {"$match": {"ts": {"$ne": None}, "temp": {"$gte": MIN_VALID_TEMP, "$lte": MAX_VALID_TEMP}}},
+        {"$sort": {"ts": 1}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$ts", "timezone": "Europe/Madrid"}},
+            "max": {"$max": "$temp"},
+            "min": {"$min": "$temp"},
+            "count": {"$sum": 1},
+            "first_ts": {"$first": "$ts"},
+            "last_ts": {"$last": "$ts"},
+            "readings": {"$push": {"t": "$temp", "ts": "$ts"}},
+        }},
+        # Primera lectura que alcanza cada extremo
+        {"$set": {
+            "max_ts": {"$arrayElemAt": [{"$map": {
+                "input": {"$filter": {"input": "$readings", "cond": {"$eq": ["$$this.t", "$max"]}}},
+                "in": "$$this.ts"}}, 0]},
+            "min_ts": {"$arrayElemAt": [{"$map": {
+                "input": {"$filter": {"input": "$readings", "cond": {"$eq": ["$$this.t", "$min"]}}},
+                "in": "$$this.ts"}}, 0]},
+        }},
+        {"$unset": "readings"},
+    ]
+
+
+def day_extremes(day):
+    """Resumen de un día calculado desde gw_burgos_data (rango indexado) o None"""
+    start, end = day_bounds_utc(day)
+    docs = list(get_source_collection().aggregate(
+        _extremes_stages({"timestamp": {"$gte": start, "$lt": end}})
+    ))
+    return docs[0] if docs else None
+
+
+def get_daily_extremes(day):
+    """Resumen de un día: del rollup si existe, si no agregando las lecturas"""
+    doc = get_rollup_collection().find_one({"_id": day.strftime("%Y-%m-%d")})
+    if doc is not None:
+        return doc, 'rollup'
+    return day_extremes(day), 'aggregate'
+
+
+def rebuild_daily_extremes(since=None):
+    """Recalcula 'gw_burgos_daily' desde las lecturas de gw_burgos_data"""
+    match = {"timestamp": {"$gte": day_bounds_utc(since.date())[0]}} if since else {}
+    pipeline = _extremes_stages(match) + [{"$merge": {
+        "into": ROLLUP_COLLECTION,
+        "on": "_id",
+        "whenMatched": "replace",
+        "whenNotMatched": "insert"
+    }}]
+
+    started = datetime.now()
+    ensure_indexes()
+    get_source_collection().aggregate(pipeline, allowDiskUse=True)
+    total = get_rollup_collection().count_documents(
+        {"_id": {"$gte": since.strftime("%Y-%m-%d")}} if since else {}
+    )
+    logger.info(
+        f"Extremos diarios de Burgos reconstruidos: {total} días en "
+        f"{(datetime.now() - started).total_seconds():.1f}s"
+    )
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye la colección gw_burgos_daily")
+    parser.add_argument('--since', type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help="Primer día a reconstruir (YYYY-MM-DD); por defecto, todo")
+    args = parser.parse_args()
+
+    try:
+        rebuild_daily_extremes(args.since)
+    finally:
+        mongo_pool.close_client()
+
+
+if __name__ == '__main__':
+    main()
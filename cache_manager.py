@@ -3,18 +3,74 @@ Cache Manager para MeteoSarria
 Gestiona el caché inteligente que excluye datos actuales del año/mes/día actual
 """
 
+import hashlib
+import json
 import logging
+import threading
 from datetime import datetime, timedelta
 import pytz
 from functools import wraps
-from flask import current_app
+from flask import current_app, g, request
+from flask_caching import Cache
 
 logger = logging.getLogger(__name__)
 
+# Instancia de Flask-Caching compartida; app.py la enlaza con cache.init_app(app)
+cache = Cache()
+
+# Contadores de aciertos/fallos del caché de agregaciones históricas (por proceso)
+_stats_lock = threading.Lock()
+_cache_stats = {
+    "hits": 0,
+    "misses": 0,
+    "errors": 0,
+}
+
 def get_current_date():
     """Obtiene la fecha actual en zona horaria de Madrid"""
     return datetime.now(pytz.timezone('Europe/Madrid'))
 
+def seconds_until_midnight():
+    """Segundos que faltan hasta la próxima medianoche de Madrid (mínimo 60)"""
+    madrid_tz = pytz.timezone('Europe/Madrid')
+    now = datetime.now(madrid_tz)
+    tomorrow = (now + timedelta(days=1)).date()
+    midnight = madrid_tz.localize(datetime(tomorrow.year, tomorrow.month, tomorrow.day))
+    return max(int((midnight - now).total_seconds()), 60)
+
+def _record(event):
+    with _stats_lock:
+        _cache_stats[event] += 1
+
+def get_cache_stats():
+    """Devuelve los contadores de aciertos/fallos del caché histórico"""
+    with _stats_lock:
+        stats = dict(_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / total, 3) if total else None
+    return stats
+
+def reset_cache_stats():
+    """Pone a cero los contadores del caché histórico"""
+    with _stats_lock:
+        for key in _cache_stats:
+            _cache_stats[key] = 0
+
+def get_pipeline_cache_key(collection_name, pipeline, cutoff):
+    """
+    Genera una clave estable para un pipeline de agregación.
+    El pipeline se serializa con claves ordenadas para que dos pipelines
+    equivalentes produzcan siempre la misma huella.
+    """
+    canonical = json.dumps(
+        {"collection": collection_name, "pipeline": pipeline, "cutoff": cutoff},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f"historico_agg_{digest}"
+
 def is_current_data(date_obj):
     """
     Determina si una fecha corresponde a datos actuales (año/mes/día actual)
@@ -72,7 +128,6 @@ def cache_historical_data(timeout=86400):  # 24 horas por defecto
             )
             
             # Intentar obtener del caché
-            cache = current_app.extensions['cache']
             cached_result = cache.get(cache_key)
             
             if cached_result is not None:
@@ -91,25 +146,65 @@ def cache_historical_data(timeout=86400):  # 24 horas por defecto
         return wrapper
     return decorator
 
+def cache_view_until_midnight(func):
+    """
+    Decorador para vistas de datos históricos: cachea la respuesta (solo si es
+    200) hasta la medianoche de Madrid. La clave es la ruta con su query string
+    y, si la vista usa conditional, la marca de agua de sus datos.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        raw_key = request.full_path + "|" + g.get("conditional_watermark", "")
+        cache_key = "view_" + hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+        try:
+            cached_result = cache.get(cache_key)
+        except Exception as e:
+            logger.error(f"Error reading view cache for {request.path}: {e}")
+            _record("errors")
+            cached_result = None
+
+        if cached_result is not None:
+            _record("hits")
+            body, mimetype = cached_result
+            return current_app.response_class(body, status=200, mimetype=mimetype)
+
+        _record("misses")
+        response = current_app.make_response(func(*args, **kwargs))
+        if response.status_code == 200:
+            try:
+                cache.set(cache_key, (response.get_data(), response.mimetype),
+                          timeout=seconds_until_midnight())
+            except Exception as e:
+                logger.error(f"Error writing view cache for {request.path}: {e}")
+                _record("errors")
+        return response
+    return wrapper
+
 def invalidate_historical_cache():
     """
     Invalida todo el caché histórico
     Útil cuando se añaden nuevos datos históricos
     """
-    cache = current_app.extensions['cache']
     cache.clear()
+    reset_cache_stats()
     logger.info("Historical cache invalidated")
 
 def get_historical_data_with_cache(collection, pipeline, exclude_current=True):
     """
     Función helper para obtener datos históricos con caché inteligente
     
+    El resultado se guarda en Flask-Caching con una clave derivada de
+    (colección, pipeline canónico, fecha de corte) y caduca a medianoche de
+    Madrid, que es cuando se desplaza el corte de "días pasados".
+    
     Args:
         collection: Colección de MongoDB
         pipeline: Pipeline de agregación
         exclude_current: Si excluir datos del año/mes/día actual
     """
     current = get_current_date()
+    cutoff = current.strftime('%Y-%m-%d')
     
     if exclude_current:
         # Modificar pipeline para excluir datos actuales
@@ -134,10 +229,34 @@ def get_historical_data_with_cache(collection, pipeline, exclude_current=True):
             }
         }
         
-        # Insertar al inicio del pipeline
-        pipeline.insert(0, match_stage)
+        # Insertar al inicio del pipeline (sin modificar la lista del llamador)
+        pipeline = [match_stage] + list(pipeline)
+    
+    cache_key = get_pipeline_cache_key(collection.full_name, pipeline, cutoff)
+    
+    try:
+        cached_result = cache.get(cache_key)
+    except Exception as e:
+        logger.warning(f"Error leyendo caché histórico: {e}")
+        _record("errors")
+        cached_result = None
+    
+    if cached_result is not None:
+        _record("hits")
+        logger.debug(f"Cache hit for {cache_key}")
+        return cached_result
+    
+    _record("misses")
+    logger.debug(f"Cache miss for {cache_key}, executing aggregation")
+    result = list(collection.aggregate(pipeline))
+    
+    try:
+        cache.set(cache_key, result, timeout=seconds_until_midnight())
+    except Exception as e:
+        logger.warning(f"Error guardando en caché histórico: {e}")
+        _record("errors")
     
-    return list(collection.aggregate(pipeline))
+    return result
 
 def get_current_data_only(collection, pipeline):
     """
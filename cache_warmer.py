@@ -0,0 +1,241 @@
+"""
+Pre-calentamiento de cachés.
+
+Tras un deploy o a medianoche (cuando caducan las agregaciones históricas) el
+primer visitante pagaba todas las consultas en frío de api_historico y
+api_burgos_estadisticas, y cada previsión caducada costaba sus llamadas a
+Open-Meteo/AEMET en la petición de un usuario. Este módulo:
+
+- recorre una vez al día (al arrancar y después de cada medianoche de Madrid)
+  las rutas cacheables de los dashboards con el test client de Flask, lo que
+  llena la caché compartida (FileSystemCache en producción);
+- refresca cada previsión (ciudades de ai_forecast.CITIES /
+  aemet_forecast.MUNICIPIOS) cuando le quedan menos de CACHE_WARMER_LEAD
+  segundos de vida;
+- limita la concurrencia (CACHE_WARMER_CONCURRENCY) y espera un jitter
+  aleatorio antes de cada petición para no saturar Mongo ni AEMET.
+
+Corre en un hilo de cada worker, pero solo trabaja el que tiene el lock
+process_lock 'cache_warmer'. El estado de la última pasada se guarda en
+shared_cache para que /api/cache-warmer/status responda igual en todos.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytz
+from flask import Blueprint, jsonify
+
+import api_ai_forecast as ai_forecast
+import api_aemet_forecast as aemet_forecast
+import api_forecast_comparison as forecast_comparison
+import process_lock
+import shared_cache
+
+logger = logging.getLogger(__name__)
+
+cache_warmer_bp = Blueprint('cache_warmer', __name__)
+
+ENABLED = os.getenv('CACHE_WARMER_ENABLED', 'true').lower() == 'true'
+CHECK_SECONDS = float(os.getenv('CACHE_WARMER_CHECK_SECONDS', '60'))
+LEAD_SECONDS = float(os.getenv('CACHE_WARMER_LEAD', '600'))
+CONCURRENCY = int(os.getenv('CACHE_WARMER_CONCURRENCY', '2'))
+JITTER_SECONDS = float(os.getenv('CACHE_WARMER_JITTER', '5'))
+
+LOCK_NAME = 'cache_warmer'
+STATUS_KEY = 'cache_warmer:status'
+DASHBOARD_STATUS_KEY = 'cache_warmer:status:dashboard'
+
+MADRID_TZ = pytz.timezone('Europe/Madrid')
+
+# Módulos de previsión con caché en shared_cache y sus ciudades
+FORECAST_MODULES = (
+    ('ai_forecast', ai_forecast, lambda: ai_forecast.CITIES),
+    ('aemet_forecast', aemet_forecast, lambda: aemet_forecast.MUNICIPIOS),
+    ('forecast_comparison', forecast_comparison,
+     lambda: [c for c in ai_forecast.CITIES if c in aemet_forecast.MUNICIPIOS]),
+)
+
+# Tras un fallo, no reintentar una previsión hasta pasado este tiempo
+RETRY_SECONDS = float(os.getenv('CACHE_WARMER_RETRY_SECONDS', '600'))
+
+_thread = None
+_last_dashboard_day = None
+_retry_after = {}
+
+
+def _months_to_warm(now):
+    """Mes actual y anterior como (año, mes)"""
+    previous = now.replace(day=1) - timedelta(days=1)
+    return [(now.year, now.month), (previous.year, previous.month)]
+
+
+def dashboard_paths(now=None):
+    """Rutas de dashboard cuya respuesta se cachea hasta medianoche"""
+    now = now or datetime.now(MADRID_TZ)
+    paths = [
+        '/api/dashboard/records',
+        '/api/dashboard/tendencia-anual',
+        '/api/dashboard/comparativa-año',
+        '/api/dashboard/heatmap',
+        '/api/dashboard/dias-calurosos-anual',
+        '/api/dashboard/dias-torridos-anual',
+        '/api/dashboard/rachas-calurosas-anual',
+        '/api/dashboard/rachas-torridas-anual',
+        '/api/dashboard/noches-tropicales-anual',
+        '/api/dashboard/rachas-tropicales-anual',
+        '/api/dashboard/noches-torridas-anual',
+        '/api/dashboard/rachas-torridas-nocturnas-anual',
+        '/api/burgos-estadisticas/records-absolutos',
+        '/api/burgos-estadisticas/records-por-decada',
+        '/api/burgos-estadisticas/temperatura-media-decada',
+        '/api/burgos-estadisticas/dias-calurosos-anual',
+        '/api/burgos-estadisticas/dias-torridos-anual',
+        '/api/burgos-estadisticas/rachas-calurosas-anual',
+        '/api/burgos-estadisticas/rachas-torridas-anual',
+        '/api/burgos-estadisticas/noches-tropicales-anual',
+        '/api/burgos-estadisticas/rachas-anual',
+    ]
+    for year, month in _months_to_warm(now):
+        paths += [
+            f'/api/dashboard/estadisticas/{year}/{month}',
+            f'/api/dashboard/estadisticas-datos-diarios/{year}/{month}',
+            f'/api/burgos-estadisticas/estadisticas/{year}/{month}',
+            f'/api/burgos-estadisticas/estadisticas-datos-diarios/{year}/{month}',
+        ]
+    return paths
+
+
+def forecasts_due():
+    """(nombre, módulo, ciudad) de las previsiones ausentes o a punto de caducar"""
+    due = []
+    now = time.time()
+    for name, module, cities in FORECAST_MODULES:
+        for city in cities():
+            if _retry_after.get((name, city), 0) > now:
+                continue
+            entry = shared_cache.get_entry(module.forecast_cache.key(city))
+            if entry is None or entry.expires_at - now < LEAD_SECONDS:
+                due.append((name, module, city))
+    return due
+
+
+def _with_jitter(func):
+    time.sleep(random.uniform(0, JITTER_SECONDS))
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def _warm_path(client, path):
+    def run():
+        response = client.get(path)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+    return _with_jitter(run)
+
+
+def run_once(app, include_dashboard):
+    """Una pasada del calentador; devuelve el estado registrado"""
+    started_at = datetime.now(MADRID_TZ)
+    started = time.perf_counter()
+
+    tasks = []
+    if include_dashboard:
+        client = app.test_client()
+        for path in dashboard_paths(started_at):
+            tasks.append((path, lambda path=path: _warm_path(client, path)))
+    forecast_targets = {}
+    for name, module, city in forecasts_due():
+        forecast_targets[f"{name}/{city}"] = (name, city)
+        tasks.append((f"{name}/{city}",
+                      lambda module=module, city=city: _with_jitter(
+                          lambda: module.forecast_cache.get_or_build(city, force=True))))
+
+    results = {}
+    errors = 0
+    if tasks:
+        with ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix='cache-warmer') as executor:
+            futures = {target: executor.submit(task) for target, task in tasks}
+            for target, future in futures.items():
+                try:
+                    results[target] = {'ok': True, 'seconds': round(future.result(), 3)}
+                except Exception as e:
+                    errors += 1
+                    results[target] = {'ok': False, 'error': str(e)}
+                    if target in forecast_targets:
+                        _retry_after[forecast_targets[target]] = time.time() + RETRY_SECONDS
+                    logger.error(f"Cache warmer: error calentando {target}: {e}")
+
+    status = {
+        'last_run': started_at.isoformat(),
+        'duration_seconds': round(time.perf_counter() - started, 3),
+        'dashboard': include_dashboard,
+        'targets': len(tasks),
+        'errors': errors,
+        'results': results,
+        'pid': os.getpid(),
+    }
+    if tasks:
+        logger.info(f"Cache warmer: {len(tasks)} objetivos en "
+                    f"{status['duration_seconds']}s ({errors} errores)")
+        shared_cache.set(STATUS_KEY, status, ttl=7 * 86400)
+        if include_dashboard:
+            shared_cache.set(DASHBOARD_STATUS_KEY, status, ttl=7 * 86400)
+    return status
+
+
+def _loop(app):
+    global _last_dashboard_day
+    while True:
+        try:
+            if process_lock.try_acquire(LOCK_NAME):
+                today = datetime.now(MADRID_TZ).date()
+                include_dashboard = _last_dashboard_day != today
+                run_once(app, include_dashboard)
+                if include_dashboard:
+                    _last_dashboard_day = today
+        except Exception as e:
+            logger.error(f"Error en el cache warmer: {e}")
+        time.sleep(CHECK_SECONDS)
+
+
+def start_cache_warmer(app):
+    """Arranca el hilo del calentador (uno por worker; solo trabaja el líder)"""
+    global _thread
+    if not ENABLED:
+        logger.info("Cache warmer desactivado (CACHE_WARMER_ENABLED=false)")
+        return False
+    if _thread is None or not _thread.is_alive():
+        _thread = threading.Thread(target=_loop, args=(app,), daemon=True, name='cache-warmer')
+        _thread.start()
+        return True
+    return False
+
+
+def _stored_status(key):
+    entry = shared_cache.get_entry(key)
+    return entry.value if entry else None
+
+
+@cache_warmer_bp.route('/api/cache-warmer/status')
+def cache_warmer_status():
+    try:
+        return jsonify({
+            'enabled': ENABLED,
+            'leader_in_this_worker': process_lock.is_leader(LOCK_NAME),
+            'check_seconds': CHECK_SECONDS,
+            'lead_seconds': LEAD_SECONDS,
+            'concurrency': CONCURRENCY,
+            'jitter_seconds': JITTER_SECONDS,
+            'last_run': _stored_status(STATUS_KEY),
+            'last_dashboard_run': _stored_status(DASHBOARD_STATUS_KEY),
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo estado del cache warmer: {e}")
+        return jsonify({'error': str(e)}), 500
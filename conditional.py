@@ -0,0 +1,198 @@
+"""
+Respuestas condicionales (ETag / Last-Modified / 304) para los endpoints
+históricos.
+
+Las respuestas de api_historico y api_burgos_estadisticas solo cambian cuando
+el cron de ingesta escribe en su colección, pero cada sondeo del frontend
+volvía a calcular y enviar el JSON completo. El decorador conditional(source)
+deriva un validador de la "marca de agua" de la colección:
+
+    último valor del campo de fecha | updated_at/created_at de ese documento |
+    número de documentos
+
+junto con la ruta y su query string y el día de Madrid. Si el If-None-Match (o
+If-Modified-Since) del cliente coincide, responde 304 sin ejecutar la vista.
+
+- La marca de agua se consulta como mucho cada CONDITIONAL_WATERMARK_TTL
+  segundos por proceso (un find_one por índice y un estimated_document_count).
+- Last-Modified es el primer momento en que un worker vio esa marca de agua
+  (guardado en shared_cache, igual para todos los workers).
+- Cache-Control: max-age llega hasta la próxima ingesta prevista de la fuente
+  (más CONDITIONAL_INGEST_GRACE) o hasta medianoche, lo que ocurra antes.
+- Si Mongo no responde, la vista se sirve sin validadores.
+- Cuando la marca de agua cambia se invalida la serie en memoria de la
+  fuente (timeseries_store), para que el ETag nuevo no acompañe a datos
+  anteriores a la ingesta.
+- La marca de agua queda en g.conditional_watermark para que la caché de
+  vistas (cache_view_until_midnight) no sirva una respuesta anterior a la
+  última ingesta.
+- Dentro de /api/dashboard/bundle (g.conditional_disabled) no se aplica a las
+  secciones: el bundle tiene su propio validador.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+import pytz
+from flask import current_app, g, request
+
+import shared_cache
+from mongo_pool import get_collection
+from timeseries_store import burgos_store, historico_store
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_TTL = float(os.getenv('CONDITIONAL_WATERMARK_TTL', '10'))
+INGEST_GRACE = int(os.getenv('CONDITIONAL_INGEST_GRACE', '120'))
+
+MADRID_TZ = pytz.timezone('Europe/Madrid')
+
+COMPRESSED_SUFFIXES = ('br', 'gzip', 'deflate')
+
+# Cuánto se recuerda en shared_cache el primer instante en que se vio cada marca de agua
+FIRST_SEEN_TTL = 30 * 86400
+
+
+class WatermarkSource:
+    """
+    Colección cuyo contenido determina las respuestas de un grupo de endpoints.
+
+    La ingesta se supone periódica: cada every_minutes minutos, empezando
+    offset_minutes después de la medianoche de Madrid.
+    """
+
+    def __init__(self, name, collection_name, date_field, every_minutes, offset_minutes=0, store=None):
+        self.name = name
+        self.collection_name = collection_name
+        self.date_field = date_field
+        self.every_minutes = every_minutes
+        self.offset_minutes = offset_minutes
+        # Serie en memoria (timeseries_store) que se invalida al cambiar la marca de agua
+        self.store = store
+
+        self._value = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _query(self):
+        collection = get_collection(self.collection_name)
+        doc = collection.find_one(
+            {self.date_field: {'$ne': None}},
+            {'_id': 0, self.date_field: 1, 'updated_at': 1, 'created_at': 1},
+            sort=[(self.date_field, -1)]
+        ) or {}
+        watermark = '|'.join(str(part) for part in (
+            doc.get(self.date_field),
+            doc.get('updated_at') or doc.get('created_at'),
+            collection.estimated_document_count(),
+        ))
+
+        # Primer momento en que algún worker vio esta marca de agua
+        key = f"conditional:{self.name}:{hashlib.sha1(watermark.encode('utf-8')).hexdigest()}"
+        first_seen = shared_cache.get(key)
+        if first_seen is None:
+            first_seen = datetime.now(pytz.utc).replace(microsecond=0)
+            shared_cache.set(key, first_seen, ttl=FIRST_SEEN_TTL)
+        return watermark, first_seen
+
+    def current(self):
+        """(marca de agua, Last-Modified) o None si no se puede consultar"""
+        with self._lock:
+            if time.time() - self._checked_at >= WATERMARK_TTL:
+                try:
+                    previous = self._value
+                    self._value = self._query()
+                    if self.store is not None and previous is not None and previous[0] != self._value[0]:
+                        # Que el nuevo ETag no acompañe a datos anteriores a la ingesta
+                        self.store.invalidate()
+                except Exception as e:
+                    logger.error(f"Error consultando la marca de agua de '{self.name}': {e}")
+                    self._value = None
+                self._checked_at = time.time()
+            return self._value
+
+    def seconds_until_next_ingest(self, now=None):
+        """Segundos hasta la próxima ingesta (más el margen) o hasta medianoche, lo que llegue antes"""
+        now = now or datetime.now(MADRID_TZ)
+        midnight = MADRID_TZ.localize(datetime.combine(now.date(), datetime.min.time()))
+        elapsed = (now - midnight).total_seconds() - self.offset_minutes * 60 - INGEST_GRACE
+        period = self.every_minutes * 60
+        next_run = (elapsed // period + 1) * period - elapsed
+        until_midnight = (midnight + timedelta(days=1) - now).total_seconds()
+        return max(int(min(next_run, until_midnight)), 0)
+
+
+historico_source = WatermarkSource(
+    'historico', 'historico_diario', 'fecha',
+    every_minutes=int(os.getenv('HISTORICO_INGEST_EVERY_MINUTES', '30')),
+    offset_minutes=int(os.getenv('HISTORICO_INGEST_OFFSET_MINUTES', '0')),
+    store=historico_store,
+)
+
+burgos_source = WatermarkSource(
+    'burgos', 'burgos_historico_temps', 'fecha_datetime',
+    every_minutes=int(os.getenv('BURGOS_INGEST_EVERY_MINUTES', '1440')),
+    offset_minutes=int(os.getenv('BURGOS_INGEST_OFFSET_MINUTES', '420')),
+    store=burgos_store,
+)
+
+
+def _etag(source, watermark):
+    today = datetime.now(MADRID_TZ).date().isoformat()
+    raw = f"{source.name}|{watermark}|{today}|{request.full_path}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _matching_etag(etag, last_modified):
+    """ETag que el cliente ya tiene (con el sufijo de Flask-Compress, si lo lleva) o None"""
+    if request.if_none_match:
+        # Flask-Compress añade ":br" / ":gzip" al ETag de las respuestas comprimidas
+        for candidate in [etag] + [f"{etag}:{encoding}" for encoding in COMPRESSED_SUFFIXES]:
+            if request.if_none_match.contains_weak(candidate):
+                return candidate
+        return None
+    if request.if_modified_since is not None and last_modified <= request.if_modified_since:
+        return etag
+    return None
+
+
+def _set_validators(response, etag, last_modified, max_age):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def conditional(source):
+    """Decorador: validadores derivados de source y 304 si el cliente ya tiene la respuesta"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if g.get('conditional_disabled'):
+                return func(*args, **kwargs)
+
+            current = source.current()
+            if current is None:
+                return func(*args, **kwargs)
+
+            watermark, last_modified = current
+            etag = _etag(source, watermark)
+            max_age = source.seconds_until_next_ingest()
+            matching = _matching_etag(etag, last_modified)
+            if matching is not None:
+                return _set_validators(current_app.response_class(status=304), matching, last_modified, max_age)
+
+            # cache_view_until_midnight incluye la marca de agua en su clave
+            g.conditional_watermark = watermark
+            response = current_app.make_response(func(*args, **kwargs))
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified, max_age)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Resumen diario de la estación (colección 'data_daily').
+
+Cada documento agrega las lecturas de temperatura exterior de un día natural
+de Madrid:
+
+    {
+        "_id": "YYYY-MM-DD",
+        "max": float, "min": float,
+        "sum": float, "count": int,
+        "first_ts": datetime, "last_ts": datetime
+    }
+
+log_meteo_data lo mantiene de forma incremental en cada inserción con
+$max/$min/$inc. Para reconstruir días pasados a partir de 'data':
+
+    python daily_rollup.py [--since YYYY-MM-DD]
+"""
+
+import argparse
+import logging
+from datetime import datetime
+
+import mongo_pool
+from database import get_collection, get_db, MADRID_TZ
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = 'data_daily'
+
+# Rango razonable de temperaturas; fuera de él se considera lectura errónea
+MIN_VALID_TEMP = -40
+MAX_VALID_TEMP = 50
+
+
+def get_rollup_collection():
+    """Get the daily rollup collection"""
+    return get_db()[ROLLUP_COLLECTION]
+
+
+def _valid_temperature(value):
+    try:
+        temp = float(value)
+    except (TypeError, ValueError):
+        return None
+    if MIN_VALID_TEMP <= temp <= MAX_VALID_TEMP:
+        return temp
+    return None
+
+
+def update_daily_rollup(ts, external_temperature):
+    """Acumula una lectura en el resumen de su día (upsert atómico)"""
+    temp = _valid_temperature(external_temperature)
+    if temp is None:
+        logger.warning(f"Lectura fuera de rango, no se agrega: {external_temperature}")
+        return False
+
+    day_key = ts.astimezone(MADRID_TZ).strftime("%Y-%m-%d")
+    get_rollup_collection().update_one(
+        {"_id": day_key},
+        {
+            "$max": {"max": temp, "last_ts": ts},
+            "$min": {"min": temp, "first_ts": ts},
+            "$inc": {"sum": temp, "count": 1},
+        },
+        upsert=True
+    )
+    return True
+
+
+def rebuild_daily_rollups(since=None):
+    """Recalcula 'data_daily' desde las lecturas crudas (requiere el campo 'ts')"""
+    match = {"ts": {"$exists": True}}
+    if since:
+        match["ts"] = {"$gte": MADRID_TZ.localize(since)}
+
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "ts": 1,
+            "day": {"$dateToString": {
+                "format": "%Y-%m-%d", "date": "$ts", "timezone": "Europe/Madrid"
+            }},
+            "temp": {"$convert": {
+                "input": "$external_temperature", "to": "double",
+                "onError": None, "onNull": None
+            }}
+        }},
+        {"$match": {"temp": {"$gte": MIN_VALID_TEMP, "$lte": MAX_VALID_TEMP}}},
+        {"$group": {
+            "_id": "$day",
+            "max": {"$max": "$temp"},
+            "min": {"$min": "$temp"},
+            "sum": {"$sum": "$temp"},
+            "count": {"$sum": 1},
+            "first_ts": {"$min": "$ts"},
+            "last_ts": {"$max": "$ts"}
+        }},
+        {"$merge": {
+            "into": ROLLUP_COLLECTION,
+            "on": "_id",
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+    started = datetime.now()
+    get_collection().aggregate(pipeline, allowDiskUse=True)
+    total = get_rollup_collection().count_documents(
+        {"_id": {"$gte": since.strftime("%Y-%m-%d")}} if since else {}
+    )
+    logger.info(
+        f"Resumen diario reconstruido: {total} días en "
+        f"{(datetime.now() - started).total_seconds():.1f}s"
+    )
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconstruye la colección data_daily")
+    parser.add_argument('--since', type=lambda s: datetime.strptime(s, "%Y-%m-%d"),
+                        help="Primer día a reconstruir (YYYY-MM-DD); por defecto, todo")
+    args = parser.parse_args()
+
+    try:
+        rebuild_daily_rollups(args.since)
+    finally:
+        mongo_pool.close_client()
+
+
+if __name__ == '__main__':
+    main()
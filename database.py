@@ -1,47 +1,40 @@
-from pymongo import MongoClient
 import logging
-import os
-from threading import local
+from datetime import datetime, timedelta
+
+import pytz
+
+import mongo_pool
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Thread-local storage for MongoDB connections
-_thread_local = local()
+MADRID_TZ = pytz.timezone('Europe/Madrid')
+
+# Formato del campo 'timestamp' (hora local de Madrid) en la colección 'data'
+TIMESTAMP_FORMAT = "%d-%m-%Y %H:%M"
+
 
 def get_mongo_client():
-    """Get a MongoDB client instance that's safe for use with Gunicorn"""
-    if not hasattr(_thread_local, 'mongo_client'):
-        try:
-            mongo_uri = os.getenv("MONGODB_URI")
-            if not mongo_uri:
-                raise ValueError("MONGODB_URI environment variable not set")
-
-            _thread_local.mongo_client = MongoClient(mongo_uri)
-            logging.info("Created new MongoDB client")
-        except Exception as e:
-            logging.error(f"Error creating MongoDB client: {e}")
-            raise
-    
-    return _thread_local.mongo_client
+    """Get the process-wide MongoDB client (created lazily, safe across Gunicorn forks)"""
+    return mongo_pool.get_client()
 
 def get_db():
     """Get the database instance"""
-    client = get_mongo_client()
-    return client.meteosarria
+    return mongo_pool.get_db()
 
 def get_collection():
     """Get the collection instance"""
     db = get_db()
     return db.data
 
-# Initialize connection on module import
-try:
-    client = get_mongo_client()
-    db = get_db()
-    collection = get_collection()
-    logging.info("Connected to MongoDB")
-except Exception as e:
-    logging.error(f"Error connecting to MongoDB: {e}")
-    raise 
\ No newline at end of file
+def parse_timestamp(timestamp_str):
+    """Convierte un 'dd-mm-YYYY HH:MM' (hora de Madrid) en datetime con zona horaria"""
+    return MADRID_TZ.localize(datetime.strptime(timestamp_str, TIMESTAMP_FORMAT))
+
+def madrid_day_bounds(day):
+    """Devuelve (inicio, fin) del día natural de Madrid como datetimes con zona horaria"""
+    start = MADRID_TZ.localize(datetime(day.year, day.month, day.day))
+    next_day = day + timedelta(days=1)
+    end = MADRID_TZ.localize(datetime(next_day.year, next_day.month, next_day.day))
+    return start, end
@@ -2,18 +2,33 @@
 """
 Script para migrar datos_meteohub.csv a MongoDB con limpieza de datos erróneos
 Corrige temperaturas imposibles (como 70°C) usando el último valor válido
+
+El CSV se procesa en streaming (debe estar ordenado por fecha): cada intervalo
+se cierra en cuanto llega una lectura posterior, los resúmenes diarios se
+emiten al cambiar de día y los documentos se insertan en lotes. Si se
+interrumpe, --resume continúa desde el último checkpoint.
+
+    python dump_historico_to_db.py --csv datos_meteohub.csv [--batch-size 1000] [--resume]
 """
 
+import argparse
 import csv
+import json
 import pymongo
-from datetime import datetime, timedelta
+from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
-from collections import defaultdict
-import statistics
 
 load_dotenv()
 
+# Documentos por insert_many
+BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+# Días cerrados entre checkpoints
+CHECKPOINT_EVERY_DAYS = int(os.getenv('IMPORT_CHECKPOINT_EVERY_DAYS', '7'))
+# Líneas entre informes de progreso
+PROGRESS_EVERY = int(os.getenv('IMPORT_PROGRESS_EVERY', '10000'))
+
 class DataCleaner:
     def __init__(self, temp_min=-20, temp_max=50, hum_min=0, hum_max=100):
         """
@@ -71,86 +86,187 @@ class DataCleaner:
                 print(f"⚠️  Humedad corregida (sin valor previo): {hum}% → {default_hum}%")
                 return default_hum, True
 
-class DataAggregator:
-    def __init__(self, interval_minutes=30):
+class RunningStats:
+    """
+    Mínima, máxima, suma y número de valores, sin guardar los valores.
+    
+    La suma es en float: el promedio se redondea a 0,1, así que el error de
+    redondeo acumulado no cambia el resultado.
+    """
+    
+    def __init__(self):
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.count = 0
+    
+    def add(self, value):
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.total += value
+        self.count += 1
+    
+    def summary(self):
+        return {
+            'promedio': round(self.total / self.count, 1),
+            'minima': self.minimum,
+            'maxima': self.maximum
+        }
+
+class IntervalBucket:
+    """Intervalo abierto: estadísticas acumuladas de sus lecturas"""
+    
+    def __init__(self, start):
+        self.start = start
+        self.temp = RunningStats()
+        self.hum = RunningStats()
+        self.temp_corrections = 0
+        self.hum_corrections = 0
+
+class DaySummary:
+    """
+    Día abierto. Como create_daily_summaries original, agrega la mínima y la
+    máxima de cada intervalo (el promedio es la media de esos extremos)
+    """
+    
+    def __init__(self, fecha):
+        self.fecha = fecha
+        self.temp = RunningStats()
+        self.hum = RunningStats()
+        self.num_intervalos = 0
+        self.total_corrections = 0
+    
+    def add_interval(self, doc):
+        self.temp.add(doc['temperatura']['minima'])
+        self.temp.add(doc['temperatura']['maxima'])
+        self.hum.add(doc['humedad']['minima'])
+        self.hum.add(doc['humedad']['maxima'])
+        self.num_intervalos += 1
+        self.total_corrections += doc['datos_corregidos']['total_corrections']
+
+class StreamingAggregator:
+    """
+    Agregación en streaming de lecturas ordenadas por tiempo.
+    
+    Solo hay un intervalo y un día abiertos: en cuanto llega una lectura de
+    un intervalo posterior, el anterior se cierra y se entrega a on_interval;
+    al cambiar de día, el resumen diario se entrega a on_day. Las lecturas
+    anteriores al último intervalo abierto (CSV desordenado) se descartan y
+    se cuentan en out_of_order.
+    """
+    
+    def __init__(self, on_interval, on_day, interval_minutes=30, cleaner=None):
         self.interval_minutes = interval_minutes
-        self.data_buckets = defaultdict(list)
-        self.cleaner = DataCleaner()
+        self.on_interval = on_interval
+        self.on_day = on_day
+        self.cleaner = cleaner or DataCleaner()
+        self.bucket = None
+        self.day = None
+        self.last_bucket_start = None
+        self.intervals_closed = 0
+        self.days_closed = 0
+        self.readings = 0
+        self.out_of_order = 0
+    
+    def round_to_interval(self, dt):
+        """Redondear datetime al intervalo especificado"""
+        minutes = (dt.minute // self.interval_minutes) * self.interval_minutes
+        return dt.replace(minute=minutes, second=0, microsecond=0)
     
     def add_reading(self, timestamp, temp, hum):
         """Añadir lectura con limpieza de datos"""
+        bucket_time = self.round_to_interval(timestamp)
+        if self.last_bucket_start is not None and bucket_time < self.last_bucket_start:
+            self.out_of_order += 1
+            return False
+        
+        if self.bucket is None or bucket_time != self.bucket.start:
+            self._close_bucket()
+            self.bucket = IntervalBucket(bucket_time)
+            self.last_bucket_start = bucket_time
+        
         # Limpiar datos antes de agregar
         clean_temp, temp_corregida = self.cleaner.clean_temperature(temp)
         clean_hum, hum_corregida = self.cleaner.clean_humidity(hum)
         
-        # Redondear timestamp al intervalo más cercano
-        bucket_time = self.round_to_interval(timestamp)
-        
-        self.data_buckets[bucket_time].append({
-            'temp': clean_temp,
-            'hum': clean_hum,
-            'original_time': timestamp,
-            'temp_corregida': temp_corregida,
-            'hum_corregida': hum_corregida,
-            'temp_original': temp if temp_corregida else None,
-            'hum_original': hum if hum_corregida else None
-        })
-    
-    def round_to_interval(self, dt):
-        """Redondear datetime al intervalo especificado"""
-        minutes = (dt.minute // self.interval_minutes) * self.interval_minutes
-        return dt.replace(minute=minutes, second=0, microsecond=0)
+        self.bucket.temp.add(clean_temp)
+        self.bucket.hum.add(clean_hum)
+        self.bucket.temp_corrections += temp_corregida
+        self.bucket.hum_corrections += hum_corregida
+        self.readings += 1
+        return True
     
-    def get_aggregated_data(self):
-        """Obtener datos agregados con información de correcciones"""
-        aggregated = []
+    def _close_bucket(self):
+        bucket = self.bucket
+        if bucket is None:
+            return
+        self.bucket = None
         
-        for bucket_time, readings in self.data_buckets.items():
-            if not readings:
-                continue
-                
-            temps = [r['temp'] for r in readings]
-            hums = [r['hum'] for r in readings]
-            
-            # Contar correcciones en este intervalo
-            temp_corrections = sum(1 for r in readings if r['temp_corregida'])
-            hum_corrections = sum(1 for r in readings if r['hum_corregida'])
-            
-            # Calcular estadísticas
-            temp_stats = {
-                'promedio': round(statistics.mean(temps), 1),
-                'minima': min(temps),
-                'maxima': max(temps)
-            }
-            
-            hum_stats = {
-                'promedio': round(statistics.mean(hums), 1),
-                'minima': min(hums),
-                'maxima': max(hums)
-            }
-            
-            doc = {
-                "timestamp": bucket_time,
-                "fecha": bucket_time.strftime("%Y-%m-%d"),
-                "hora": bucket_time.strftime("%H:%M:%S"),
-                "año": bucket_time.year,
-                "mes": bucket_time.month,
-                "dia": bucket_time.day,
-                "temperatura": temp_stats,
-                "humedad": hum_stats,
-                "num_lecturas": len(readings),
-                "intervalo_minutos": self.interval_minutes,
-                "datos_corregidos": {
-                    "temp_corrections": temp_corrections,
-                    "hum_corrections": hum_corrections,
-                    "total_corrections": temp_corrections + hum_corrections
-                },
-                "created_at": datetime.utcnow()
-            }
-            
-            aggregated.append(doc)
+        doc = {
+            "timestamp": bucket.start,
+            "fecha": bucket.start.strftime("%Y-%m-%d"),
+            "hora": bucket.start.strftime("%H:%M:%S"),
+            "año": bucket.start.year,
+            "mes": bucket.start.month,
+            "dia": bucket.start.day,
+            "temperatura": bucket.temp.summary(),
+            "humedad": bucket.hum.summary(),
+            "num_lecturas": bucket.temp.count,
+            "intervalo_minutos": self.interval_minutes,
+            "datos_corregidos": {
+                "temp_corrections": bucket.temp_corrections,
+                "hum_corrections": bucket.hum_corrections,
+                "total_corrections": bucket.temp_corrections + bucket.hum_corrections
+            },
+            "created_at": datetime.utcnow()
+        }
+        
+        if self.day is not None and self.day.fecha != doc['fecha']:
+            self._close_day()
+        if self.day is None:
+            self.day = DaySummary(doc['fecha'])
+        self.day.add_interval(doc)
         
-        return sorted(aggregated, key=lambda x: x['timestamp'])
+        self.intervals_closed += 1
+        self.on_interval(doc)
+    
+    def _close_day(self):
+        day = self.day
+        if day is None:
+            return
+        self.day = None
+        
+        date_obj = datetime.strptime(day.fecha, "%Y-%m-%d")
+        summary = {
+            "timestamp": date_obj,
+            "fecha": day.fecha,
+            "año": date_obj.year,
+            "mes": date_obj.month,
+            "dia": date_obj.day,
+            "tipo": "resumen_diario",
+            "temperatura": day.temp.summary(),
+            "humedad": day.hum.summary(),
+            "num_intervalos": day.num_intervalos,
+            "datos_corregidos": {
+                "total_corrections": day.total_corrections
+            },
+            "created_at": datetime.utcnow()
+        }
+        self.days_closed += 1
+        self.on_day(summary)
+    
+    def open_day(self):
+        """Fecha del último intervalo abierto (su día sigue sin cerrar) o None"""
+        if self.bucket is not None:
+            return self.bucket.start.strftime("%Y-%m-%d")
+        if self.day is not None:
+            return self.day.fecha
+        return None
+    
+    def finish(self):
+        """Cerrar el intervalo y el día abiertos al terminar el fichero"""
+        self._close_bucket()
+        self._close_day()
     
     def get_cleaning_stats(self):
         """Obtener estadísticas de limpieza"""
@@ -160,6 +276,95 @@ class DataAggregator:
             "last_valid_hum": self.cleaner.last_valid_hum
         }
 
+class BatchWriter:
+    """Buffer de documentos que se vuelca con insert_many ordenados de batch_size"""
+    
+    def __init__(self, collection, batch_size):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.buffer = []
+        self.inserted = 0
+    
+    def add(self, doc):
+        self.buffer.append(doc)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self.buffer:
+            self.collection.insert_many(self.buffer, ordered=True)
+            self.inserted += len(self.buffer)
+            self.buffer = []
+
+class Checkpoint:
+    """
+    Punto de reanudación en un JSON junto al CSV.
+    
+    Se guarda al cerrar un día, con los buffers ya volcados: posición (en
+    bytes) de la primera línea del día siguiente, último día completo y
+    estado del limpiador. Al reanudar se borra lo escrito después de ese día
+    y se sigue leyendo desde esa posición, así que solo vale para el mismo
+    CSV (ruta y tamaño, ver mismatch).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+    
+    @staticmethod
+    def mismatch(state, csv_file_path):
+        """Motivo por el que state no corresponde a csv_file_path, o None"""
+        csv_path = os.path.abspath(csv_file_path)
+        if state.get('csv') != csv_path:
+            return f"el checkpoint es de {state.get('csv')}, no de {csv_path}"
+        size = os.path.getsize(csv_path)
+        if state.get('csv_size') != size:
+            return f"el CSV ha cambiado ({state.get('csv_size')} bytes en el checkpoint, {size} ahora)"
+        return None
+    
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def save(self, state):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+    
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class Throughput:
+    """Informe de filas/s cada every filas (ventana y media acumulada)"""
+    
+    def __init__(self, every, initial_rows=0):
+        self.every = every
+        self.started = time.perf_counter()
+        self.window_started = self.started
+        self.initial_rows = initial_rows
+        self.window_rows = 0
+    
+    def tick(self, rows):
+        self.window_rows += 1
+        if self.window_rows < self.every:
+            return
+        now = time.perf_counter()
+        window_rate = self.window_rows / (now - self.window_started)
+        print(f"   Procesadas {rows:,} líneas "
+              f"({window_rate:,.0f} filas/s, media {self.rate(rows):,.0f} filas/s)")
+        self.window_started = now
+        self.window_rows = 0
+    
+    def elapsed(self):
+        return time.perf_counter() - self.started
+    
+    def rate(self, rows):
+        elapsed = self.elapsed()
+        return (rows - self.initial_rows) / elapsed if elapsed > 0 else 0.0
+
 def parse_csv_line(row):
     """Parsear línea CSV"""
     try:
@@ -173,8 +378,18 @@ def parse_csv_line(row):
     except (ValueError, IndexError) as e:
         return None, None, None
 
-def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30):
-    """Migrar con limpieza y agregación temporal"""
+def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30,
+                          batch_size=BATCH_SIZE, checkpoint_path=None, resume=False,
+                          checkpoint_every_days=CHECKPOINT_EVERY_DAYS, progress_every=PROGRESS_EVERY):
+    """
+    Migrar con limpieza y agregación temporal, en streaming.
+    
+    El CSV debe estar ordenado por fecha. La memoria no depende del tamaño
+    del fichero: un intervalo y un día abiertos más los buffers de batch_size
+    documentos. Cada checkpoint_every_days días cerrados se vuelcan los
+    buffers y se guarda el checkpoint; con resume=True se continúa desde él
+    en lugar de vaciar las colecciones.
+    """
     try:
         # Conectar a MongoDB
         client = pymongo.MongoClient(mongodb_uri)
@@ -183,35 +398,101 @@ def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30):
         collection_intervals = db["historico_intervalos"]
         collection_daily = db["historico_diario"]
         
+        checkpoint = Checkpoint(checkpoint_path or csv_file_path + '.checkpoint.json')
+        state = checkpoint.load() if resume else None
+        
         print(f"🧹 Iniciando migración con limpieza de datos...")
-        print(f"📊 Intervalos de {interval_minutes} minutos")
+        print(f"📊 Intervalos de {interval_minutes} minutos, lotes de {batch_size:,} documentos")
         print(f"🌡️  Rango válido temperaturas: -20°C a 50°C")
         print(f"💧 Rango válido humedad: 0% a 100%")
         
-        # Procesar CSV con limpieza
-        aggregator = DataAggregator(interval_minutes)
-        lineas_procesadas = 0
-        lineas_error = 0
+        if state:
+            mismatch = Checkpoint.mismatch(state, csv_file_path)
+            if mismatch:
+                print(f"❌ No se puede reanudar: {mismatch}. "
+                      f"Borra {checkpoint.path} para importar desde el principio.")
+                client.close()
+                return False
+        
+        cleaner = DataCleaner()
+        if state:
+            # Descartar lo escrito después del último día completo
+            print(f"\n⏯️  Reanudando tras el {state['last_day']} (línea {state['rows'] + 1:,})")
+            collection_intervals.delete_many({"fecha": {"$gt": state['last_day']}})
+            collection_daily.delete_many({"fecha": {"$gt": state['last_day']}})
+            cleaner.last_valid_temp = state['last_valid_temp']
+            cleaner.last_valid_hum = state['last_valid_hum']
+            cleaner.corrections_made = state['corrections']
+        else:
+            # Limpiar colecciones existentes
+            print("\n🗑️  Limpiando colecciones existentes...")
+            collection_intervals.delete_many({})
+            collection_daily.delete_many({})
         
-        print("\n📖 Leyendo y limpiando datos del CSV...")
+        intervals_writer = BatchWriter(collection_intervals, batch_size)
+        daily_writer = BatchWriter(collection_daily, batch_size)
+        aggregator = StreamingAggregator(intervals_writer.add, daily_writer.add, interval_minutes, cleaner)
         
-        with open(csv_file_path, 'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file)
-            
-            for row_num, row in enumerate(csv_reader, 1):
+        offset = state['offset'] if state else 0
+        lineas_leidas = state['rows'] if state else 0
+        lineas_procesadas = state['processed'] if state else 0
+        lineas_error = state['errors'] if state else 0
+        total_lecturas = state['readings'] if state else 0
+        days_since_checkpoint = 0
+        throughput = Throughput(progress_every, lineas_leidas)
+        
+        print("\n📖 Leyendo, limpiando e insertando datos del CSV...")
+        
+        csv_size = os.path.getsize(csv_file_path)
+        with open(csv_file_path, 'rb') as file:
+            file.seek(offset)
+            for raw_line in file:
+                line_offset = offset
+                offset += len(raw_line)
+                
+                row = next(csv.reader([raw_line.decode('utf-8')]), [])
+                timestamp = None
                 if len(row) >= 5:
                     timestamp, temp, hum = parse_csv_line(row)
-                    if timestamp and temp is not None and hum is not None:
-                        aggregator.add_reading(timestamp, temp, hum)
+                
+                if timestamp and temp is not None and hum is not None:
+                    open_day = aggregator.open_day()
+                    new_day = open_day is not None and timestamp.strftime("%Y-%m-%d") > open_day
+                    if new_day and days_since_checkpoint + 1 >= checkpoint_every_days:
+                        # El día abierto queda completo: volcar y guardar checkpoint
+                        aggregator.finish()
+                        intervals_writer.flush()
+                        daily_writer.flush()
+                        checkpoint.save({
+                            'csv': os.path.abspath(csv_file_path),
+                            'csv_size': csv_size,
+                            'offset': line_offset,
+                            'rows': lineas_leidas,
+                            'processed': lineas_procesadas,
+                            'errors': lineas_error,
+                            'readings': total_lecturas + aggregator.readings,
+                            'last_day': open_day,
+                            'last_valid_temp': cleaner.last_valid_temp,
+                            'last_valid_hum': cleaner.last_valid_hum,
+                            'corrections': cleaner.corrections_made,
+                        })
+                        days_since_checkpoint = 0
+                    elif new_day:
+                        days_since_checkpoint += 1
+                    
+                    if aggregator.add_reading(timestamp, temp, hum):
                         lineas_procesadas += 1
-                        
-                        # Mostrar progreso cada 10000 líneas
-                        if lineas_procesadas % 10000 == 0:
-                            print(f"   Procesadas {lineas_procesadas} líneas...")
-                    else:
-                        lineas_error += 1
                 else:
                     lineas_error += 1
+                
+                lineas_leidas += 1
+                throughput.tick(lineas_leidas)
+        
+        aggregator.finish()
+        intervals_writer.flush()
+        daily_writer.flush()
+        checkpoint.clear()
+        total_lecturas += aggregator.readings
         
         # Estadísticas de limpieza
         cleaning_stats = aggregator.get_cleaning_stats()
@@ -219,32 +500,11 @@ def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30):
         print(f"\n📊 Datos procesados:")
         print(f"   ✅ Líneas procesadas: {lineas_procesadas:,}")
         print(f"   ❌ Líneas con error: {lineas_error:,}")
+        if aggregator.out_of_order:
+            print(f"   ↩️  Líneas fuera de orden descartadas: {aggregator.out_of_order:,}")
         print(f"   🧹 Correcciones realizadas: {cleaning_stats['total_corrections']:,}")
-        
-        # Obtener datos agregados
-        aggregated_data = aggregator.get_aggregated_data()
-        print(f"   📈 Intervalos creados: {len(aggregated_data):,}")
-        
-        # Crear resúmenes diarios
-        print("\n📅 Creando resúmenes diarios...")
-        daily_summaries = create_daily_summaries(aggregated_data)
-        
-        # Limpiar colecciones existentes
-        print("\n🗑️  Limpiando colecciones existentes...")
-        collection_intervals.delete_many({})
-        collection_daily.delete_many({})
-        
-        # Insertar datos por intervalos
-        if aggregated_data:
-            print("💾 Insertando datos por intervalos...")
-            collection_intervals.insert_many(aggregated_data)
-            print(f"   ✅ Insertados {len(aggregated_data):,} intervalos")
-        
-        # Insertar resúmenes diarios
-        if daily_summaries:
-            print("💾 Insertando resúmenes diarios...")
-            collection_daily.insert_many(daily_summaries)
-            print(f"   ✅ Insertados {len(daily_summaries):,} resúmenes diarios")
+        print(f"   ⏱️  {lineas_leidas - throughput.initial_rows:,} líneas en {throughput.elapsed():.1f}s "
+              f"({throughput.rate(lineas_leidas):,.0f} filas/s)")
         
         # Crear índices
         print("🔍 Creando índices...")
@@ -257,8 +517,9 @@ def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30):
         collection_daily.create_index([("fecha", 1)])
         
         # Estadísticas finales
+        total_intervalos = collection_intervals.count_documents({})
         print(f"\n🎉 MIGRACIÓN COMPLETADA")
-        print(f"📊 Colección intervalos: {collection_intervals.count_documents({}):,} documentos")
+        print(f"📊 Colección intervalos: {total_intervalos:,} documentos")
         print(f"📊 Colección diaria: {collection_daily.count_documents({}):,} documentos")
         
         # Mostrar rango de fechas
@@ -270,15 +531,14 @@ def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30):
         for doc in ultimo_intervalo:
             print(f"📅 Fecha más reciente: {doc['timestamp']}")
         
-        # Calcular reducción de espacio
-        total_lecturas = sum(doc['num_lecturas'] for doc in aggregated_data)
-        reduccion = ((total_lecturas - len(aggregated_data)) / total_lecturas) * 100
-        print(f"📉 Reducción de datos: {reduccion:.1f}% ({total_lecturas:,} → {len(aggregated_data):,})")
-        
-        # Estadísticas de calidad de datos
-        total_corrections_in_db = sum(doc['datos_corregidos']['total_corrections'] for doc in aggregated_data)
-        correction_percentage = (total_corrections_in_db / total_lecturas) * 100
-        print(f"🧹 Calidad de datos: {correction_percentage:.2f}% de lecturas corregidas")
+        if total_lecturas:
+            # Calcular reducción de espacio
+            reduccion = ((total_lecturas - total_intervalos) / total_lecturas) * 100
+            print(f"📉 Reducción de datos: {reduccion:.1f}% ({total_lecturas:,} → {total_intervalos:,})")
+            
+            # Estadísticas de calidad de datos
+            correction_percentage = (cleaning_stats['total_corrections'] / total_lecturas) * 100
+            print(f"🧹 Calidad de datos: {correction_percentage:.2f}% de lecturas corregidas")
         
         client.close()
         return True
@@ -287,65 +547,19 @@ def migrate_with_cleaning(csv_file_path, mongodb_uri, interval_minutes=30):
         print(f"❌ Error durante la migración: {e}")
         return False
 
-def create_daily_summaries(aggregated_data):
-    """Crear resúmenes diarios (sin cambios, ya funcionaba bien)"""
-    daily_data = defaultdict(list)
-    
-    for doc in aggregated_data:
-        date_key = doc['fecha']
-        daily_data[date_key].append(doc)
-    
-    daily_summaries = []
-    
-    for date_str, day_docs in daily_data.items():
-        if not day_docs:
-            continue
-            
-        all_temps = []
-        all_hums = []
-        total_corrections = 0
-        
-        for doc in day_docs:
-            all_temps.extend([doc['temperatura']['minima'], 
-                            doc['temperatura']['maxima']])
-            all_hums.extend([doc['humedad']['minima'], 
-                           doc['humedad']['maxima']])
-            total_corrections += doc['datos_corregidos']['total_corrections']
-        
-        if all_temps and all_hums:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            
-            summary = {
-                "timestamp": date_obj,
-                "fecha": date_str,
-                "año": date_obj.year,
-                "mes": date_obj.month,
-                "dia": date_obj.day,
-                "tipo": "resumen_diario",
-                "temperatura": {
-                    "minima": min(all_temps),
-                    "maxima": max(all_temps),
-                    "promedio": round(statistics.mean(all_temps), 1)
-                },
-                "humedad": {
-                    "minima": min(all_hums),
-                    "maxima": max(all_hums),
-                    "promedio": round(statistics.mean(all_hums), 1)
-                },
-                "num_intervalos": len(day_docs),
-                "datos_corregidos": {
-                    "total_corrections": total_corrections
-                },
-                "created_at": datetime.utcnow()
-            }
-            
-            daily_summaries.append(summary)
-    
-    return daily_summaries
-
 def main():
     """Función principal"""
-    CSV_FILE = "C:\\Users\\j4alo\\OneDrive\\Documentos\\Meteohub_data\\datos_meteohub.csv"
+    parser = argparse.ArgumentParser(description="Migra datos_meteohub.csv a historico_intervalos / historico_diario")
+    parser.add_argument('--csv', default="C:\\Users\\j4alo\\OneDrive\\Documentos\\Meteohub_data\\datos_meteohub.csv",
+                        help="CSV de Meteohub (ordenado por fecha)")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help=f"Documentos por insert_many (por defecto {BATCH_SIZE})")
+    parser.add_argument('--checkpoint', help="Fichero de checkpoint (por defecto <csv>.checkpoint.json)")
+    parser.add_argument('--resume', action='store_true', help="Continuar desde el último checkpoint")
+    parser.add_argument('--yes', action='store_true', help="No pedir confirmación")
+    args = parser.parse_args()
+    
+    CSV_FILE = args.csv
     MONGODB_URI = os.getenv("MONGODB_URI")
     
     if not MONGODB_URI:
@@ -364,19 +578,22 @@ def main():
     print("• Usará el último valor válido como reemplazo")
     print("=" * 50)
     
-    respuesta = input("¿Continuar con la migración? (s/n): ")
-    
-    if respuesta.lower() != 's':
-        print("🚫 Migración cancelada")
-        return
+    if not args.yes:
+        respuesta = input("¿Continuar con la migración? (s/n): ")
+        
+        if respuesta.lower() != 's':
+            print("🚫 Migración cancelada")
+            return
     
-    success = migrate_with_cleaning(CSV_FILE, MONGODB_URI, 30)
+    success = migrate_with_cleaning(CSV_FILE, MONGODB_URI, 30, batch_size=args.batch_size,
+                                    checkpoint_path=args.checkpoint, resume=args.resume)
     
     if success:
         print("\n🎉 ¡Migración completada exitosamente!")
         print("✨ Los datos están ahora limpios y listos para usar")
     else:
         print("\n❌ Error en la migración")
+        print("⏯️  Se puede continuar desde el último checkpoint con --resume")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -2,6 +2,8 @@
 
 from datetime import datetime
 
+import shared_cache
+
 DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
 
 
@@ -9,3 +11,40 @@ def day_and_date(date_str):
     """A partir de una fecha ISO ('YYYY-MM-DD...'), devuelve (día_semana, 'dd/mm')."""
     date_obj = datetime.strptime(date_str[:10], '%Y-%m-%d')
     return DIAS_SEMANA[date_obj.weekday()], date_obj.strftime('%d/%m')
+
+
+class ForecastCache:
+    """
+    Previsiones por ciudad en la caché compartida (shared_cache), con clave
+    '<prefix><ciudad>'. build(city) calcula la previsión llamando a los upstream.
+    """
+
+    def __init__(self, prefix, build, cache_hours, stale_hours):
+        self.prefix = prefix
+        self.build = build
+        self.ttl = cache_hours * 3600
+        # Tras caducar, la previsión se sigue sirviendo este tiempo mientras se refresca
+        self.stale_ttl = stale_hours * 3600
+
+    def key(self, city):
+        return f"{self.prefix}{city}"
+
+    def get_stale(self, city):
+        """Última previsión guardada aunque haya caducado (fallback si falla el upstream)"""
+        entry = shared_cache.get_entry(self.key(city))
+        return entry.value if entry else None
+
+    def get_or_build(self, city, force=False):
+        """
+        Previsión de city. Solo un worker/hilo llama a los upstream por ciudad;
+        el resto espera su resultado o recibe la versión caducada mientras se
+        refresca en segundo plano. force=True la recalcula aunque siga vigente
+        (lo usa cache_warmer).
+        """
+        if force:
+            return shared_cache.refresh(self.key(city), lambda: self.build(city), ttl=self.ttl)
+        return shared_cache.get_or_compute(self.key(city), lambda: self.build(city),
+                                           ttl=self.ttl, stale_ttl=self.stale_ttl)
+
+    def delete(self, city):
+        return shared_cache.delete(self.key(city))
@@ -1,13 +1,29 @@
-import multiprocessing
+import os
 
 # Server socket
-bind = "0.0.0.0:10000"
+bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = 'sync'
-worker_connections = 1000
+#
+# Almost every endpoint waits on AEMET, OpenWeather, Open-Meteo, Meteohub or
+# Mongo, so the default is threaded workers: each process serves
+# GUNICORN_THREADS requests concurrently and all modules keep working
+# unchanged (requests and pymongo are thread-safe).
+#
+#   GUNICORN_WORKER_CLASS=gthread  (default) threads per worker
+#   GUNICORN_WORKER_CLASS=gevent   cooperative greenlets (pip install gevent);
+#                                  gunicorn monkey-patches sockets, so
+#                                  requests and pymongo yield on I/O
+#   GUNICORN_WORKER_CLASS=sync     one request per worker (previous behaviour)
+#
+# The worker count is a small fixed default rather than cpu_count(): inside a
+# container cpu_count() reports the host's cores, and every worker loads the
+# NumPy series and starts its own scheduler and cache-warmer threads.
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', '1000'))
 timeout = 60  # Increased timeout to 60 seconds
 keepalive = 2
 
@@ -2,6 +2,10 @@
 """
 Script para actualizar datos históricos consultando el endpoint /api/live
 Se ejecuta cada 30 minutos via cron job
+
+Para rellenar días que el cron no llegó a procesar (desde la colección 'data'):
+
+    python historical_data_updater.py --backfill YYYY-MM-DD [--hasta YYYY-MM-DD]
 """
 
 import requests
@@ -9,8 +13,9 @@ import os
 import logging
 from datetime import datetime, timedelta
 import pytz
-from pymongo import MongoClient
-from pymongo.errors import DuplicateKeyError
+import mongo_pool
+from pymongo import UpdateOne
+import argparse
 import json
 
 # Configuración de logging
@@ -20,19 +25,27 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Duración de los intervalos de historico_intervalos (la cadencia del cron).
+# El cron y el backfill guardan cada intervalo con el inicio de su tramo, así
+# que los dos caminos comparten clave y el índice único evita duplicados.
+INTERVALO_MINUTOS = int(os.getenv('HISTORICO_INGEST_EVERY_MINUTES', '30'))
+
+
+def inicio_intervalo(ts, minutos=INTERVALO_MINUTOS):
+    """Inicio del tramo de minutos al que pertenece ts (p. ej. 10:47:12 -> 10:30:00)"""
+    return ts.replace(minute=ts.minute - ts.minute % minutos, second=0, microsecond=0)
+
 class HistoricalDataUpdater:
     def __init__(self):
         # Configuración desde variables de entorno
         self.api_base_url = os.getenv('API_BASE_URL', 'https://meteosarria-back.onrender.com')
-        self.mongodb_uri = os.getenv('MONGODB_URI')
         self.db_name = os.getenv('DB_NAME', 'meteosarria')  # Cambiado a meteosarria
         
         # Timezone Madrid
         self.madrid_tz = pytz.timezone('Europe/Madrid')
         
-        # Conexión a MongoDB
-        self.client = MongoClient(self.mongodb_uri)
-        self.db = self.client[self.db_name]
+        # Conexión a MongoDB (pool compartido del proceso)
+        self.db = mongo_pool.get_db(self.db_name)
         
         # Colecciones
         self.historico_diario = self.db['historico_diario']
@@ -80,158 +93,239 @@ class HistoricalDataUpdater:
             logger.error(f"Error decodificando JSON: {e}")
             return None
     
-    def update_intervalos(self, live_data):
-        """Actualizar colección historico_intervalos (estructura similar al CSV)"""
-        now = datetime.now(self.madrid_tz)
-        
-        # Obtener valores de temperatura y humedad
+    def _reading(self, live_data, now=None):
+        """Lectura normalizada {ts, temp, hum, temp_max, temp_min} o None si faltan datos"""
         temp = live_data.get('external_temperature')
         hum = live_data.get('humidity')
-        
         if temp is None or hum is None:
-            logger.warning("Datos de temperatura o humedad no disponibles")
-            return False
+            return None
+        try:
+            reading = {
+                'ts': (now or datetime.now(self.madrid_tz)).replace(microsecond=0),
+                'temp': float(temp),
+                'hum': float(hum),
+                'temp_max': None,
+                'temp_min': None,
+            }
+            # max/min del día que calcula /api/live (solo en lecturas en vivo)
+            if live_data.get('max_temperature') is not None:
+                reading['temp_max'] = float(live_data['max_temperature'])
+            if live_data.get('min_temperature') is not None:
+                reading['temp_min'] = float(live_data['min_temperature'])
+        except (TypeError, ValueError):
+            # Lecturas inválidas de la estación ('--')
+            return None
+        return reading
+    
+    def _intervalo_op(self, ts, readings, minutos):
+        """
+        (filtro, update) del upsert idempotente de un intervalo (estructura similar al CSV).
         
-        # Preparar documento con la misma estructura que el CSV
+        ts debe ser el inicio del tramo (inicio_intervalo). $setOnInsert sobre
+        el índice único de 'timestamp': otra lectura del mismo tramo (dos
+        crons solapados, un backfill de un día que el cron ya cubrió) no
+        duplica ni modifica el documento.
+        """
+        temps = [r['temp'] for r in readings]
+        hums = [r['hum'] for r in readings]
         intervalo_doc = {
-            "timestamp": now,  # datetime object, no string
-            "fecha": now.strftime("%Y-%m-%d"),
-            "hora": now.strftime("%H:%M:%S"),
-            "año": now.year,
-            "mes": now.month,
-            "dia": now.day,
+            "timestamp": ts,  # datetime object, no string
+            "fecha": ts.strftime("%Y-%m-%d"),
+            "hora": ts.strftime("%H:%M:%S"),
+            "año": ts.year,
+            "mes": ts.month,
+            "dia": ts.day,
             "temperatura": {
-                "promedio": round(float(temp), 1),
-                "minima": round(float(temp), 1),
-                "maxima": round(float(temp), 1)
+                "promedio": round(sum(temps) / len(temps), 1),
+                "minima": round(min(temps), 1),
+                "maxima": round(max(temps), 1)
             },
             "humedad": {
-                "promedio": round(float(hum), 1),
-                "minima": round(float(hum), 1),
-                "maxima": round(float(hum), 1)
+                "promedio": round(sum(hums) / len(hums), 1),
+                "minima": round(min(hums), 1),
+                "maxima": round(max(hums), 1)
             },
-            "num_lecturas": 1,
-            "intervalo_minutos": 60,  # cada hora
+            "num_lecturas": len(readings),
+            "intervalo_minutos": minutos,
             "datos_corregidos": {
                 "temp_corrections": 0,
                 "hum_corrections": 0,
                 "total_corrections": 0
             },
-            "created_at": now
+            "created_at": datetime.now(self.madrid_tz)
         }
+        return {"timestamp": ts}, {"$setOnInsert": intervalo_doc}
+    
+    def _diario_op(self, fecha_str, readings, intervalos=1):
+        """
+        (filtro, update) del upsert atómico del resumen de un día con varias lecturas.
+        
+        Un único update de pipeline: máximas y mínimas con $max/$min sobre lo
+        que ya hubiera, num_intervalos con una suma y el promedio aproximado
+        (máxima + mínima) / 2 recalculado en el servidor. Sin find_one previo,
+        dos ejecuciones solapadas no se pisan.
+        
+        intervalos es lo que se suma a num_intervalos: solo los intervalos que
+        esta escritura ha insertado de verdad, para que repetirla no cuente
+        dos veces.
+        """
+        temps = [r['temp'] for r in readings]
+        hums = [r['hum'] for r in readings]
+        temp_max = max(temps + [r['temp_max'] for r in readings if r['temp_max'] is not None])
+        temp_min = min(temps + [r['temp_min'] for r in readings if r['temp_min'] is not None])
+        
+        day = readings[0]['ts']
+        now = datetime.now(self.madrid_tz)
+        
+        def if_missing(field, value):
+            return {'$ifNull': [f'${field}', value]}
+        
+        pipeline = [
+            {'$set': {
+                'timestamp': if_missing('timestamp', day.replace(hour=0, minute=0, second=0, microsecond=0)),
+                'año': if_missing('año', day.year),
+                'mes': if_missing('mes', day.month),
+                'dia': if_missing('dia', day.day),
+                'tipo': if_missing('tipo', 'resumen_diario'),
+                'temperatura.maxima': {'$max': ['$temperatura.maxima', temp_max]},
+                'temperatura.minima': {'$min': ['$temperatura.minima', temp_min]},
+                'humedad.maxima': {'$max': ['$humedad.maxima', max(hums)]},
+                'humedad.minima': {'$min': ['$humedad.minima', min(hums)]},
+                'num_intervalos': {'$add': [{'$ifNull': ['$num_intervalos', 0]}, intervalos]},
+                'datos_corregidos': if_missing('datos_corregidos', {'$literal': {'total_corrections': 0}}),
+                'created_at': if_missing('created_at', now),
+                'updated_at': now,
+            }},
+            # Promedio aproximado, con los extremos ya actualizados
+            {'$set': {
+                'temperatura.promedio': {'$round': [{'$divide': [
+                    {'$add': ['$temperatura.maxima', '$temperatura.minima']}, 2]}, 1]},
+                'humedad.promedio': {'$round': [{'$divide': [
+                    {'$add': ['$humedad.maxima', '$humedad.minima']}, 2]}, 1]},
+            }},
+        ]
+        return {'fecha': fecha_str}, pipeline
+    
+    def update_intervalos(self, live_data):
+        """Actualizar colección historico_intervalos (estructura similar al CSV)"""
+        reading = self._reading(live_data)
+        if reading is None:
+            logger.warning("Datos de temperatura o humedad no disponibles")
+            return False
         
         try:
-            result = self.historico_intervalos.insert_one(intervalo_doc)
-            logger.info(f"Registro de intervalo insertado: {result.inserted_id}")
+            slot = inicio_intervalo(reading['ts'])
+            result = self.historico_intervalos.update_one(
+                *self._intervalo_op(slot, [reading], INTERVALO_MINUTOS),
+                upsert=True
+            )
+            if result.upserted_id is None:
+                logger.warning(f"Intervalo {slot} ya registrado")
+                return False
+            logger.info(f"Registro de intervalo insertado: {result.upserted_id}")
             return True
-        except DuplicateKeyError:
-            logger.warning(f"Registro duplicado para timestamp: {now}")
-            return False
         except Exception as e:
             logger.error(f"Error insertando registro de intervalo: {e}")
             return False
     
-    def update_diario(self, live_data):
-        """Actualizar colección historico_diario (estructura similar al CSV)"""
-        now = datetime.now(self.madrid_tz)
-        fecha_str = now.strftime("%Y-%m-%d")
-        
-        # Obtener valores actuales
-        temp_actual = live_data.get('external_temperature')
-        temp_max = live_data.get('max_temperature')
-        temp_min = live_data.get('min_temperature')
-        hum_actual = live_data.get('humidity')
+    def update_diario(self, live_data, intervalos=1):
+        """
+        Actualizar colección historico_diario (estructura similar al CSV).
         
-        if temp_actual is None or hum_actual is None:
+        intervalos: 1 si update_intervalos ha insertado el intervalo de esta
+        lectura, 0 si ya existía.
+        """
+        reading = self._reading(live_data)
+        if reading is None:
             logger.warning("Datos de temperatura o humedad no disponibles")
             return False
         
-        temp_actual = float(temp_actual)
-        hum_actual = float(hum_actual)
+        fecha_str = reading['ts'].strftime("%Y-%m-%d")
+        try:
+            result = self.historico_diario.update_one(*self._diario_op(fecha_str, [reading], intervalos),
+                                                      upsert=True)
+            if result.upserted_id is not None:
+                logger.info(f"Nuevo registro diario creado: {result.upserted_id}")
+            else:
+                logger.info(f"Registro diario actualizado para {fecha_str}")
+            return True
+        except Exception as e:
+            logger.error(f"Error actualizando registro diario: {e}")
+            return False
+    
+    def bulk_update(self, readings, intervalo_minutos=INTERVALO_MINUTOS):
+        """
+        Aplica una lista de lecturas con un bulk_write por colección.
         
-        # Buscar registro existente del día
-        existing_doc = self.historico_diario.find_one({'fecha': fecha_str})
+        Las lecturas se agrupan en intervalos de intervalo_minutos (un
+        documento por intervalo, con promedio/mínima/máxima) y en días (un
+        upsert por día). Relanzar el mismo lote, o uno que solape con lo que
+        ya escribió el cron, es seguro: los intervalos ya existentes no se
+        tocan, las máximas/mínimas no cambian y num_intervalos solo suma los
+        intervalos insertados.
         
-        if existing_doc:
-            # Actualizar temperaturas máxima y mínima
-            current_temp_max = existing_doc.get('temperatura', {}).get('maxima', temp_actual)
-            current_temp_min = existing_doc.get('temperatura', {}).get('minima', temp_actual)
-            current_hum_max = existing_doc.get('humedad', {}).get('maxima', hum_actual)
-            current_hum_min = existing_doc.get('humedad', {}).get('minima', hum_actual)
-            
-            # Calcular nuevos valores máximos y mínimos
-            new_temp_max = max(current_temp_max, temp_actual)
-            new_temp_min = min(current_temp_min, temp_actual)
-            new_hum_max = max(current_hum_max, hum_actual)
-            new_hum_min = min(current_hum_min, hum_actual)
-            
-            # Si viene temp_max/min del endpoint, usarlos si son mejores
-            if temp_max is not None:
-                new_temp_max = max(new_temp_max, float(temp_max))
-            if temp_min is not None:
-                new_temp_min = min(new_temp_min, float(temp_min))
-            
-            # Calcular promedio (aproximado)
-            new_temp_avg = round((new_temp_max + new_temp_min) / 2, 1)
-            new_hum_avg = round((new_hum_max + new_hum_min) / 2, 1)
-            
-            updates = {
-                'temperatura': {
-                    'promedio': new_temp_avg,
-                    'minima': new_temp_min,
-                    'maxima': new_temp_max
-                },
-                'humedad': {
-                    'promedio': new_hum_avg,
-                    'minima': new_hum_min,
-                    'maxima': new_hum_max
-                },
-                'updated_at': now
-            }
-            
-            try:
-                result = self.historico_diario.update_one(
-                    {'fecha': fecha_str},
-                    {'$set': updates}
-                )
-                logger.info(f"Registro diario actualizado para {fecha_str}")
-                return True
-            except Exception as e:
-                logger.error(f"Error actualizando registro diario: {e}")
-                return False
-        else:
-            # Crear nuevo registro diario con estructura del CSV
-            diario_doc = {
-                "timestamp": now.replace(hour=0, minute=0, second=0, microsecond=0),
-                "fecha": fecha_str,
-                "año": now.year,
-                "mes": now.month,
-                "dia": now.day,
-                "tipo": "resumen_diario",
-                "temperatura": {
-                    "promedio": round(temp_actual, 1),
-                    "minima": float(temp_min) if temp_min is not None else temp_actual,
-                    "maxima": float(temp_max) if temp_max is not None else temp_actual
-                },
-                "humedad": {
-                    "promedio": round(hum_actual, 1),
-                    "minima": hum_actual,
-                    "maxima": hum_actual
-                },
-                "num_intervalos": 1,
-                "datos_corregidos": {
-                    "total_corrections": 0
-                },
-                "created_at": now
-            }
-            
-            try:
-                result = self.historico_diario.insert_one(diario_doc)
-                logger.info(f"Nuevo registro diario creado: {result.inserted_id}")
-                return True
-            except Exception as e:
-                logger.error(f"Error creando registro diario: {e}")
-                return False
+        Returns:
+            dict con intervalos_insertados, dias_actualizados y dias_creados
+        """
+        intervalos = {}
+        dias = {}
+        for reading in sorted(readings, key=lambda r: r['ts']):
+            ts = reading['ts']
+            intervalos.setdefault(inicio_intervalo(ts, intervalo_minutos), []).append(reading)
+            dias.setdefault(ts.strftime("%Y-%m-%d"), []).append(reading)
+        
+        result = {'intervalos_insertados': 0, 'dias_actualizados': 0, 'dias_creados': 0}
+        intervalos_por_dia = dict.fromkeys(dias, 0)
+        if intervalos:
+            slots = list(intervalos)
+            ops = [UpdateOne(*self._intervalo_op(slot, intervalos[slot], intervalo_minutos), upsert=True)
+                   for slot in slots]
+            bulk = self.historico_intervalos.bulk_write(ops, ordered=False)
+            result['intervalos_insertados'] = bulk.upserted_count
+            # upserted_ids: índice de la operación -> _id, solo de los insertados
+            for index in bulk.upserted_ids:
+                intervalos_por_dia[slots[index].strftime("%Y-%m-%d")] += 1
+        if dias:
+            ops = [UpdateOne(*self._diario_op(fecha, group, intervalos_por_dia[fecha]), upsert=True)
+                   for fecha, group in dias.items()]
+            bulk = self.historico_diario.bulk_write(ops, ordered=False)
+            result['dias_creados'] = bulk.upserted_count
+            result['dias_actualizados'] = bulk.matched_count
+        
+        logger.info(
+            f"Lote aplicado: {len(readings)} lecturas, "
+            f"{result['intervalos_insertados']}/{len(intervalos)} intervalos nuevos, "
+            f"{result['dias_creados']} días creados, {result['dias_actualizados']} actualizados"
+        )
+        return result
+    
+    def backfill(self, desde, hasta=None):
+        """
+        Rellena historico_intervalos/historico_diario desde las lecturas de la
+        estación (colección 'data', campo 'ts') entre dos días de Madrid,
+        ambos incluidos. Una consulta por rango y un bulk_write por colección.
+        """
+        hasta = hasta or desde
+        start = self.madrid_tz.localize(datetime.combine(desde, datetime.min.time()))
+        end = self.madrid_tz.localize(datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+        
+        cursor = self.db['data'].find(
+            {'ts': {'$gte': start, '$lt': end}},
+            {'_id': 0, 'ts': 1, 'external_temperature': 1, 'humidity': 1}
+        ).sort('ts', 1)
+        
+        readings = []
+        for doc in cursor:
+            ts = pytz.utc.localize(doc['ts']).astimezone(self.madrid_tz) if doc['ts'].tzinfo is None \
+                else doc['ts'].astimezone(self.madrid_tz)
+            reading = self._reading(doc, now=ts)
+            if reading is not None:
+                readings.append(reading)
+        
+        logger.info(f"Backfill {desde} - {hasta}: {len(readings)} lecturas")
+        if not readings:
+            return None
+        return self.bulk_update(readings)
     
     def cleanup_old_data(self, days_to_keep=90):
         """Limpiar datos antiguos de historico_intervalos"""
@@ -262,7 +356,7 @@ class HistoricalDataUpdater:
         
         # Actualizar ambas colecciones
         success_intervalos = self.update_intervalos(live_data)
-        success_diario = self.update_diario(live_data)
+        success_diario = self.update_diario(live_data, intervalos=1 if success_intervalos else 0)
         
         # Limpiar datos antiguos (solo una vez al día, a las 00:00)
         now = datetime.now(self.madrid_tz)
@@ -276,20 +370,23 @@ class HistoricalDataUpdater:
             logger.error("Falló la actualización")
             return False
     
-    def __del__(self):
-        """Cerrar conexión a MongoDB de forma segura"""
-        try:
-            if hasattr(self, 'client'):
-                self.client.close()
-        except:
-            # Ignorar errores al cerrar durante shutdown
-            pass
-
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Actualiza historico_diario / historico_intervalos")
+    parser.add_argument('--backfill', type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        metavar='YYYY-MM-DD',
+                        help="Rellena desde las lecturas de la estación en lugar de consultar /api/live")
+    parser.add_argument('--hasta', type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                        metavar='YYYY-MM-DD', help="Último día del backfill (por defecto, el mismo)")
+    args = parser.parse_args()
+    
     try:
         updater = HistoricalDataUpdater()
-        success = updater.run()
+        if args.backfill:
+            success = updater.backfill(args.backfill, args.hasta) is not None
+        else:
+            success = updater.run()
+        mongo_pool.close_client()
         
         if success:
             print("Actualización completada exitosamente")
@@ -304,4 +401,4 @@ def main():
         exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,76 +1,163 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
 import requests
 from xml.etree import ElementTree as ET
-import re
 
-def get_meteohub_parameter(parameter_name):
-    """
-    Fetches data from the Meteohub and extracts the value of a specific
-    parameter from the XML response.
+METEOHUB_URL = "http://tervingo.com/meteo/data_now.xml"
 
-    Args:
-        parameter_name: The name of the parameter to extract (e.g., "ext_temp",
-                         "int_temp", "hum", "wind_dir", "wind_speed", "press",
-                         "cur_rain", "total_rain", "rad").
+# How long a fetched snapshot is reused, and how long a failed fetch is
+# remembered so a down station does not stall every request (seconds)
+SNAPSHOT_TTL = float(os.getenv('METEOHUB_SNAPSHOT_TTL', '30'))
+SNAPSHOT_ERROR_TTL = float(os.getenv('METEOHUB_SNAPSHOT_ERROR_TTL', '5'))
 
-    Returns:
-        The value of the specified parameter, or None if the parameter is not
-        found or an error occurs.
+# Mapping of parameter names to XML tags
+PARAMETER_MAP = {
+    "ext_temp": "temp_ext",
+    "int_temp": "temp_int",
+    "hum": "hum",
+    "wind_dir": "wind_dir",
+    "wind_speed": "wind_speed",
+    "gust_speed": "wind_gust",
+    "press": "pres",
+    "sea_press": "pres",  # Using pres as sea_press
+    "cur_rain": "rain_rate",
+    "total_rain": "daily_rain",
+    "rad": "solar_rad",
+    "uv": "uv_index",
+}
+
+NUMERIC_PARAMETERS = ("ext_temp", "int_temp", "hum", "wind_speed",
+                      "gust_speed", "press", "sea_press", "cur_rain",
+                      "total_rain", "rad", "uv")
+
+Value = Optional[Union[float, str]]
+
+
+@dataclass(frozen=True)
+class MeteohubSnapshot:
     """
-    url = "http://tervingo.com/meteo/data_now.xml"
-
-    # Mapping of parameter names to XML tags
-    parameter_map = {
-        "ext_temp": "temp_ext",
-        "int_temp": "temp_int",
-        "hum": "hum",
-        "wind_dir": "wind_dir",
-        "wind_speed": "wind_speed",
-        "gust_speed": "wind_gust",
-        "press": "pres",
-        "sea_press": "pres",  # Using pres as sea_press
-        "cur_rain": "rain_rate",
-        "total_rain": "daily_rain",
-        "rad": "solar_rad",
-        "uv": "uv_index",
-    }
-
-    if parameter_name not in parameter_map:
-        print(f"Error: Invalid parameter name '{parameter_name}'")
-        return None
+    All Meteohub parameters read from a single data_now.xml download.
+
+    Numeric parameters are floats; a sensor reporting "--" keeps that string,
+    and a missing tag (or a failed fetch) is None.
+    """
+    ext_temp: Value = None
+    int_temp: Value = None
+    hum: Value = None
+    wind_dir: Value = None
+    wind_speed: Value = None
+    gust_speed: Value = None
+    press: Value = None
+    sea_press: Value = None
+    cur_rain: Value = None
+    total_rain: Value = None
+    rad: Value = None
+    uv: Value = None
+    fetched_at: float = field(default_factory=time.monotonic)
+    ok: bool = True
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _parse_snapshot(xml_text):
+    root = ET.fromstring(xml_text)
+    values = {}
+    for parameter_name, tag_name in PARAMETER_MAP.items():
+        element = root.find(tag_name)
+        if element is None or not element.text:
+            continue
+        value = element.text.strip()
+        # Convert to appropriate data type based on parameter
+        if parameter_name in NUMERIC_PARAMETERS and value != "--":
+            try:
+                value = float(value)
+            except ValueError:
+                print(f"Invalid value for '{parameter_name}': {value}")
+                continue
+        values[parameter_name] = value
+    return MeteohubSnapshot(**values)
+
 
+def _fetch_snapshot():
     try:
         # Add timeouts to prevent hanging requests
-        response = requests.get(url, timeout=(5, 15))  # (connect_timeout, read_timeout)
+        response = requests.get(METEOHUB_URL, timeout=(5, 15))  # (connect_timeout, read_timeout)
         response.raise_for_status()
-        root = ET.fromstring(response.text)
-        
-        tag_name = parameter_map[parameter_name]
-        element = root.find(tag_name)
-        
-        if element is not None and element.text:
-            value = element.text.strip()
-            # Convert to appropriate data type based on parameter
-            if parameter_name in ("ext_temp", "int_temp", "hum", "wind_speed", 
-                                "gust_speed", "press", "sea_press", "cur_rain", 
-                                "total_rain", "rad", "uv") and value != "--":
-                return float(value)
-            else:
-                return value  # Return as string if not a numeric parameter
-
-        return None  # Parameter not found
+        return _parse_snapshot(response.text)
 
     except requests.exceptions.Timeout as e:
         print(f"Timeout error fetching data from Meteohub: {e}")
-        return None
     except requests.exceptions.ConnectionError as e:
         print(f"Connection error fetching data from Meteohub: {e}")
-        return None
     except requests.exceptions.RequestException as e:
         print(f"Error fetching data from Meteohub: {e}")
-        return None
     except ET.ParseError as e:
         print(f"Error parsing XML response: {e}")
-        return None
     except Exception as e:
-        print(f"Unexpected error in get_meteohub_parameter: {e}")
+        print(f"Unexpected error in get_meteohub_snapshot: {e}")
+    return MeteohubSnapshot(ok=False)
+
+
+def _is_fresh(snapshot):
+    if snapshot is None:
+        return False
+    ttl = SNAPSHOT_TTL if snapshot.ok else SNAPSHOT_ERROR_TTL
+    return time.monotonic() - snapshot.fetched_at < ttl
+
+
+def get_meteohub_snapshot(max_age=None):
+    """
+    Fetches data_now.xml once and returns every parameter as a MeteohubSnapshot.
+
+    The result is reused for METEOHUB_SNAPSHOT_TTL seconds. Concurrent callers
+    that find it stale wait for a single in-flight download instead of each
+    starting their own.
+
+    Args:
+        max_age: Optional override (seconds) for how old a cached snapshot may
+                 be; 0 forces a new download.
+    """
+    global _snapshot
+
+    def usable(snapshot):
+        if max_age is None:
+            return _is_fresh(snapshot)
+        return snapshot is not None and time.monotonic() - snapshot.fetched_at < max_age
+
+    seen = _snapshot
+    if usable(seen):
+        return seen
+
+    with _snapshot_lock:
+        # Another thread refreshed it while we waited for the lock
+        if _snapshot is not seen:
+            return _snapshot
+        _snapshot = _fetch_snapshot()
+        return _snapshot
+
+
+def get_meteohub_parameter(parameter_name):
+    """
+    Returns the value of a specific Meteohub parameter.
+
+    Args:
+        parameter_name: The name of the parameter to extract (e.g., "ext_temp",
+                         "int_temp", "hum", "wind_dir", "wind_speed", "press",
+                         "cur_rain", "total_rain", "rad").
+
+    Returns:
+        The value of the specified parameter, or None if the parameter is not
+        found or an error occurs. Values come from the shared snapshot, so
+        reading several parameters costs a single download.
+    """
+    if parameter_name not in PARAMETER_MAP:
+        print(f"Error: Invalid parameter name '{parameter_name}'")
         return None
+
+    return getattr(get_meteohub_snapshot(), parameter_name)
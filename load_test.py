@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Prueba de carga simple: throughput y latencias con peticiones concurrentes.
+
+Contra un servidor ya arrancado:
+
+    python load_test.py --url http://localhost:10000 --paths /api/live
+
+Comparando modos de gunicorn (arranca y para el servidor en cada modo):
+
+    python load_test.py --compare sync gthread --paths /api/live /api/dashboard/records
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def _one_request(session, url, timeout):
+    started = time.perf_counter()
+    try:
+        response = session.get(url, timeout=timeout)
+        ok = response.status_code < 500
+    except requests.RequestException:
+        ok = False
+    return ok, (time.perf_counter() - started) * 1000
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_load(base_url, paths, concurrency, total_requests, timeout):
+    """Lanza total_requests GET repartidos entre paths con `concurrency` hilos"""
+    urls = [f"{base_url.rstrip('/')}{paths[i % len(paths)]}" for i in range(total_requests)]
+    sessions = [requests.Session() for _ in range(concurrency)]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(
+            lambda args: _one_request(sessions[args[0] % concurrency], args[1], timeout),
+            enumerate(urls)
+        ))
+    elapsed = time.perf_counter() - started
+
+    latencies = [ms for ok, ms in results if ok]
+    errors = sum(1 for ok, _ in results if not ok)
+    return {
+        'requests': total_requests,
+        'errors': errors,
+        'seconds': elapsed,
+        'rps': total_requests / elapsed if elapsed else 0,
+        'p50': _percentile(latencies, 50),
+        'p95': _percentile(latencies, 95),
+        'p99': _percentile(latencies, 99),
+        'mean': statistics.mean(latencies) if latencies else 0,
+    }
+
+
+def print_result(label, result):
+    print(f"{label:>10}: {result['rps']:7.1f} req/s  "
+          f"p50 {result['p50']:7.1f} ms  p95 {result['p95']:7.1f} ms  "
+          f"p99 {result['p99']:7.1f} ms  errores {result['errors']}/{result['requests']}  "
+          f"({result['seconds']:.1f}s)")
+
+
+def start_server(worker_class, port, workers, threads):
+    env = dict(os.environ,
+               PORT=str(port),
+               GUNICORN_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(workers),
+               GUNICORN_THREADS=str(threads))
+    return subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'app:app'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_until_ready(base_url, path, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}{path}", timeout=5)
+            return True
+        except requests.RequestException:
+            time.sleep(0.5)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de meteosarria-back")
+    parser.add_argument('--url', default='http://localhost:10000')
+    parser.add_argument('--paths', nargs='+', default=['/api/live'])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--warmup', type=int, default=10,
+                        help="Peticiones previas no medidas (calientan cachés)")
+    parser.add_argument('--compare', nargs='+', metavar='WORKER_CLASS',
+                        help="Arranca gunicorn con cada worker class y compara")
+    parser.add_argument('--port', type=int, default=10050)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.requests} peticiones, concurrencia {args.concurrency}, rutas {args.paths}")
+
+    if not args.compare:
+        if args.warmup:
+            run_load(args.url, args.paths, min(args.concurrency, args.warmup), args.warmup, args.timeout)
+        print_result('servidor', run_load(args.url, args.paths, args.concurrency,
+                                          args.requests, args.timeout))
+        return
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    for worker_class in args.compare:
+        server = start_server(worker_class, args.port, args.workers, args.threads)
+        try:
+            if not wait_until_ready(base_url, args.paths[0]):
+                print(f"{worker_class:>10}: el servidor no arrancó")
+                continue
+            if args.warmup:
+                run_load(base_url, args.paths, min(args.concurrency, args.warmup), args.warmup, args.timeout)
+            print_result(worker_class, run_load(base_url, args.paths, args.concurrency,
+                                                args.requests, args.timeout))
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 import logging
 import os
 from datetime import datetime
-from livedata import get_meteohub_parameter
+from livedata import get_meteohub_snapshot
 import pytz
 import json
 from database import get_collection
+from daily_rollup import update_daily_rollup
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,25 +13,36 @@ logging.basicConfig(level=logging.INFO)
 def log_weather_data():
     try:
         logging.info("Fetching weather data...")
+        now = datetime.now(pytz.timezone('Europe/Madrid')).replace(second=0, microsecond=0)
+        meteohub = get_meteohub_snapshot()
         live_data = {
-            "external_temperature": get_meteohub_parameter("ext_temp"),
-            "internal_temperature": get_meteohub_parameter("int_temp"),
-            "humidity": get_meteohub_parameter("hum"),
-            "pressure": get_meteohub_parameter("sea_press"),
-            "wind_speed": get_meteohub_parameter("wind_speed"),
-            "wind_direction": get_meteohub_parameter("wind_dir"),
-            "current_rain_rate": get_meteohub_parameter("cur_rain"),
-            "total_rain": get_meteohub_parameter("total_rain"),
-            "solar_radiation": get_meteohub_parameter("rad"),
-            "timestamp": datetime.now(pytz.timezone('Europe/Madrid')).strftime("%d-%m-%Y %H:%M")
+            "external_temperature": meteohub.ext_temp,
+            "internal_temperature": meteohub.int_temp,
+            "humidity": meteohub.hum,
+            "pressure": meteohub.sea_press,
+            "wind_speed": meteohub.wind_speed,
+            "wind_direction": meteohub.wind_dir,
+            "current_rain_rate": meteohub.cur_rain,
+            "total_rain": meteohub.total_rain,
+            "solar_radiation": meteohub.rad,
+            "timestamp": now.strftime("%d-%m-%Y %H:%M")
         }
 
         if any(value is None for value in live_data.values()):
             logging.warning("Could not retrieve complete live weather data")
             return
 
+        # Campo datetime indexado para consultas por rango (ver migrate_data_ts.py)
+        live_data["ts"] = now
+
         get_collection().insert_one(live_data)
         logging.info(f"Logged weather data: {live_data}")
+
+        # Mantener el resumen diario (data_daily) al día
+        try:
+            update_daily_rollup(now, live_data["external_temperature"])
+        except Exception as e:
+            logging.error(f"Error updating daily rollup: {e}")
     except Exception as e:
         logging.error(f"Error logging weather data: {e}")
 
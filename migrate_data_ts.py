@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Migración: añade el campo BSON datetime 'ts' a la colección 'data'.
+
+El campo 'timestamp' es un string 'dd-mm-YYYY HH:MM' en hora de Madrid, que no
+se ordena cronológicamente ni permite consultas por rango con índice. Este
+script rellena 'ts' (mismo instante, guardado en UTC) por lotes y crea el
+índice 'ts_1'.
+
+Es reanudable: guarda el último _id procesado en un fichero de checkpoint y,
+además, solo procesa documentos que todavía no tienen 'ts'.
+
+Uso:
+    python migrate_data_ts.py [--batch-size 1000] [--checkpoint fichero] [--reset]
+"""
+
+import argparse
+import logging
+import os
+import time
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+import mongo_pool
+from database import get_collection, parse_timestamp
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = '.migrate_data_ts.checkpoint'
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        value = f.read().strip()
+    return ObjectId(value) if value else None
+
+
+def write_checkpoint(path, last_id):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(str(last_id))
+    os.replace(tmp_path, path)
+
+
+def backfill_ts(batch_size=1000, checkpoint_path=DEFAULT_CHECKPOINT):
+    collection = get_collection()
+
+    last_id = read_checkpoint(checkpoint_path)
+    if last_id:
+        logger.info(f"Reanudando desde _id {last_id}")
+
+    base_query = {"ts": {"$exists": False}}
+    pending = collection.count_documents(
+        {**base_query, "_id": {"$gt": last_id}} if last_id else base_query
+    )
+    logger.info(f"Documentos pendientes: {pending:,}")
+
+    processed = 0
+    updated = 0
+    skipped = 0
+    started = time.monotonic()
+
+    while True:
+        query = dict(base_query)
+        if last_id:
+            query["_id"] = {"$gt": last_id}
+
+        batch = list(
+            collection.find(query, {"_id": 1, "timestamp": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+        )
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            try:
+                ts = parse_timestamp(doc["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"ts": ts}}))
+
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+
+        processed += len(batch)
+        last_id = batch[-1]["_id"]
+        write_checkpoint(checkpoint_path, last_id)
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed > 0 else 0
+        pct = (processed / pending * 100) if pending else 100
+        logger.info(
+            f"{processed:,}/{pending:,} ({pct:.1f}%) - actualizados {updated:,}, "
+            f"sin timestamp válido {skipped:,} - {rate:,.0f} docs/s"
+        )
+
+    logger.info("Creando índice ts_1…")
+    collection.create_index([("ts", 1)], name="ts_1")
+
+    logger.info(
+        f"Migración completada: {updated:,} documentos actualizados, "
+        f"{skipped:,} omitidos en {time.monotonic() - started:.1f}s"
+    )
+    return updated, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rellena el campo 'ts' en meteosarria.data")
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--reset', action='store_true',
+                        help="Ignora el checkpoint y empieza desde el principio")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    try:
+        backfill_ts(args.batch_size, args.checkpoint)
+    finally:
+        mongo_pool.close_client()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Pool de conexiones MongoDB compartido por todo el proceso.
+
+Un único MongoClient por proceso, creado de forma perezosa en la primera
+petición (es decir, después del fork de gunicorn) y recreado si el PID cambia.
+Todos los blueprints y scripts de cron obtienen sus colecciones de aquí.
+
+Variables de entorno:
+  MONGODB_URI               URI de conexión (obligatoria)
+  MONGO_MAX_POOL_SIZE       Conexiones máximas por proceso (defecto 20)
+  MONGO_MIN_POOL_SIZE       Conexiones mantenidas abiertas (defecto 0)
+  MONGO_MAX_IDLE_TIME_MS    Cierre de conexiones inactivas (defecto 60000)
+  MONGO_WAIT_QUEUE_TIMEOUT_MS  Espera máxima por una conexión libre (defecto 10000)
+"""
+
+import logging
+import os
+import threading
+
+from flask import Blueprint, jsonify
+from pymongo import MongoClient, monitoring
+
+logger = logging.getLogger(__name__)
+
+mongo_pool_bp = Blueprint('mongo_pool', __name__)
+
+DB_NAME = os.getenv('DB_NAME', 'meteosarria')
+
+_lock = threading.Lock()
+_client = None
+_client_pid = None
+
+
+class _PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Cuenta eventos del pool de conexiones para exponerlos por endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {
+                "pools_created": 0,
+                "pools_cleared": 0,
+                "connections_created": 0,
+                "connections_closed": 0,
+                "checkout_started": 0,
+                "checkout_failed": 0,
+                "checked_out": 0,
+                "checked_in": 0,
+            }
+
+    def _inc(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            c = dict(self.counters)
+        c["open_connections"] = c["connections_created"] - c["connections_closed"]
+        c["in_use"] = c["checked_out"] - c["checked_in"]
+        c["wait_queue"] = max(c["checkout_started"] - c["checked_out"] - c["checkout_failed"], 0)
+        return c
+
+    def pool_created(self, event):
+        self._inc("pools_created")
+
+    def pool_cleared(self, event):
+        self._inc("pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("connections_closed")
+
+    def connection_check_out_started(self, event):
+        self._inc("checkout_started")
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("checked_in")
+
+
+_pool_listener = _PoolStatsListener()
+
+
+def get_pool_options():
+    """Opciones del pool leídas del entorno."""
+    return {
+        "maxPoolSize": int(os.getenv('MONGO_MAX_POOL_SIZE', 20)),
+        "minPoolSize": int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+        "maxIdleTimeMS": int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 60000)),
+        "waitQueueTimeoutMS": int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+    }
+
+
+def get_client():
+    """
+    Devuelve el MongoClient del proceso, creándolo si aún no existe.
+
+    Si el proceso es un hijo de fork (PID distinto al que creó el cliente),
+    se descarta el heredado sin cerrarlo y se crea uno nuevo: los sockets
+    de un MongoClient no se pueden compartir entre procesos.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is not None and _client_pid == pid:
+            return _client
+
+        mongo_uri = os.getenv("MONGODB_URI")
+        if not mongo_uri:
+            raise ValueError("MONGODB_URI environment variable not set")
+
+        if _client is not None:
+            logger.info(f"Fork detectado (pid {_client_pid} → {pid}); creando nuevo MongoClient")
+            _pool_listener.reset()
+
+        options = get_pool_options()
+        _client = MongoClient(mongo_uri, event_listeners=[_pool_listener], **options)
+        _client_pid = pid
+        logger.info(f"MongoClient creado para pid {pid} con {options}")
+        return _client
+
+
+def get_db(name=None):
+    """Base de datos (por defecto 'meteosarria')."""
+    return get_client()[name or DB_NAME]
+
+
+def get_collection(name, db_name=None):
+    """Colección de la base de datos por defecto."""
+    return get_db(db_name)[name]
+
+
+def close_client():
+    """Cierra el cliente del proceso (útil al final de scripts de cron)."""
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def get_pool_stats():
+    """Estadísticas del pool del proceso actual."""
+    stats = _pool_listener.snapshot()
+    stats["pid"] = os.getpid()
+    stats["client_initialized"] = _client is not None and _client_pid == os.getpid()
+    stats["options"] = get_pool_options()
+    return stats
+
+
+@mongo_pool_bp.route('/api/mongo/pool-status')
+def pool_status():
+    """Estado del pool de conexiones MongoDB de este worker"""
+    try:
+        return jsonify(get_pool_stats())
+    except Exception as e:
+        logger.error(f"Error obteniendo estado del pool: {e}")
+        return jsonify({"error": str(e)}), 500
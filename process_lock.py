@@ -0,0 +1,77 @@
+"""
+Host-wide "leader" locks for background jobs.
+
+Every gunicorn worker imports the blueprints, so a scheduler started at
+import time would run once per worker. A job guarded by try_acquire(name)
+only runs in the worker that holds the lock; if that worker exits the
+kernel releases the lock and the next worker to try takes over.
+
+Locks are advisory flock()s on files in PROCESS_LOCK_DIR (default: the
+system temp dir). On platforms without fcntl every process is the leader.
+"""
+
+import logging
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows (desarrollo local)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIR = os.getenv('PROCESS_LOCK_DIR', tempfile.gettempdir())
+
+# name -> (pid, file object) of the locks held by this process
+_held = {}
+_guard = threading.Lock()
+
+
+def _lock_path(name):
+    return os.path.join(LOCK_DIR, f"meteosarria_{name}.lock")
+
+
+def try_acquire(name):
+    """Return True if this process holds (or just acquired) the lock `name`"""
+    if fcntl is None:
+        return True
+
+    pid = os.getpid()
+    with _guard:
+        held = _held.get(name)
+        if held and held[0] == pid:
+            return True
+
+        # A lock inherited across fork belongs to the parent, not to us
+        _held.pop(name, None)
+
+        lock_file = open(_lock_path(name), 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(pid))
+        lock_file.flush()
+        _held[name] = (pid, lock_file)
+        logger.info(f"Process {pid} is now leader for '{name}'")
+        return True
+
+
+def release(name):
+    """Release the lock `name` if this process holds it"""
+    with _guard:
+        held = _held.pop(name, None)
+    if held and held[0] == os.getpid():
+        fcntl.flock(held[1].fileno(), fcntl.LOCK_UN)
+        held[1].close()
+
+
+def is_leader(name):
+    held = _held.get(name)
+    return bool(held) and held[0] == os.getpid()
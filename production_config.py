@@ -4,10 +4,13 @@ Optimiza el sistema de caché para Render
 """
 
 import os
+import tempfile
 
 # Configuración de caché para producción
 PRODUCTION_CACHE_CONFIG = {
-    'CACHE_TYPE': 'simple',  # Mantener simple para Render
+    # En disco: compartida por todos los workers de gunicorn de la máquina
+    'CACHE_TYPE': 'FileSystemCache',
+    'CACHE_DIR': os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'meteosarria_flask_cache')),
     'CACHE_DEFAULT_TIMEOUT': 86400,  # 24 horas
     'CACHE_KEY_PREFIX': 'meteosarria_prod_',
     'CACHE_THRESHOLD': 1000,  # Máximo número de elementos en caché
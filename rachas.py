@@ -0,0 +1,198 @@
+"""
+Motor de rachas (días consecutivos que cumplen una condición) por año.
+
+Carga una vez la serie diaria proyectada y ordenada por fecha en arrays
+NumPy y calcula, en una sola pasada vectorizada, la racha máxima por año de
+cualquier conjunto de predicados (campo, operador, umbral):
+
+    series = load_historico_series(diario_collection)
+    años, rachas = max_runs_per_year(series, [parse_predicate('tmax:gt:30'),
+                                              parse_predicate('tmin:gt:20')])
+
+Una racha se corta cuando el predicado deja de cumplirse, al cambiar de año
+o cuando falta algún día en la serie.
+"""
+
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+# Campos de la serie diaria y su nombre corto en las claves de respuesta
+FIELDS = {
+    'tmax': 'max',
+    'tmin': 'min',
+    'tavg': 'avg',
+}
+
+OPERATORS = {
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'lt': np.less,
+    'lte': np.less_equal,
+}
+
+Predicate = namedtuple('Predicate', ['field', 'op', 'threshold'])
+
+DailySeries = namedtuple('DailySeries', ['ordinal', 'year', 'values'])
+DailySeries.__doc__ = """
+ordinal: int32, día (date.toordinal) ordenado ascendente
+year:    int16, año de cada día
+values:  dict campo -> float64 (NaN si falta el dato)
+"""
+
+
+def parse_predicate(text):
+    """'tmax:gt:30' -> Predicate('tmax', 'gt', 30.0); ValueError si no es válido"""
+    parts = text.strip().split(':')
+    if len(parts) != 3:
+        raise ValueError(f"Predicado inválido '{text}' (formato campo:operador:umbral)")
+    field, op, threshold = parts
+    if field not in FIELDS:
+        raise ValueError(f"Campo desconocido '{field}' (válidos: {', '.join(FIELDS)})")
+    if op not in OPERATORS:
+        raise ValueError(f"Operador desconocido '{op}' (válidos: {', '.join(OPERATORS)})")
+    return Predicate(field, op, float(threshold))
+
+
+def parse_predicates(text):
+    """Lista separada por comas de predicados"""
+    return [parse_predicate(part) for part in text.split(',') if part.strip()]
+
+
+def predicate_key(predicate, prefix='racha'):
+    """Clave de respuesta, p. ej. racha_max_gt_30 (mismo nombre que los endpoints antiguos)"""
+    threshold = predicate.threshold
+    threshold_text = str(int(threshold)) if float(threshold).is_integer() else str(threshold)
+    return f"{prefix}_{FIELDS[predicate.field]}_{predicate.op}_{threshold_text}"
+
+
+def build_series(ordinals, years, values):
+    """Construye la serie a partir de listas paralelas (ya ordenadas por fecha)"""
+    return DailySeries(
+        np.asarray(ordinals, dtype=np.int32),
+        np.asarray(years, dtype=np.int16),
+        {field: np.asarray(column, dtype=np.float64) for field, column in values.items()},
+    )
+
+
+def _none_to_nan(value):
+    return np.nan if value is None else value
+
+
+def load_historico_series(diario_collection):
+    """Serie diaria de historico_diario (una consulta proyectada)"""
+    cursor = diario_collection.find(
+        {},
+        {'_id': 0, 'fecha': 1, 'año': 1,
+         'temperatura.maxima': 1, 'temperatura.minima': 1, 'temperatura.promedio': 1}
+    ).sort('fecha', 1)
+
+    ordinals, years, tmax, tmin, tavg = [], [], [], [], []
+    for doc in cursor:
+        try:
+            ordinals.append(date.fromisoformat(doc['fecha']).toordinal())
+        except (KeyError, TypeError, ValueError):
+            continue
+        temperatura = doc.get('temperatura') or {}
+        years.append(doc.get('año') or int(doc['fecha'][:4]))
+        tmax.append(_none_to_nan(temperatura.get('maxima')))
+        tmin.append(_none_to_nan(temperatura.get('minima')))
+        tavg.append(_none_to_nan(temperatura.get('promedio')))
+
+    return build_series(ordinals, years, {'tmax': tmax, 'tmin': tmin, 'tavg': tavg})
+
+
+def load_burgos_series(burgos_collection):
+    """Serie diaria de Villafría (burgos_historico_temps)"""
+    cursor = burgos_collection.find(
+        {'fecha_datetime': {'$ne': None}},
+        {'_id': 0, 'fecha_datetime': 1, 'temp_maxima': 1, 'temp_minima': 1}
+    ).sort('fecha_datetime', 1)
+
+    ordinals, years, tmax, tmin, tavg = [], [], [], [], []
+    for doc in cursor:
+        fecha = doc['fecha_datetime']
+        ordinals.append(fecha.toordinal())
+        years.append(fecha.year)
+        maxima = _none_to_nan(doc.get('temp_maxima'))
+        minima = _none_to_nan(doc.get('temp_minima'))
+        tmax.append(maxima)
+        tmin.append(minima)
+        tavg.append((maxima + minima) / 2)
+
+    return build_series(ordinals, years, {'tmax': tmax, 'tmin': tmin, 'tavg': tavg})
+
+
+def max_runs_per_year(series, predicates, years=None):
+    """
+    Racha máxima por año para cada predicado.
+
+    Args:
+        series: DailySeries ordenada por fecha
+        predicates: lista de Predicate
+        years: años a devolver (por defecto, los presentes en la serie);
+               los años sin datos valen 0
+
+    Returns:
+        (years, matrix) con matrix[i, j] = racha máxima del predicado i en years[j]
+    """
+    if years is None:
+        years = np.unique(series.year)
+    years = np.asarray(years, dtype=np.int64)
+    result = np.zeros((len(predicates), len(years)), dtype=np.int64)
+
+    n = len(series.ordinal)
+    if n == 0 or not predicates:
+        return years, result
+
+    # (k, n): día que cumple cada predicado (NaN nunca cumple)
+    with np.errstate(invalid='ignore'):
+        mask = np.stack([
+            OPERATORS[p.op](series.values[p.field], p.threshold) for p in predicates
+        ])
+
+    # Un día continúa la racha del anterior si es el día siguiente del mismo año
+    continues = np.zeros(n, dtype=bool)
+    continues[1:] = (np.diff(series.ordinal) == 1) & (series.year[1:] == series.year[:-1])
+
+    continues_run = mask.copy()
+    continues_run[:, 1:] &= mask[:, :-1] & continues[1:]
+    continues_run[:, 0] = False
+    starts = mask & ~continues_run
+
+    # Identificador de racha sobre la matriz aplanada (las filas nunca se enlazan)
+    flat_mask = mask.ravel()
+    run_ids = np.cumsum(starts.ravel())[flat_mask]
+    lengths = np.bincount(run_ids)[1:]
+
+    start_positions = np.flatnonzero(starts.ravel())
+    rows = start_positions // n
+    run_years = series.year[start_positions % n]
+
+    year_index = np.searchsorted(years, run_years)
+    in_range = (year_index < len(years)) & (years[np.minimum(year_index, len(years) - 1)] == run_years)
+    np.maximum.at(result, (rows[in_range], year_index[in_range]), lengths[in_range])
+
+    return years, result
+
+
+def rachas_por_año(series, predicates, years=None):
+    """Formato de respuesta: [{'año': 2024, 'racha_max_gt_30': 5, ...}, ...]"""
+    years, matrix = max_runs_per_year(series, predicates, years)
+    keys = [predicate_key(p) for p in predicates]
+    return [
+        {'año': int(year), **{key: int(matrix[i, j]) for i, key in enumerate(keys)}}
+        for j, year in enumerate(years)
+    ]
+
+
+def current_run(series, predicate, since_ordinal=None):
+    """Días seguidos, contando hacia atrás desde el último de la serie, que cumplen el predicado"""
+    values = series.values[predicate.field]
+    if since_ordinal is not None:
+        values = values[series.ordinal >= since_ordinal]
+    with np.errstate(invalid='ignore'):
+        mask = OPERATORS[predicate.op](values, predicate.threshold)
+    failures = np.flatnonzero(~mask[::-1])
+    return int(failures[0]) if len(failures) else int(len(mask))
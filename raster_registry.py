@@ -0,0 +1,79 @@
+"""
+Readers de rio-tiler abiertos para los GeoTIFF del run publicado.
+
+serve_tile abría el GeoTIFF en cada tesela no cacheada (os.path.exists,
+abrir, parsear cabeceras, cerrar). Aquí cada (var, step) se abre una vez y
+el handle se reutiliza, con la caché de bloques de GDAL ya caliente.
+
+Los datasets de rasterio no admiten lecturas concurrentes, así que los
+handles son por hilo (threading.local): sin locks entre los hilos de un
+worker gthread. Cuando cambia la publicación, cada hilo cierra los suyos y
+abre los nuevos la primera vez que los necesita; nunca se cierra un handle
+que otro hilo esté usando.
+
+La clave es la publicación (run, published_at), no solo el run: relanzar el
+pipeline para el mismo run vuelve a escribir los GeoTIFF, y los que faltaban
+en la publicación anterior pueden existir ahora.
+
+El pipeline sustituye los GeoTIFF con os.replace, así que un handle abierto
+sigue viendo el fichero completo de su publicación hasta la siguiente.
+"""
+
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class RasterRegistry:
+    """Readers abiertos por hilo para una publicación; path_for(var, step) → ruta del GeoTIFF"""
+
+    def __init__(self, path_for):
+        self._path_for = path_for
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {'opens': 0, 'missing': 0, 'closes': 0}
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def _swap(self, publication):
+        """Cierra los handles de este hilo y empieza un registro vacío para publication"""
+        readers = getattr(self._local, 'readers', {})
+        for reader in readers.values():
+            if reader is not None:
+                try:
+                    reader.close()
+                except Exception as e:
+                    logger.warning(f"Error cerrando {reader.input}: {e}")
+                self._count('closes')
+        self._local.publication = publication
+        self._local.readers = {}
+
+    def get(self, publication, var, step):
+        """
+        Reader abierto del GeoTIFF de (var, step), o None si no existe.
+        publication: cualquier valor que cambie al publicar, p. ej. (run, published_at)
+        """
+        from rasterio.errors import RasterioIOError
+        from rio_tiler.io import Reader
+
+        if getattr(self._local, 'publication', None) != publication:
+            self._swap(publication)
+
+        readers = self._local.readers
+        key = (var, step)
+        if key not in readers:
+            # Un GeoTIFF que falta no se vuelve a buscar hasta la siguiente publicación
+            try:
+                readers[key] = Reader(self._path_for(var, step))
+                self._count('opens')
+            except RasterioIOError:
+                readers[key] = None
+                self._count('missing')
+        return readers[key]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
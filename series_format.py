@@ -0,0 +1,134 @@
+"""
+Formato compacto opcional para los endpoints de series.
+
+Por defecto los endpoints siguen devolviendo una lista de documentos. Con
+?format=columns devuelven arrays paralelos, uno por campo:
+
+    {"format": "columns", "count": 3,
+     "fields": ["timestamp", "external_temperature"],
+     "columns": {"timestamp": [...], "external_temperature": [...]}}
+
+Los subdocumentos se aplanan en rutas con puntos ("google_weather_burgos_center.temperature")
+y, salvo que se pidan, se omiten _id y raw_data.
+
+?fields=a,b.c proyecta los campos (en los dos formatos). Un campo incluye
+también todo lo que cuelga de él ("google_weather_burgos_center" trae todas sus
+hojas). mongo_projection() traslada esa selección a la consulta, de modo que
+Mongo no envía lo que no se va a devolver.
+"""
+
+from flask import request
+
+# Campos que el formato columnar omite si no se piden explícitamente
+EXCLUDED_BY_DEFAULT = ('_id', 'raw_data')
+
+
+def wants_columns():
+    return request.args.get('format', '').lower() == 'columns'
+
+
+def requested_fields():
+    """Lista de ?fields= (sin duplicados, en orden) o None"""
+    fields = []
+    for field in request.args.get('fields', '').split(','):
+        field = field.strip()
+        if field and field not in fields:
+            fields.append(field)
+    return fields or None
+
+
+def _covered(path, fields):
+    return any(path == field or path.startswith(field + '.') for field in fields)
+
+
+def mongo_projection(fields=None, always=()):
+    """
+    Proyección de Mongo para ?fields= (None si no se pidió ninguno).
+
+    always son campos que el endpoint necesita aunque no se devuelvan
+    (p. ej. el de ordenación).
+    """
+    fields = fields if fields is not None else requested_fields()
+    if not fields:
+        return None
+    paths = list(fields) + [path for path in always if path not in fields]
+    # Mongo rechaza pedir a la vez un campo y uno de sus hijos
+    paths = [path for path in paths if not _covered(path, [p for p in paths if p != path])]
+    projection = {path: 1 for path in paths}
+    if '_id' not in paths:
+        projection['_id'] = 0
+    return projection
+
+
+def _flatten(doc, prefix=''):
+    for key, value in doc.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            yield from _flatten(value, path + '.')
+        else:
+            yield path, value
+
+
+_MISSING = object()
+
+
+def _get(doc, path):
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _project(doc, fields):
+    """Copia de doc con solo los campos pedidos (respetando el anidamiento)"""
+    result = {}
+    for field in fields:
+        value = _get(doc, field)
+        if value is _MISSING:
+            continue
+        target = result
+        parts = field.split('.')
+        for part in parts[:-1]:
+            target = target.setdefault(part, {})
+        target[parts[-1]] = value
+    return result
+
+
+def to_columns(records, fields=None):
+    """Arrays paralelos por campo hoja; fields filtra por ruta o prefijo"""
+    flat_records = [dict(_flatten(record)) for record in records]
+
+    columns = []
+    seen = set()
+    for flat in flat_records:
+        for path in flat:
+            if path in seen:
+                continue
+            seen.add(path)
+            if fields is None:
+                if not _covered(path, EXCLUDED_BY_DEFAULT):
+                    columns.append(path)
+            elif _covered(path, fields):
+                columns.append(path)
+    if fields is not None:
+        # Campos pedidos que no aparecen en ningún documento: columna de nulos
+        columns += [field for field in fields if not any(_covered(c, [field]) for c in columns)]
+
+    return {
+        'format': 'columns',
+        'count': len(flat_records),
+        'fields': columns,
+        'columns': {path: [flat.get(path) for flat in flat_records] for path in columns},
+    }
+
+
+def format_records(records):
+    """records según ?format= y ?fields= (sin parámetros, tal cual)"""
+    fields = requested_fields()
+    if wants_columns():
+        return to_columns(records, fields)
+    if fields:
+        return [_project(record, fields) for record in records]
+    return records
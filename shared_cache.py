@@ -0,0 +1,340 @@
+"""
+Caché compartida por todos los workers de gunicorn de la máquina.
+
+Los endpoints de previsión y la lluvia de Barcelona guardaban sus resultados en
+diccionarios del módulo, así que cada worker pedía lo mismo a AEMET/Open-Meteo
+y un clear-cache solo limpiaba el worker que recibía el POST. Este módulo los
+sustituye por un fichero SQLite (modo WAL) sin servidor externo:
+
+- escrituras atómicas (una transacción por entrada)
+- TTL por entrada; las entradas caducadas se conservan un tiempo para poder
+  servirlas como "stale" si el upstream falla (get_entry)
+- una conexión por hilo y proceso (seguro tras el fork de gunicorn)
+
+Si la base de datos falla, las lecturas se comportan como un miss y las
+escrituras se descartan: la caché nunca tumba un endpoint.
+
+Los valores se guardan con pickle, así que quien pueda escribir el fichero
+puede ejecutar código en los workers. Por eso la base de datos vive en un
+directorio privado (SHARED_CACHE_DIR, creado con modo 0700) y no se abre si
+el fichero o su directorio no son del usuario del proceso o los puede
+escribir otro usuario.
+"""
+
+import logging
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Directorio privado del usuario (no el temporal del sistema, que puede
+# escribir cualquiera)
+CACHE_DIR = os.getenv(
+    'SHARED_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), f"meteosarria-{os.getuid()}" if hasattr(os, 'getuid') else 'meteosarria')
+)
+CACHE_PATH = os.getenv('SHARED_CACHE_PATH', os.path.join(CACHE_DIR, 'shared_cache.sqlite3'))
+
+# Cuánto se conservan las entradas ya caducadas (para servirlas como stale)
+STALE_GRACE_SECONDS = int(os.getenv('SHARED_CACHE_STALE_GRACE', 7 * 86400))
+
+CacheEntry = namedtuple('CacheEntry', ['value', 'updated_at', 'expires_at'])
+CacheEntry.expired = property(lambda self: time.time() >= self.expires_at)
+
+_local = threading.local()
+
+
+def _check_private(path):
+    """Error si path es de otro usuario o lo puede escribir el grupo u otros"""
+    if not hasattr(os, 'getuid'):  # Windows (desarrollo local)
+        return
+    info = os.lstat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} pertenece a otro usuario (uid {info.st_uid})")
+    if stat.S_ISLNK(info.st_mode) or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} es un enlace o lo pueden escribir otros usuarios")
+
+
+def _connect():
+    directory = os.path.dirname(os.path.abspath(CACHE_PATH))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    _check_private(directory)
+    if os.path.lexists(CACHE_PATH):
+        _check_private(CACHE_PATH)
+    conn = sqlite3.connect(CACHE_PATH, timeout=5, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS entries ('
+        ' key TEXT PRIMARY KEY,'
+        ' value BLOB NOT NULL,'
+        ' updated_at REAL NOT NULL,'
+        ' expires_at REAL NOT NULL)'
+    )
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS leases ('
+        ' key TEXT PRIMARY KEY,'
+        ' owner TEXT NOT NULL,'
+        ' expires_at REAL NOT NULL)'
+    )
+    return conn
+
+
+def _conn():
+    """Conexión del hilo actual (se reabre si el proceso ha hecho fork)"""
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def get_entry(key):
+    """Devuelve la entrada (aunque esté caducada) o None"""
+    try:
+        row = _conn().execute(
+            'SELECT value, updated_at, expires_at FROM entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return CacheEntry(pickle.loads(row[0]), row[1], row[2])
+    except Exception as e:
+        logger.error(f"Error leyendo '{key}' de la caché compartida: {e}")
+        return None
+
+
+def get(key):
+    """Devuelve el valor si existe y no ha caducado, si no None"""
+    entry = get_entry(key)
+    if entry is None or entry.expired:
+        return None
+    return entry.value
+
+
+def set(key, value, ttl):
+    """Guarda value durante ttl segundos"""
+    now = time.time()
+    try:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        conn = _conn()
+        conn.execute(
+            'INSERT OR REPLACE INTO entries (key, value, updated_at, expires_at) '
+            'VALUES (?, ?, ?, ?)',
+            (key, blob, now, now + ttl)
+        )
+        conn.execute('DELETE FROM entries WHERE expires_at < ?', (now - STALE_GRACE_SECONDS,))
+        return True
+    except Exception as e:
+        logger.error(f"Error guardando '{key}' en la caché compartida: {e}")
+        return False
+
+
+def delete(key):
+    try:
+        _conn().execute('DELETE FROM entries WHERE key = ?', (key,))
+        return True
+    except Exception as e:
+        logger.error(f"Error borrando '{key}' de la caché compartida: {e}")
+        return False
+
+
+def delete_prefix(prefix):
+    """Borra todas las claves que empiezan por prefix; devuelve cuántas"""
+    try:
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        cursor = _conn().execute(
+            "DELETE FROM entries WHERE key LIKE ? ESCAPE '\\'", (escaped + '%',)
+        )
+        return cursor.rowcount
+    except Exception as e:
+        logger.error(f"Error borrando '{prefix}*' de la caché compartida: {e}")
+        return 0
+
+
+def clear():
+    try:
+        _conn().execute('DELETE FROM entries')
+        return True
+    except Exception as e:
+        logger.error(f"Error vaciando la caché compartida: {e}")
+        return False
+
+
+def keys(prefix=''):
+    """Lista (clave, caducada) de las entradas, para diagnóstico"""
+    now = time.time()
+    try:
+        rows = _conn().execute('SELECT key, expires_at FROM entries ORDER BY key').fetchall()
+        return [(key, expires_at <= now) for key, expires_at in rows if key.startswith(prefix)]
+    except Exception as e:
+        logger.error(f"Error listando la caché compartida: {e}")
+        return []
+
+
+# ---------------------------------------------------------------------------
+# Single-flight y stale-while-revalidate
+# ---------------------------------------------------------------------------
+#
+# get_or_compute() garantiza que, para una clave, solo un cálculo está en
+# marcha en toda la máquina: dentro del proceso los demás hilos esperan el
+# mismo Future, y entre workers se usa un "lease" en la tabla leases de la
+# misma base de datos. Los workers sin lease esperan a que aparezca el valor.
+
+LEASE_SECONDS = float(os.getenv('SHARED_CACHE_LEASE_SECONDS', '60'))
+_POLL_INTERVAL = 0.1
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cache-refresh')
+
+
+def _owner():
+    return f"{os.getpid()}:{threading.get_ident()}"
+
+
+def _acquire_lease(key):
+    """Intenta tomar el lease de key; True si lo tenemos"""
+    try:
+        conn = _conn()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT expires_at FROM leases WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[0] > now:
+                conn.execute('COMMIT')
+                return False
+            conn.execute(
+                'INSERT OR REPLACE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                (key, _owner(), now + LEASE_SECONDS)
+            )
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    except Exception as e:
+        # Sin coordinación entre procesos seguimos funcionando (solo en proceso)
+        logger.error(f"Error tomando el lease de '{key}': {e}")
+        return True
+
+
+def _release_lease(key):
+    try:
+        _conn().execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, _owner()))
+    except Exception as e:
+        logger.error(f"Error liberando el lease de '{key}': {e}")
+
+
+def _lease_active(key):
+    try:
+        row = _conn().execute('SELECT expires_at FROM leases WHERE key = ?', (key,)).fetchone()
+        return row is not None and row[0] > time.time()
+    except Exception:
+        return False
+
+
+def _compute_across_workers(key, compute, ttl, since):
+    """Calcula y guarda key, o espera al worker que ya lo está calculando"""
+    deadline = time.monotonic() + LEASE_SECONDS
+    while True:
+        if _acquire_lease(key):
+            try:
+                # Otro worker pudo terminar justo antes de que tomáramos el lease
+                entry = get_entry(key)
+                if entry is not None and entry.updated_at > since and not entry.expired:
+                    return entry.value
+                value = compute()
+                set(key, value, ttl)
+                return value
+            finally:
+                _release_lease(key)
+
+        # Otro worker lo está calculando: esperar a su resultado
+        while _lease_active(key) and time.monotonic() < deadline:
+            time.sleep(_POLL_INTERVAL)
+            entry = get_entry(key)
+            if entry is not None and entry.updated_at > since:
+                return entry.value
+
+        entry = get_entry(key)
+        if entry is not None and entry.updated_at > since:
+            return entry.value
+        if time.monotonic() >= deadline:
+            logger.warning(f"Lease de '{key}' sin resultado tras {LEASE_SECONDS}s; calculando")
+            value = compute()
+            set(key, value, ttl)
+            return value
+        # El otro worker falló sin guardar nada: reintentar tomar el lease
+
+
+def _single_flight(key, compute, ttl):
+    """Un único cálculo por clave: los demás hilos del proceso esperan su resultado"""
+    with _inflight_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not leader:
+        return future.result()
+
+    try:
+        value = _compute_across_workers(key, compute, ttl, since=time.time())
+        future.set_result(value)
+        return value
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _refresh_in_background(key, compute, ttl):
+    with _inflight_lock:
+        if key in _inflight:
+            return
+
+    def run():
+        try:
+            _single_flight(key, compute, ttl)
+        except Exception as e:
+            logger.error(f"Error refrescando '{key}' en segundo plano: {e}")
+
+    _refresh_executor.submit(run)
+
+
+def get_or_compute(key, compute, ttl, stale_ttl=0):
+    """
+    Devuelve el valor de key, calculándolo con compute() si hace falta.
+
+    - Si está vigente, se devuelve sin más.
+    - Si caducó hace menos de stale_ttl segundos, se devuelve el valor viejo
+      y se lanza un único refresco en segundo plano (stale-while-revalidate).
+    - Si no hay valor utilizable, se calcula una sola vez por clave en toda
+      la máquina; los demás llamantes esperan ese resultado. Las excepciones
+      de compute() llegan a todos los que esperaban en el proceso.
+    """
+    entry = get_entry(key)
+    if entry is not None:
+        if not entry.expired:
+            return entry.value
+        if stale_ttl and time.time() - entry.expires_at < stale_ttl:
+            _refresh_in_background(key, compute, ttl)
+            return entry.value
+
+    return _single_flight(key, compute, ttl)
+
+
+def refresh(key, compute, ttl):
+    """Fuerza un nuevo cálculo de key (coalescido con cualquier otro en curso)"""
+    return _single_flight(key, compute, ttl)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Pruebas del motor de rachas (rachas.max_runs_per_year): una racha se corta
+al faltar un día, con un NaN y al cambiar de año.
+"""
+
+from datetime import date
+
+import numpy as np
+
+from rachas import build_series, max_runs_per_year, parse_predicate
+
+
+def _series(days):
+    """days: lista de (date, tmax) ordenada"""
+    return build_series(
+        [d.toordinal() for d, _ in days],
+        [d.year for d, _ in days],
+        {'tmax': [t for _, t in days]},
+    )
+
+
+def test_racha_se_corta_en_hueco_y_nan():
+    days = [
+        (date(2024, 7, 1), 32.0),
+        (date(2024, 7, 2), 33.0),
+        (date(2024, 7, 3), 34.0),
+        # falta el 4 de julio
+        (date(2024, 7, 5), 31.0),
+        (date(2024, 7, 6), 31.5),
+        (date(2024, 7, 7), np.nan),
+        (date(2024, 7, 8), 35.0),
+    ]
+    years, matrix = max_runs_per_year(_series(days), [parse_predicate('tmax:gt:30')])
+    assert list(years) == [2024]
+    assert matrix[0, 0] == 3
+
+
+def test_racha_se_corta_en_fin_de_año():
+    days = [
+        (date(2023, 12, 29), 10.0),
+        (date(2023, 12, 30), 25.0),
+        (date(2023, 12, 31), 25.0),
+        (date(2024, 1, 1), 25.0),
+        (date(2024, 1, 2), 25.0),
+        (date(2024, 1, 3), 25.0),
+    ]
+    years, matrix = max_runs_per_year(_series(days), [parse_predicate('tmax:gte:25'),
+                                                      parse_predicate('tmax:lt:0')])
+    assert list(years) == [2023, 2024]
+    assert matrix[0].tolist() == [2, 3]
+    assert matrix[1].tolist() == [0, 0]
+
+
+if __name__ == "__main__":
+    test_racha_se_corta_en_hueco_y_nan()
+    test_racha_se_corta_en_fin_de_año()
+    print("OK")
@@ -0,0 +1,164 @@
+"""
+Caché de teselas PNG de /api/graphcast/tiles.
+
+Una tesela depende solo de (run, var, step, z, x, y) y no cambia hasta que el
+pipeline publica el siguiente run, así que renderizarla (rio-tiler, LUT y PNG)
+en cada petición era trabajo repetido. Dos capas:
+
+- memoria: LRU por proceso acotada en bytes (GRAPHCAST_TILE_CACHE_MB); cada
+  entrada cuesta además ENTRY_OVERHEAD, así que el número de teselas vacías
+  también está acotado
+- disco: <root>/<run>/<var>/<step>/<z>/<x>/<y>.png, compartida por todos los
+  workers; se escribe con rename atómico. Un fichero vacío marca una tesela
+  sin datos, que se sirve como PNG transparente. El
+  pre-renderizado del pipeline escribe directamente en esta capa.
+
+Las teselas fuera de la Península no llegan aquí (api_graphcast las descarta
+antes de buscar), para que recorrer z/x/y no llene la memoria ni el disco.
+
+invalidate(run) se llama al publicar un run: vacía la memoria y borra del
+disco los runs anteriores. Como las claves llevan el run, un worker que aún
+no se haya enterado del cambio nunca sirve teselas del run viejo para el
+nuevo.
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MAX_BYTES = int(float(os.getenv('GRAPHCAST_TILE_CACHE_MB', '64')) * 1024 * 1024)
+
+# Tesela sin datos (en memoria y en disco)
+EMPTY = b""
+
+# Coste fijo por entrada (clave, nodo del OrderedDict), para que las teselas
+# vacías también cuenten contra MAX_BYTES
+ENTRY_OVERHEAD = 256
+
+
+class TileCache:
+    """LRU en memoria delante de un árbol de PNGs en disco"""
+
+    def __init__(self, root, max_bytes=MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0,
+                       'disk_writes': 0, 'disk_bytes_written': 0}
+
+    def path(self, key):
+        run, var, step, z, x, y = key
+        return os.path.join(self.root, run, var, f"{step:03d}", str(z), str(x), f"{y}.png")
+
+    def _remember(self, key, content):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous) + ENTRY_OVERHEAD
+            size = len(content) + ENTRY_OVERHEAD
+            if size > self.max_bytes:
+                return
+            self._entries[key] = content
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted) + ENTRY_OVERHEAD
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def lookup(self, key):
+        """
+        ('memory', png) o ('disk', ruta, tamaño) o None si no está en ninguna capa.
+
+        Las teselas de disco no se copian a memoria: se sirven con send_file
+        (sendfile bajo gunicorn). Tamaño 0 = tesela sin datos.
+        """
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return 'memory', content
+
+        path = self.path(key)
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            self._count('misses')
+            return None
+
+        self._count('disk_hits')
+        return 'disk', path, size
+
+    def get(self, key):
+        """PNG (EMPTY si la tesela no tiene datos) o None si no está en ninguna capa"""
+        found = self.lookup(key)
+        if found is None:
+            return None
+        if found[0] == 'memory':
+            return found[1]
+        try:
+            with open(found[1], 'rb') as f:
+                content = f.read()
+        except OSError:
+            return None
+        self._remember(key, content)
+        return content
+
+    def write(self, key, content):
+        """Solo disco (la usa el pre-renderizado); True si se ha escrito"""
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar la tesela {key} en disco: {e}")
+            return False
+        self._count('disk_writes')
+        self._count('disk_bytes_written', len(content))
+        return True
+
+    def put(self, key, content):
+        """Guarda en memoria y en disco (los errores de disco solo se registran)"""
+        self._remember(key, content)
+        self.write(key, content)
+
+    def clear_memory(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def invalidate(self, keep_run=None):
+        """Vacía la memoria y borra del disco todos los runs salvo keep_run"""
+        self.clear_memory()
+        try:
+            runs = os.listdir(self.root)
+        except OSError:
+            return
+        for run in runs:
+            if run != keep_run:
+                shutil.rmtree(os.path.join(self.root, run), ignore_errors=True)
+                logger.info(f"Teselas del run {run} eliminadas")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+            stats['memory_bytes'] = self._bytes
+        stats['memory_max_bytes'] = self.max_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else None
+        return stats
@@ -0,0 +1,260 @@
+"""
+Almacén columnar en memoria (por proceso) de las series diarias.
+
+historico_diario (Sarrià) y burgos_historico_temps (Villafría) tienen entre
+unos miles y decenas de miles de filas diarias. En vez de lanzar una
+agregación de Mongo por petición, cada worker mantiene ambas series en arrays
+NumPy:
+
+    ordinal (int32, date.toordinal), year (int16), month (int8),
+    values['tmax' | 'tmin' | 'tavg' | 'hum'] (float64, NaN si falta)
+
+La primera lectura carga la colección completa (proyectada y ordenada por
+fecha). Después, cada TIMESERIES_REFRESH_SECONDS se piden solo las filas con
+fecha >= la última cargada, lo que también recoge el día en curso, que
+historical_data_updater reescribe varias veces al día. invalidate() (la
+llama conditional cuando cambia la marca de agua) obliga a recargar la
+colección completa, porque un backfill o una reimportación escriben fechas
+anteriores a la última cargada que el refresco incremental no vería.
+
+snapshot() devuelve None si el almacén está vacío o lleva más de
+TIMESERIES_MAX_STALE_SECONDS sin poder refrescarse; los endpoints vuelven
+entonces a consultar Mongo directamente.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from mongo_pool import get_collection
+from rachas import OPERATORS
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.getenv('TIMESERIES_REFRESH_SECONDS', '300'))
+MAX_STALE_SECONDS = float(os.getenv('TIMESERIES_MAX_STALE_SECONDS', '3600'))
+
+COLUMNS = ('tmax', 'tmin', 'tavg', 'hum')
+
+DailyColumns = namedtuple('DailyColumns', ['ordinal', 'year', 'month', 'values', 'loaded_at'])
+
+
+def _nan(value):
+    return np.nan if value is None else value
+
+
+class DailyStore:
+    """Serie diaria de una colección, cargada en columnas y refrescada por incrementos"""
+
+    def __init__(self, name, collection_name, date_field, projection, parse_row):
+        self.name = name
+        self.collection_name = collection_name
+        self.date_field = date_field
+        self.projection = projection
+        self.parse_row = parse_row
+
+        self._data = None
+        self._last_key = None
+        self._checked_at = 0.0
+        self._invalidated = False
+        self._full_reload = False
+        self._lock = threading.Lock()
+
+    def _fetch(self, since=None):
+        query = {self.date_field: {'$ne': None}}
+        if since is not None:
+            query = {self.date_field: {'$gte': since}}
+        cursor = get_collection(self.collection_name).find(query, self.projection).sort(self.date_field, 1)
+
+        rows = []
+        last_key = since
+        for doc in cursor:
+            row = self.parse_row(doc)
+            if row is None:
+                continue
+            rows.append(row)
+            last_key = doc[self.date_field]
+        return rows, last_key
+
+    @staticmethod
+    def _to_columns(rows):
+        if not rows:
+            return (np.empty(0, np.int32), np.empty(0, np.int16), np.empty(0, np.int8),
+                    {column: np.empty(0, np.float64) for column in COLUMNS})
+        ordinal, year, month, *values = zip(*rows)
+        return (np.asarray(ordinal, np.int32), np.asarray(year, np.int16),
+                np.asarray(month, np.int8),
+                {column: np.asarray(v, np.float64) for column, v in zip(COLUMNS, values)})
+
+    def _refresh(self):
+        started = time.perf_counter()
+        if self._data is None or self._full_reload:
+            rows, last_key = self._fetch()
+            ordinal, year, month, values = self._to_columns(rows)
+            self._full_reload = False
+            mode = 'completa'
+        else:
+            rows, last_key = self._fetch(since=self._last_key)
+            new_ordinal, new_year, new_month, new_values = self._to_columns(rows)
+            # Las filas >= última fecha cargada se sustituyen (el día en curso cambia)
+            keep = self._data.ordinal < new_ordinal[0] if len(new_ordinal) else slice(None)
+            ordinal = np.concatenate([self._data.ordinal[keep], new_ordinal])
+            year = np.concatenate([self._data.year[keep], new_year])
+            month = np.concatenate([self._data.month[keep], new_month])
+            values = {column: np.concatenate([self._data.values[column][keep], new_values[column]])
+                      for column in COLUMNS}
+            mode = 'incremental'
+
+        self._data = DailyColumns(ordinal, year, month, values, time.time())
+        self._last_key = last_key
+        logger.info(f"Serie '{self.name}': carga {mode}, {len(rows)} filas leídas, "
+                    f"{len(ordinal)} en memoria ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    def invalidate(self):
+        """
+        La colección ha cambiado: la próxima lectura recarga la serie completa
+        y espera a la recarga (los cambios pueden ser de fechas ya cargadas)
+        """
+        self._full_reload = True
+        self._invalidated = True
+
+    def snapshot(self):
+        """Columnas actuales, o None si no hay datos suficientemente recientes"""
+        if self._invalidated or time.time() - self._checked_at >= REFRESH_SECONDS:
+            # Solo un hilo refresca; el resto sigue con los datos actuales si los hay
+            # (salvo tras invalidate(), que obliga a esperar a los nuevos)
+            if self._lock.acquire(blocking=self._data is None or self._invalidated):
+                try:
+                    if self._invalidated or time.time() - self._checked_at >= REFRESH_SECONDS:
+                        self._invalidated = False
+                        self._refresh()
+                        self._checked_at = time.time()
+                except Exception as e:
+                    logger.error(f"Error refrescando la serie '{self.name}': {e}")
+                    self._checked_at = time.time()
+                finally:
+                    self._lock.release()
+
+        data = self._data
+        if data is None or time.time() - data.loaded_at > MAX_STALE_SECONDS:
+            return None
+        return data
+
+    def status(self):
+        data = self._data
+        return {
+            'rows': int(len(data.ordinal)) if data is not None else 0,
+            'loaded_at': data.loaded_at if data is not None else None,
+            'last_key': str(self._last_key) if self._last_key is not None else None,
+        }
+
+
+def _parse_historico(doc):
+    try:
+        fecha = date.fromisoformat(doc['fecha'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    temperatura = doc.get('temperatura') or {}
+    humedad = doc.get('humedad') or {}
+    return (fecha.toordinal(), fecha.year, fecha.month,
+            _nan(temperatura.get('maxima')), _nan(temperatura.get('minima')),
+            _nan(temperatura.get('promedio')), _nan(humedad.get('promedio')))
+
+
+def _parse_burgos(doc):
+    fecha = doc.get('fecha_datetime')
+    if fecha is None:
+        return None
+    maxima = _nan(doc.get('temp_maxima'))
+    minima = _nan(doc.get('temp_minima'))
+    return (fecha.toordinal(), fecha.year, fecha.month,
+            maxima, minima, (maxima + minima) / 2, np.nan)
+
+
+historico_store = DailyStore(
+    'historico_diario', 'historico_diario', 'fecha',
+    {'_id': 0, 'fecha': 1, 'temperatura.maxima': 1, 'temperatura.minima': 1,
+     'temperatura.promedio': 1, 'humedad.promedio': 1},
+    _parse_historico,
+)
+
+burgos_store = DailyStore(
+    'burgos_historico_temps', 'burgos_historico_temps', 'fecha_datetime',
+    {'_id': 0, 'fecha_datetime': 1, 'temp_maxima': 1, 'temp_minima': 1},
+    _parse_burgos,
+)
+
+
+def _year_index(columns, years):
+    if years is None:
+        years = np.unique(columns.year)
+    years = np.asarray(years, dtype=np.int64)
+    index = np.searchsorted(years, columns.year)
+    valid = (index < len(years)) & (years[np.minimum(index, len(years) - 1)] == columns.year)
+    return years, index, valid
+
+
+def count_per_year(columns, field, op, threshold, years=None):
+    """(years, counts) de días en los que field <op> threshold"""
+    years, index, valid = _year_index(columns, years)
+    with np.errstate(invalid='ignore'):
+        hits = OPERATORS[op](columns.values[field], threshold) & valid
+    counts = np.bincount(index[hits], minlength=len(years))[:len(years)]
+    return years, counts
+
+
+def mean_per_year(columns, field, years=None):
+    """(years, means) ignorando NaN; NaN en años sin datos"""
+    years, index, valid = _year_index(columns, years)
+    values = columns.values[field]
+    present = valid & ~np.isnan(values)
+    sums = np.bincount(index[present], weights=values[present], minlength=len(years))[:len(years)]
+    counts = np.bincount(index[present], minlength=len(years))[:len(years)]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return years, sums / counts
+
+
+def month_summary(columns, year, month):
+    """Media de tavg, máxima de tmax, mínima de tmin y días de un mes, más el récord de tmax de ese mes en otros años"""
+    same_month = columns.month == month
+    selected = same_month & (columns.year == year)
+    others = same_month & (columns.year != year)
+
+    def reduce(func, field, mask):
+        values = columns.values[field][mask]
+        values = values[~np.isnan(values)]
+        return float(func(values)) if len(values) else None
+
+    return {
+        'media': reduce(np.mean, 'tavg', selected),
+        'maxima': reduce(np.max, 'tmax', selected),
+        'minima': reduce(np.min, 'tmin', selected),
+        'dias': int(np.count_nonzero(selected)),
+        'record_otros_años': reduce(np.max, 'tmax', others),
+    }
+
+
+def grouped_mean(columns, field, keys, mask=None):
+    """(claves, medias) de field agrupado por keys (array paralelo), ignorando NaN"""
+    values = columns.values[field]
+    present = ~np.isnan(values) if mask is None else mask & ~np.isnan(values)
+    unique, inverse = np.unique(keys[present], return_inverse=True)
+    sums = np.bincount(inverse, weights=values[present], minlength=len(unique))
+    counts = np.bincount(inverse, minlength=len(unique))
+    return unique, sums / np.maximum(counts, 1)
+
+
+def extreme(columns, field, kind, mask=None):
+    """(valor, date) del máximo ('max') o mínimo ('min') de field, o None si no hay datos"""
+    values = columns.values[field]
+    if mask is not None:
+        values = np.where(mask, values, np.nan)
+    if np.all(np.isnan(values)):
+        return None
+    i = np.nanargmax(values) if kind == 'max' else np.nanargmin(values)
+    return float(values[i]), date.fromordinal(int(columns.ordinal[i]))
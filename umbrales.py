@@ -0,0 +1,257 @@
+"""
+Histograma de umbrales por (año, mes) sobre las series diarias.
+
+Dados un campo y unos puntos de corte c1 < c2 < ... < cN, cada día cae en uno
+de 2N+1 tramos:
+
+    (-inf, c1), [c1], (c1, c2), [c2], ..., (cN-1, cN), [cN], (cN, +inf)
+
+Como el valor exacto de cada corte tiene su propio tramo, cualquier conteo
+gt/gte/lt/lte sobre uno de los cortes sale de sumar tramos (count_days). Añadir
+un umbral a las estadísticas mensuales es añadir su corte a MONTH_COUNTS.
+
+histogram_per_month() calcula todos los meses de una pasada vectorizada sobre
+una instantánea de timeseries_store; monthly_histogram() lo guarda por
+instantánea (LRU de CACHE_ENTRIES) para que la vista de cualquier mes lo
+reutilice. Sin serie en
+memoria, histogram_stages() hace el mismo reparto en Mongo con un $group.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Conteos de las estadísticas mensuales: (clave de respuesta, campo, operador, umbral)
+MONTH_COUNTS = (
+    ('dias_max_gte_35', 'tmax', 'gte', 35),
+    ('dias_max_gte_30', 'tmax', 'gte', 30),
+    ('dias_max_gte_25', 'tmax', 'gte', 25),
+    ('dias_max_gt_20', 'tmax', 'gt', 20),
+    ('dias_max_lte_20', 'tmax', 'lte', 20),
+    ('dias_max_lte_15', 'tmax', 'lte', 15),
+    ('dias_max_lte_10', 'tmax', 'lte', 10),
+    ('dias_max_lte_5', 'tmax', 'lte', 5),
+    ('dias_max_lte_0', 'tmax', 'lte', 0),
+    ('dias_min_gte_30', 'tmin', 'gte', 30),
+    ('dias_min_gte_25', 'tmin', 'gte', 25),
+    ('dias_min_gte_20', 'tmin', 'gte', 20),
+    ('dias_min_lte_20', 'tmin', 'lte', 20),
+    ('dias_min_lte_15', 'tmin', 'lte', 15),
+    ('dias_min_lte_10', 'tmin', 'lte', 10),
+    ('dias_min_lte_5', 'tmin', 'lte', 5),
+    ('dias_min_lte_0', 'tmin', 'lte', 0),
+    ('dias_helada', 'tmin', 'lte', 0),
+)
+
+# Tramos que suma cada operador respecto al corte k
+_SELECTORS = {
+    'lt': lambda k: slice(0, 2 * k + 1),
+    'lte': lambda k: slice(0, 2 * k + 2),
+    'gt': lambda k: slice(2 * k + 2, None),
+    'gte': lambda k: slice(2 * k + 1, None),
+}
+
+# Máximo de cortes por petición (?cortes= de /histograma-umbrales)
+MAX_CUTS = 40
+
+# Histogramas guardados (LRU): los cortes de ?cortes= los elige el cliente
+CACHE_ENTRIES = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def parse_cuts(text):
+    """'30,0,10' -> (0.0, 10.0, 30.0); ValueError si no es válido"""
+    try:
+        cuts = sorted({float(part) for part in text.split(',') if part.strip()})
+    except ValueError:
+        raise ValueError(f"Puntos de corte inválidos '{text}' (números separados por comas)")
+    if not cuts:
+        raise ValueError("Se necesita al menos un punto de corte")
+    if len(cuts) > MAX_CUTS:
+        raise ValueError(f"Demasiados puntos de corte ({len(cuts)}, máximo {MAX_CUTS})")
+    if not all(math.isfinite(cut) for cut in cuts):
+        raise ValueError("Los puntos de corte deben ser finitos")
+    return tuple(cuts)
+
+
+def cuts_for(field, counts=MONTH_COUNTS):
+    """Cortes que necesitan los conteos de un campo"""
+    return tuple(sorted({float(threshold) for _, f, _, threshold in counts if f == field}))
+
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def bucket_labels(cuts):
+    """Etiqueta legible de cada tramo, p. ej. ['<0', '=0', '(0, 5)', '=5', '>5']"""
+    labels = [f"<{_format(cuts[0])}"]
+    for previous, cut in zip(cuts, cuts[1:]):
+        labels += [f"={_format(previous)}", f"({_format(previous)}, {_format(cut)})"]
+    labels += [f"={_format(cuts[-1])}", f">{_format(cuts[-1])}"]
+    return labels
+
+
+def bucket_index(values, cuts):
+    """Tramo de cada valor (los NaN deben filtrarse antes)"""
+    cuts = np.asarray(cuts, dtype=np.float64)
+    return np.searchsorted(cuts, values, 'left') + np.searchsorted(cuts, values, 'right')
+
+
+def month_key(year, month):
+    return year * 12 + month - 1
+
+
+def histogram_per_month(columns, field, cuts):
+    """
+    Args:
+        columns: DailyColumns de timeseries_store
+        field: columna ('tmax', 'tmin', ...)
+        cuts: cortes ordenados
+
+    Returns:
+        (keys, counts): keys ordenadas (month_key) de los meses con datos y
+        counts[i, tramo] = días del mes keys[i] en cada tramo
+    """
+    values = columns.values[field]
+    present = ~np.isnan(values)
+    month_keys = month_key(columns.year.astype(np.int64), columns.month.astype(np.int64))[present]
+    keys, inverse = np.unique(month_keys, return_inverse=True)
+
+    n_buckets = 2 * len(cuts) + 1
+    flat = inverse * n_buckets + bucket_index(values[present], cuts)
+    counts = np.bincount(flat, minlength=len(keys) * n_buckets).reshape(len(keys), n_buckets)
+    return keys, counts
+
+
+def monthly_histogram(name, columns, field, cuts):
+    """
+    histogram_per_month() guardado mientras la instantánea de la serie no
+    cambie; como mucho CACHE_ENTRIES combinaciones (las menos usadas salen)
+    """
+    cache_key = (name, field, tuple(cuts))
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None and cached[0] is columns:
+            _cache.move_to_end(cache_key)
+            return cached[1]
+
+    result = histogram_per_month(columns, field, cuts)
+    with _cache_lock:
+        _cache[cache_key] = (columns, result)
+        _cache.move_to_end(cache_key)
+        while len(_cache) > CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return result
+
+
+def month_row(histogram, cuts, year, month):
+    """Tramos de un mes (ceros si no hay datos)"""
+    keys, counts = histogram
+    key = month_key(year, month)
+    i = np.searchsorted(keys, key)
+    if i < len(keys) and keys[i] == key:
+        return counts[i]
+    return np.zeros(2 * len(cuts) + 1, dtype=np.int64)
+
+
+def count_days(row, cuts, op, threshold):
+    """Días que cumplen <op> threshold a partir de los tramos; threshold debe ser un corte"""
+    k = list(cuts).index(float(threshold))
+    return int(np.sum(row[..., _SELECTORS[op](k)], axis=-1))
+
+
+def month_counts(rows, cuts, counts=MONTH_COUNTS):
+    """
+    Conteos con nombre a partir de los tramos de cada campo.
+
+    rows / cuts: dict campo -> tramos del mes / cortes usados
+    """
+    return {
+        key: count_days(rows[field], cuts[field], op, threshold)
+        for key, field, op, threshold in counts
+    }
+
+
+def histogram_stages(value, cuts, group_id):
+    """
+    Etapas de agregación equivalentes a histogram_per_month().
+
+    value es la expresión del campo ('$temperatura.maxima' o una expresión
+    calculada) y group_id la clave de agrupación ({'año': ..., 'mes': ...}).
+    Cada documento de salida es {'_id': {**group_id, 'tramo': i}, 'dias': n}.
+    """
+    branches = []
+    for k, cut in enumerate(cuts):
+        branches.append({'case': {'$lt': ['$_valor', cut]}, 'then': 2 * k})
+        branches.append({'case': {'$eq': ['$_valor', cut]}, 'then': 2 * k + 1})
+    return [
+        {'$addFields': {'_valor': value}},
+        {'$match': {'_valor': {'$type': 'number'}}},
+        {'$group': {
+            '_id': {**group_id, 'tramo': {'$switch': {'branches': branches, 'default': 2 * len(cuts)}}},
+            'dias': {'$sum': 1},
+        }},
+    ]
+
+
+def histogram_from_docs(docs, cuts):
+    """Convierte la salida de histogram_stages() al formato de histogram_per_month()"""
+    n_buckets = 2 * len(cuts) + 1
+    rows = {}
+    for doc in docs:
+        key = month_key(doc['_id']['año'], doc['_id']['mes'])
+        rows.setdefault(key, np.zeros(n_buckets, dtype=np.int64))[doc['_id']['tramo']] += doc['dias']
+    keys = np.array(sorted(rows), dtype=np.int64)
+    counts = np.array([rows[key] for key in keys], dtype=np.int64).reshape(len(keys), n_buckets)
+    return keys, counts
+
+
+def histogram_response(field, cuts, histogram, year=None, month=None):
+    """Formato de los endpoints /histograma-umbrales"""
+    keys, counts = histogram
+    datos = []
+    for key, row in zip(keys, counts):
+        año, mes = divmod(int(key), 12)
+        mes += 1
+        if (year is not None and año != year) or (month is not None and mes != month):
+            continue
+        datos.append({'año': año, 'mes': mes, 'dias': [int(n) for n in row]})
+    return {
+        'campo': field,
+        'cortes': [float(cut) for cut in cuts],
+        'tramos': bucket_labels(cuts),
+        'datos': datos,
+    }
+
+
+MONTH_NAMES = ["", "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
+               "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+
+
+def month_statistics(year, month, counts, summary):
+    """
+    Bloque 'mes_seleccionado' de las estadísticas mensuales.
+
+    counts: salida de month_counts(); summary: salida de
+    timeseries_store.month_summary() (o su equivalente de Mongo)
+    """
+    media = summary['media']
+    maxima = summary['maxima']
+    minima = summary['minima']
+    record = summary['record_otros_años']
+    return {
+        'mes': month,
+        'año': year,
+        'nombre_mes': MONTH_NAMES[month],
+        **counts,
+        'temperatura_media': round(media, 1) if media is not None else 0,
+        'temperatura_maxima': maxima if maxima is not None else 0,
+        'temperatura_minima': minima if minima is not None else 0,
+        'record_mes': maxima is not None and record is not None and maxima > record,
+        'total_dias': summary['dias'],
+    }
@@ -21,6 +21,7 @@ import json
 from datetime import datetime, timedelta, date
 import pytz
 from pymongo import MongoClient
+from mongo_pool import get_pool_options
 from typing import Optional, List, Dict, Any
 import time
 import sys
@@ -68,7 +69,7 @@ class BurgosHistoricoUpdater:
     def _connect_mongodb(self):
         """Establece conexión con MongoDB"""
         try:
-            self.client = MongoClient(self.mongodb_uri)
+            self.client = MongoClient(self.mongodb_uri, **get_pool_options())
             self.db = self.client.meteosarria
             self.collection = self.db.burgos_historico_temps
             logger.info("Conectado a MongoDB correctamente")
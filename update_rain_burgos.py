@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 import pytz
 import requests
 import time
-from pymongo import MongoClient
+from mongo_pool import get_db
 
 # Configure logging
 logging.basicConfig(
@@ -23,12 +23,7 @@ BURGOS_LON = -3.6969
 
 # MongoDB connection
 try:
-    mongo_uri = os.getenv("MONGODB_URI")
-    if not mongo_uri:
-        raise ValueError("MONGODB_URI environment variable not set")
-
-    client = MongoClient(mongo_uri)
-    db = client.meteosarria
+    db = get_db()
     rain_collection = db.burgos_rain_accumulation
     logger.info("Connected to MongoDB")
 except Exception as e: